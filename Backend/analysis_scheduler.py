@@ -0,0 +1,146 @@
+"""
+Analysis Scheduler
+Priority queue and worker pool shared by on-demand analysis and the
+startup preprocessing backlog
+
+Jobs run in one of two lanes. Queued interactive jobs (a manager clicking
+analyze) are always dispatched before queued background jobs, and
+INTERACTIVE_RESERVED_SLOTS workers are never given to background work, so
+an on-demand analysis starts right away however long the backlog is.
+Background jobs also run inside gemini_limiter.background_calls(), so
+their Gemini calls give way to interactive ones at the limiter.
+"""
+
+import heapq
+import itertools
+import os
+import threading
+import time
+from concurrent.futures import Future
+
+from gemini_limiter import GEMINI_MAX_CONCURRENCY, background_calls
+from metrics import REGISTRY
+
+INTERACTIVE = "interactive"
+BACKGROUND = "background"
+LANE_PRIORITY = {INTERACTIVE: 0, BACKGROUND: 1}
+
+ANALYSIS_WORKERS = int(os.getenv("ANALYSIS_WORKERS", str(GEMINI_MAX_CONCURRENCY)))
+# Workers background jobs may never occupy
+INTERACTIVE_RESERVED_SLOTS = int(os.getenv("INTERACTIVE_RESERVED_SLOTS", "2"))
+
+ANALYSIS_QUEUE_DEPTH = REGISTRY.gauge(
+    "analysis_queue_depth",
+    "Analysis jobs waiting for a worker",
+    ("lane",),
+)
+ANALYSIS_QUEUE_WAIT = REGISTRY.histogram(
+    "analysis_queue_wait_seconds",
+    "Time analysis jobs waited for a worker",
+    ("lane",),
+)
+
+
+class _Job:
+    __slots__ = ("lane", "fn", "args", "kwargs", "future", "queued_at")
+
+    def __init__(self, lane: str, fn, args, kwargs):
+        self.lane = lane
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.future = Future()
+        self.queued_at = time.perf_counter()
+
+
+class AnalysisScheduler:
+    """
+    Two-lane priority scheduler over a fixed pool of worker threads
+
+    Workers start on the first submit. Background jobs use at most
+    workers - reserved_interactive workers at a time; interactive jobs may
+    use any of them. The pool is grown to reserved_interactive + 1 if
+    needed, so at least one interactive-only worker always exists.
+    """
+
+    def __init__(self, workers: int = ANALYSIS_WORKERS, reserved_interactive: int = INTERACTIVE_RESERVED_SLOTS):
+        reserved_interactive = max(1, reserved_interactive)
+        self.workers = max(workers, reserved_interactive + 1)
+        self.background_slots = self.workers - reserved_interactive
+        self._queue = []
+        self._sequence = itertools.count()
+        self._running = {INTERACTIVE: 0, BACKGROUND: 0}
+        self._condition = threading.Condition()
+        self._threads = []
+
+    def submit(self, lane: str, fn, *args, **kwargs) -> Future:
+        """
+        Queue fn(*args, **kwargs) in a lane
+
+        Returns:
+            A concurrent.futures.Future (await it with asyncio.wrap_future);
+            cancelling it before it starts drops the job
+        """
+        if lane not in LANE_PRIORITY:
+            raise ValueError(f"Unknown lane: {lane}")
+        job = _Job(lane, fn, args, kwargs)
+        with self._condition:
+            self._start_workers()
+            heapq.heappush(self._queue, (LANE_PRIORITY[lane], next(self._sequence), job))
+            ANALYSIS_QUEUE_DEPTH.inc(lane=lane)
+            self._condition.notify_all()
+        return job.future
+
+    def status(self) -> dict:
+        with self._condition:
+            queued = {lane: 0 for lane in LANE_PRIORITY}
+            for _, _, job in self._queue:
+                queued[job.lane] += 1
+            return {
+                "workers": self.workers,
+                "background_slots": self.background_slots,
+                "running": dict(self._running),
+                "queued": queued,
+            }
+
+    def _start_workers(self):
+        while len(self._threads) < self.workers:
+            thread = threading.Thread(target=self._work, name=f"analysis-{len(self._threads)}", daemon=True)
+            self._threads.append(thread)
+            thread.start()
+
+    def _runnable(self) -> bool:
+        if not self._queue:
+            return False
+        # Interactive jobs sort first, so a background job at the head means none are queued
+        return self._queue[0][2].lane == INTERACTIVE or self._running[BACKGROUND] < self.background_slots
+
+    def _work(self):
+        while True:
+            with self._condition:
+                while not self._runnable():
+                    self._condition.wait()
+                _, _, job = heapq.heappop(self._queue)
+                ANALYSIS_QUEUE_DEPTH.dec(lane=job.lane)
+                if not job.future.set_running_or_notify_cancel():
+                    continue
+                self._running[job.lane] += 1
+            ANALYSIS_QUEUE_WAIT.observe(time.perf_counter() - job.queued_at, lane=job.lane)
+            try:
+                if job.lane == BACKGROUND:
+                    with background_calls():
+                        result = job.fn(*job.args, **job.kwargs)
+                else:
+                    result = job.fn(*job.args, **job.kwargs)
+            except BaseException as e:
+                job.future.set_exception(e)
+            else:
+                job.future.set_result(result)
+            finally:
+                with self._condition:
+                    self._running[job.lane] -= 1
+                    self._condition.notify_all()
+
+
+# Shared by the analyze endpoint and startup preprocessing
+analysis_scheduler = AnalysisScheduler()
@@ -0,0 +1,144 @@
+"""
+Backlog Scheduler
+Orders the pending video backlog for preprocessing
+
+Work runs shortest call first (by the CSV's Duration), so the dashboard
+fills quickly, and calls too short to hold a conversation are classified
+from their duration alone instead of being sent to Gemini.
+
+Recording URLs are presigned with an expiry (X-Amz-Date + X-Amz-Expires),
+and a slow backlog can reach a URL after it has stopped working.
+Recordings the queue would reach too late are prefetched into the local
+cache up front, and rows whose URL has already expired (and isn't cached)
+are reported without spending an analysis attempt on them.
+"""
+
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from gemini_usage import parse_duration
+from recording_fetcher import MAX_CONNECTIONS_PER_HOST, recording_fetcher, url_expiry
+
+# Calls shorter than this (seconds) are classified without analysis
+MIN_ANALYSIS_SECONDS = int(os.getenv("MIN_ANALYSIS_SECONDS", "15"))
+TRIVIAL_CALL_KEY = "Trivial_Call"
+
+# A URL this close to its expiry counts as expired (the download and
+# upload have to finish before it lapses)
+EXPIRY_MARGIN_SECONDS = float(os.getenv("RECORDING_EXPIRY_MARGIN_SECONDS", "600"))
+
+
+class BacklogItem:
+    """One pending video; position is its row order in the input CSV"""
+
+    __slots__ = ("report_id", "store_name", "recording_url", "position", "duration", "deadline", "error")
+
+    def __init__(self, report_id: str, store_name: str, recording_url: str, position: int, duration=None):
+        self.report_id = report_id
+        self.store_name = store_name
+        self.recording_url = recording_url
+        self.position = position
+        self.duration = parse_duration(duration)
+        self.deadline = url_expiry(recording_url)
+        self.error = None
+
+    @property
+    def trivial(self) -> bool:
+        return self.duration is not None and self.duration < MIN_ANALYSIS_SECONDS
+
+    @property
+    def deadline_label(self) -> str:
+        if self.deadline is None:
+            return "no expiry"
+        return datetime.fromtimestamp(self.deadline).isoformat(sep=" ", timespec="minutes")
+
+
+def order_backlog(items):
+    """Shortest call first (unknown durations last), then earliest URL expiry, then file order"""
+    return sorted(items, key=lambda item: (
+        item.duration is None, item.duration or 0,
+        item.deadline is None, item.deadline or 0,
+        item.position,
+    ))
+
+
+def split_trivial(items):
+    """(analyzable, trivial): trivial calls are under MIN_ANALYSIS_SECONDS long"""
+    return [item for item in items if not item.trivial], [item for item in items if item.trivial]
+
+
+def trivial_analysis(item: BacklogItem) -> dict:
+    """Stand-in analysis for a call too short to analyze, built from its duration"""
+    return {
+        "Functional": {
+            "Call_ID": item.report_id,
+            "Call_Time": "N/A",
+            "Store_Location": item.store_name,
+            "Call_Objective_Theme": "Too short to analyze",
+        },
+        "Overall_Summary": {
+            "Chronological_Call_Summary": (
+                f"The call lasted {item.duration} seconds, under the {MIN_ANALYSIS_SECONDS}-second "
+                "minimum, so it was classified from its duration without a full analysis."
+            ),
+            "Next_Action": "None",
+        },
+        TRIVIAL_CALL_KEY: {
+            "duration_seconds": item.duration,
+            "threshold_seconds": MIN_ANALYSIS_SECONDS,
+            "classified_at": datetime.now().isoformat(),
+        },
+    }
+
+
+def triage_expiry(items, seconds_per_item: float, now: float = None, fetcher=recording_fetcher):
+    """
+    Split the backlog by what its URL expiry allows
+
+    Walks the queue in run order (order_backlog), estimating when each
+    item would start at seconds_per_item per video.
+
+    Returns:
+        (queue, at_risk, expired): queue is every fetchable item in run
+        order; at_risk are the ones in it that would be reached after
+        their URL expires (prefetch them); expired can't be fetched at all
+    """
+    now = time.time() if now is None else now
+    queue, at_risk, expired = [], [], []
+    for item in order_backlog(items):
+        if item.deadline is None or fetcher.cached(item.recording_url) is not None:
+            queue.append(item)
+            continue
+        if item.deadline <= now + EXPIRY_MARGIN_SECONDS:
+            lapsed = "expired" if item.deadline <= now else "expires too soon to fetch"
+            item.error = f"Recording URL {lapsed} ({item.deadline_label})"
+            expired.append(item)
+            continue
+        estimated_start = now + len(queue) * seconds_per_item
+        if estimated_start + EXPIRY_MARGIN_SECONDS >= item.deadline:
+            at_risk.append(item)
+        queue.append(item)
+    return queue, at_risk, expired
+
+
+def prefetch(items, workers: int = MAX_CONNECTIONS_PER_HOST, fetcher=recording_fetcher):
+    """
+    Download recordings into the local cache ahead of analysis
+
+    Returns:
+        Items whose download failed, with item.error set
+    """
+    def fetch(item):
+        try:
+            fetcher.fetch(item.recording_url)
+        except Exception as e:
+            item.error = f"Prefetch failed: {e}"
+            return item
+        return None
+
+    if not items:
+        return []
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="prefetch") as pool:
+        return [item for item in pool.map(fetch, items) if item is not None]
@@ -0,0 +1,376 @@
+"""
+Batch Video Analysis
+Submits the pending video backlog to the Gemini Batch API in groups and
+collects the results asynchronously
+
+Batch jobs trade latency (results within hours instead of seconds) for
+higher aggregate throughput and half-price tokens, which suits nightly
+backlog runs. Each recording is fetched and uploaded to Gemini before its
+request is built, like interactive analysis, and the upload stays pinned
+until the job is collected. Trivial calls are classified without a
+request, and recordings whose URL has expired are not submitted. Submitted jobs are tracked in video_analysis/batch_jobs.json
+so collection survives restarts, and videos already in a running batch
+are never submitted twice.
+
+Usage:
+    python batch_analysis.py submit [--batch-size N]
+    python batch_analysis.py collect
+    python batch_analysis.py run      # submit, then poll until every batch is done
+    python batch_analysis.py status
+"""
+
+import argparse
+import asyncio
+import json
+import mimetypes
+import os
+import threading
+from datetime import datetime
+
+from video_analysis_service import (
+    GEMINI_API_KEY,
+    MODEL_NAME,
+    VIDEO_ANALYSIS_DIR,
+    build_analysis_prompt,
+    get_all_video_reports_with_metadata,
+    parse_analysis_response,
+    save_video_analysis,
+)
+from backlog_scheduler import BacklogItem, split_trivial, trivial_analysis, triage_expiry, prefetch
+from gemini_files import gemini_files
+from gemini_limiter import gemini_limiter
+from gemini_usage import USAGE_KEY, usage_from_response
+from job_progress import job_tracker
+from recording_fetcher import recording_fetcher
+
+try:
+    from google import genai as google_genai
+except ImportError:  # pragma: no cover - only needed for real batch submission
+    google_genai = None
+
+BATCH_JOBS_FILE = VIDEO_ANALYSIS_DIR / "batch_jobs.json"
+BATCH_SIZE = int(os.getenv("GEMINI_BATCH_SIZE", "50"))
+BATCH_POLL_SECONDS = float(os.getenv("GEMINI_BATCH_POLL_SECONDS", "60"))
+
+# Same settings as interactive analysis
+GENERATION_CONFIG = {"temperature": 0.7, "max_output_tokens": 4000}
+
+SUCCEEDED_STATES = ("JOB_STATE_SUCCEEDED", "JOB_STATE_PARTIALLY_SUCCEEDED")
+FINAL_STATES = SUCCEEDED_STATES + ("JOB_STATE_FAILED", "JOB_STATE_CANCELLED", "JOB_STATE_EXPIRED")
+
+_batch_lock = threading.Lock()
+
+# report_id -> job tracker id, for progress events within this process
+_tracked_jobs = {}
+
+
+class GeminiBatchAPI:
+    """
+    Gemini Batch API through the google-genai SDK
+
+    Any object with the same create()/get() methods can stand in for it
+    (see test_batch_analysis.py for a local fake).
+    """
+
+    def __init__(self, api_key: str = GEMINI_API_KEY):
+        if google_genai is None:
+            raise RuntimeError("Batch mode needs the google-genai package (pip install google-genai)")
+        self.client = google_genai.Client(api_key=api_key)
+
+    def create(self, model: str, requests: list, display_name: str) -> str:
+        """Submit inline requests as one batch job; returns the job name"""
+        job = self.client.batches.create(model=model, src=requests, config={"display_name": display_name})
+        return job.name
+
+    def get(self, name: str) -> dict:
+        """
+        Returns:
+            {"state": "JOB_STATE_...", "responses": [{"metadata", "response", "error"}]}
+            with responses only once the job has succeeded
+        """
+        job = self.client.batches.get(name=name)
+        state = job.state.name
+        responses = []
+        if state in SUCCEEDED_STATES and job.dest is not None:
+            for inlined in job.dest.inlined_responses or []:
+                responses.append({
+                    "metadata": inlined.metadata or {},
+                    "response": inlined.response,
+                    "error": str(inlined.error) if inlined.error else None,
+                })
+        return {"state": state, "responses": responses}
+
+
+def load_batch_jobs() -> dict:
+    """Tracked batch jobs keyed by job name"""
+    if not BATCH_JOBS_FILE.exists():
+        return {}
+    try:
+        with open(BATCH_JOBS_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"Error loading batch jobs: {e}")
+        return {}
+
+
+def _save_batch_jobs(jobs: dict):
+    temp_path = BATCH_JOBS_FILE.with_suffix(".tmp")
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(jobs, f, indent=2, ensure_ascii=False)
+    os.replace(temp_path, BATCH_JOBS_FILE)
+
+
+def _active_report_ids(jobs: dict) -> set:
+    return {
+        report_id
+        for job in jobs.values() if job["state"] not in FINAL_STATES
+        for report_id in job["report_ids"]
+    }
+
+
+def build_batch_request(item: BacklogItem, file) -> dict:
+    """Inline Batch API request for one video, referencing its uploaded Gemini file"""
+    mime_type = getattr(file, "mime_type", None) or mimetypes.guess_type(item.recording_url.split("?")[0])[0] or "video/mp4"
+    return {
+        "contents": [{"role": "user", "parts": [
+            {"text": build_analysis_prompt(item.recording_url)},
+            {"file_data": {"file_uri": file.uri, "mime_type": mime_type}},
+        ]}],
+        "config": GENERATION_CONFIG,
+        "metadata": {"report_id": item.report_id, "store_name": str(item.store_name)},
+    }
+
+
+def _fail_unsubmitted(item: BacklogItem):
+    job_id = job_tracker.create_job(item.report_id, source="batch")
+    job_tracker.update(job_id, "failed", error=item.error)
+    print(f"⚠️  {item.store_name} ({item.report_id}) - NOT SUBMITTED ({item.error})")
+
+
+def _upload(items, fetcher, files) -> dict:
+    """
+    Upload each fetched recording and pin it for the batch job
+
+    Returns:
+        report_id -> (uploaded file, content hash); failed items get item.error
+    """
+    uploaded = {}
+    for item in items:
+        try:
+            file = files.acquire(fetcher.fetch(item.recording_url))
+        except Exception as e:
+            item.error = f"Upload failed: {str(e)[:100]}"
+            continue
+        try:
+            uploaded[item.report_id] = (file, files.pin(file))
+        finally:
+            files.release(file)
+    return uploaded
+
+
+def submit_pending_batches(api=None, batch_size: int = BATCH_SIZE, model: str = MODEL_NAME,
+                           fetcher=recording_fetcher, files=gemini_files) -> list:
+    """
+    Group unanalyzed videos that aren't already in a running batch into batch jobs
+
+    Trivial calls are saved as classified without a request, and videos
+    whose recording can't be fetched (expired URL) or uploaded are left
+    out with their job marked failed.
+
+    Returns:
+        Names of the submitted jobs
+    """
+    api = api or GeminiBatchAPI()
+    with _batch_lock:
+        jobs = load_batch_jobs()
+        in_flight = _active_report_ids(jobs)
+        pending = [
+            BacklogItem(report["report_id"], report["store_name"], report["recording_url"], position, report["duration"])
+            for position, report in enumerate(get_all_video_reports_with_metadata())
+            if not report["analyzed"] and report["report_id"] not in in_flight
+            and isinstance(report["recording_url"], str) and report["recording_url"].strip()
+        ]
+
+        pending, trivial = split_trivial(pending)
+        for item in trivial:
+            save_video_analysis(item.report_id, trivial_analysis(item))
+            print(f"⏩ {item.store_name} ({item.report_id}) - CLASSIFIED ({item.duration}s, not analyzed)")
+
+        # Everything is fetched up front, so no item waits on the queue
+        queue, _, expired = triage_expiry(pending, 0, fetcher=fetcher)
+        for item in expired:
+            _fail_unsubmitted(item)
+        failed = prefetch(queue, fetcher=fetcher)
+        uploaded = _upload([item for item in queue if item not in failed], fetcher, files)
+        for item in queue:
+            if item.report_id not in uploaded:
+                _fail_unsubmitted(item)
+        ready = [item for item in queue if item.report_id in uploaded]
+        if not ready:
+            print("✓ No pending videos to submit")
+            return []
+
+        submitted = []
+        for start in range(0, len(ready), batch_size):
+            group = ready[start:start + batch_size]
+            display_name = f"video-analysis-{datetime.now():%Y%m%d-%H%M%S}-{start // batch_size + 1}"
+            requests = [build_batch_request(item, uploaded[item.report_id][0]) for item in group]
+            try:
+                name = gemini_limiter.call("batch_create", api.create, model, requests, display_name)
+            except Exception:
+                for item in ready[start:]:
+                    files.unpin(uploaded[item.report_id][1])
+                raise
+            jobs[name] = {
+                "name": name,
+                "display_name": display_name,
+                "model": model,
+                "state": "JOB_STATE_PENDING",
+                "report_ids": [item.report_id for item in group],
+                "files": {item.report_id: uploaded[item.report_id][1] for item in group},
+                "submitted_at": datetime.now().isoformat(),
+                "completed_at": None,
+                "saved": 0,
+                "errors": {},
+            }
+            # Persist after every submission so a crash can't orphan a running job
+            _save_batch_jobs(jobs)
+            submitted.append(name)
+
+            for item in group:
+                job_id = job_tracker.create_job(item.report_id, source="batch")
+                job_tracker.update(job_id, "processing")
+                _tracked_jobs[item.report_id] = job_id
+            print(f"📦 Submitted {name} with {len(group)} videos")
+
+    return submitted
+
+
+def _finish_tracking(report_id: str, state: str, error: str = None):
+    job_id = _tracked_jobs.pop(report_id, None)
+    if job_id is not None:
+        job_tracker.update(job_id, state, error=error)
+
+
+def collect_batch_results(api=None, files=gemini_files) -> dict:
+    """
+    Poll every running batch job once and save the results of finished ones
+
+    Videos whose request failed (or whose whole job failed or expired) are
+    left unanalyzed, so the next submit_pending_batches() picks them up.
+    A finished job's uploads are unpinned, so the file registry deletes
+    them once unused.
+
+    Returns:
+        Counts of completed and still running jobs, saved and failed videos
+    """
+    api = api or GeminiBatchAPI()
+    summary = {"completed_jobs": 0, "running_jobs": 0, "saved": 0, "failed": 0}
+
+    with _batch_lock:
+        jobs = load_batch_jobs()
+        for name, job in jobs.items():
+            if job["state"] in FINAL_STATES:
+                continue
+
+            status = gemini_limiter.call("batch_get", api.get, name)
+            job["state"] = status["state"]
+            if job["state"] not in FINAL_STATES:
+                summary["running_jobs"] += 1
+                continue
+
+            job["completed_at"] = datetime.now().isoformat()
+            summary["completed_jobs"] += 1
+            for digest in job.get("files", {}).values():
+                files.unpin(digest)
+            turnaround = (datetime.fromisoformat(job["completed_at"]) - datetime.fromisoformat(job["submitted_at"])).total_seconds()
+            answered = set()
+
+            for entry in status["responses"]:
+                report_id = entry["metadata"].get("report_id")
+                if report_id is None:
+                    continue
+                answered.add(report_id)
+                response = entry["response"]
+                if entry["error"] or response is None:
+                    job["errors"][report_id] = entry["error"] or "No response"
+                    _finish_tracking(report_id, "failed", job["errors"][report_id])
+                    continue
+
+                analysis = parse_analysis_response(response.text, entry["metadata"].get("store_name", "Unknown Store"))
+                if isinstance(analysis, dict):
+                    analysis[USAGE_KEY] = usage_from_response(response, job["model"], turnaround, mode="batch")
+                    analysis[USAGE_KEY]["batch_job"] = name
+                save_video_analysis(report_id, analysis)
+                job["saved"] += 1
+                _finish_tracking(report_id, "saved")
+
+            for report_id in job["report_ids"]:
+                if report_id not in answered:
+                    job["errors"].setdefault(report_id, f"Batch ended in {job['state']}")
+                    _finish_tracking(report_id, "failed", job["errors"][report_id])
+
+            summary["saved"] += job["saved"]
+            summary["failed"] += len(job["errors"])
+            print(f"📥 {name}: {job['state']} - saved {job['saved']}, failed {len(job['errors'])}")
+
+        _save_batch_jobs(jobs)
+
+    return summary
+
+
+def get_batched_report_ids() -> set:
+    """Report ids currently waiting on a running batch job"""
+    return _active_report_ids(load_batch_jobs())
+
+
+def get_batch_status() -> dict:
+    """Tracked batch jobs with their state and counts"""
+    jobs = load_batch_jobs()
+    return {
+        "active": len(_active_report_ids(jobs)),
+        "jobs": [
+            {
+                "name": job["name"],
+                "state": job["state"],
+                "videos": len(job["report_ids"]),
+                "saved": job["saved"],
+                "failed": len(job["errors"]),
+                "submitted_at": job["submitted_at"],
+                "completed_at": job["completed_at"],
+            }
+            for job in jobs.values()
+        ],
+    }
+
+
+async def run_batch_backlog(api=None, batch_size: int = BATCH_SIZE, poll_seconds: float = BATCH_POLL_SECONDS) -> dict:
+    """Submit the pending backlog and poll until every batch has finished"""
+    api = api or GeminiBatchAPI()
+    await asyncio.to_thread(submit_pending_batches, api, batch_size)
+
+    totals = {"completed_jobs": 0, "saved": 0, "failed": 0}
+    while True:
+        summary = await asyncio.to_thread(collect_batch_results, api)
+        for field in totals:
+            totals[field] += summary[field]
+        if summary["running_jobs"] == 0:
+            return totals
+        await asyncio.sleep(poll_seconds)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gemini Batch API processing for the video backlog")
+    parser.add_argument("command", choices=["submit", "collect", "run", "status"])
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="Videos per batch job")
+    parser.add_argument("--poll-seconds", type=float, default=BATCH_POLL_SECONDS, help="Polling interval for 'run'")
+    args = parser.parse_args()
+
+    if args.command == "submit":
+        print(f"Submitted: {submit_pending_batches(batch_size=args.batch_size)}")
+    elif args.command == "collect":
+        print(f"Result: {collect_batch_results()}")
+    elif args.command == "run":
+        print(f"Result: {asyncio.run(run_batch_backlog(batch_size=args.batch_size, poll_seconds=args.poll_seconds))}")
+    else:
+        print(json.dumps(get_batch_status(), indent=2))
@@ -0,0 +1,79 @@
+"""
+Compression Benchmark
+Compares bytes on the wire and latency for the report endpoints with and
+without negotiated compression
+
+Usage: python benchmark_compression.py [--requests N]
+"""
+
+import argparse
+import statistics
+import time
+
+from fastapi.testclient import TestClient
+
+from main import app
+
+ENDPOINTS = [
+    "/api/call-reports",
+    "/api/video-reports",
+    "/api/call-reports/stats/overview",
+]
+
+# (label, Accept-Encoding sent by the client)
+SCENARIOS = [
+    ("before (identity)", "identity"),
+    ("after (gzip)", "gzip"),
+    ("after (br)", "br, gzip"),
+]
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of a list of samples"""
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def run_scenario(client, url, accept_encoding, requests):
+    """Time requests for one endpoint/encoding; returns (wire bytes, p50 ms, p95 ms)"""
+    headers = {"Accept-Encoding": accept_encoding}
+
+    # Warm-up request also fills the report and precompressed caches
+    response = client.get(url, headers=headers)
+    response.raise_for_status()
+    wire_bytes = response.num_bytes_downloaded
+
+    latencies = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        response = client.get(url, headers=headers)
+        response.read()
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    return wire_bytes, statistics.median(latencies), percentile(latencies, 95)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark response compression")
+    parser.add_argument("--requests", type=int, default=50, help="Timed requests per scenario (default: 50)")
+    args = parser.parse_args()
+
+    client = TestClient(app)
+
+    print("=" * 80)
+    print("RESPONSE COMPRESSION BENCHMARK")
+    print("=" * 80)
+    for url in ENDPOINTS:
+        print(f"\n{url}")
+        print(f"  {'scenario':20s} {'wire bytes':>12s} {'ratio':>7s} {'p50 ms':>8s} {'p95 ms':>8s}")
+        baseline = None
+        for label, accept_encoding in SCENARIOS:
+            wire_bytes, p50, p95 = run_scenario(client, url, accept_encoding, args.requests)
+            baseline = baseline or wire_bytes
+            print(f"  {label:20s} {wire_bytes:12,d} {wire_bytes / baseline:7.1%} {p50:8.2f} {p95:8.2f}")
+    print("\n" + "=" * 80)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,437 @@
+"""
+GMB Call Analysis Pipeline
+Backend port of the CallAnalysisPipeline from GMB_Calls_Analysis.ipynb:
+downloads each call recording, analyzes it with Gemini and writes the
+results table read by the call reports API
+
+Progress is checkpointed to an append-only journal (one JSON line per
+finished row) instead of rewriting the whole table after every row, so a
+checkpoint costs the same at row 10,000 as at row 10 and resuming only
+replays the journal. The journal is merged into the results file (CSV,
+or Parquet for a .parquet output) when the run ends or is interrupted,
+then emptied; the next run resumes from the results file plus whatever
+the journal has collected since.
+
+Calls run concurrently on CALL_WORKERS threads. Throughput is set by the
+shared Gemini limiter (GEMINI_RPM / GEMINI_TPM pacing, adaptive
+concurrency, jittered retries) rather than fixed sleeps; calls still
+rate limited after the limiter's retries are deferred to the next run
+instead of being recorded as errors.
+
+Usage:
+    python call_analysis_pipeline.py [--input CSV] [--output CSV|PARQUET] [--limit N] [--no-resume]
+"""
+
+import argparse
+import json
+import mimetypes
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+import google.generativeai as genai
+import httpx
+import pandas as pd
+from dotenv import load_dotenv
+
+from analysis_prompts import CALL_ANALYSIS_PROMPT
+from csv_analysis_service import CSV_PATH
+from gemini_files import gemini_files
+from gemini_limiter import GEMINI_MAX_CONCURRENCY, gemini_limiter, is_retryable_error
+from gemini_usage import USAGE_KEY, usage_from_response
+from metrics import timed_stage
+from recording_fetcher import RecordingFetcher, recording_fetcher
+
+load_dotenv()
+
+GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+
+INPUT_CSV = Path(os.getenv("CALL_INPUT_CSV", Path(__file__).parent / "csv data.csv"))
+OUTPUT_PATH = Path(os.getenv("CALL_OUTPUT_PATH", CSV_PATH))
+
+CALL_MODEL_NAME = os.getenv("GEMINI_CALL_MODEL", "gemini-flash-latest")
+# Calls in progress at once (download + upload + generate); the limiter
+# decides how many of them are talking to Gemini
+CALL_WORKERS = int(os.getenv("CALL_WORKERS", str(GEMINI_MAX_CONCURRENCY)))
+MIN_AUDIO_BYTES = 1000
+
+RECORDING_URL_COLUMN = "Recording URL"
+OUTPUT_COLUMN = "call_analysis_json"
+
+GENERATION_CONFIG = {
+    "temperature": 0.1,
+    "top_p": 0.95,
+    "max_output_tokens": 8192,
+    "response_mime_type": "application/json",
+}
+
+
+def journal_path_for(output_path: Path) -> Path:
+    """Checkpoint journal kept next to the results file"""
+    return output_path.with_name(output_path.stem + ".journal.jsonl")
+
+
+def _journal_url(value) -> str:
+    """Recording URL as the journal stores it: missing ones (NaN, None) become "" so they still match"""
+    return value if isinstance(value, str) else ""
+
+
+class CheckpointJournal:
+    """
+    Append-only checkpoint: one JSON line per finished row
+
+    Each entry records the row index, its recording URL (so a journal is
+    never replayed onto a different input) and the value for the output
+    column. A line torn by a crash mid-write is ignored on load.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._file = None
+
+    def load(self) -> Dict[int, dict]:
+        """Latest entry per row index"""
+        entries = {}
+        if not self.path.exists():
+            return entries
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                entries[entry["row"]] = entry
+        return entries
+
+    def append(self, row_index: int, recording_url: str, value: str):
+        if self._file is None:
+            self._file = open(self.path, 'a', encoding='utf-8')
+        entry = {"row": row_index, "url": _journal_url(recording_url), "value": value, "at": datetime.now().isoformat()}
+        self._file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def clear(self):
+        self.close()
+        if self.path.exists():
+            self.path.unlink()
+
+
+class AudioHandler:
+    """
+    Fetches call recordings to local files for upload
+
+    Downloads go through the shared recording fetcher: streamed to disk in
+    chunks over keep-alive connections pooled per host, and cached, so a
+    deferred or resumed row doesn't download its recording again.
+    """
+
+    def __init__(self, fetcher: RecordingFetcher = recording_fetcher):
+        self.fetcher = fetcher
+
+    def download(self, url: str) -> Tuple[Optional[str], Optional[str]]:
+        """Fetch audio from URL. Returns (local_path, error_msg)"""
+        try:
+            with timed_stage("call", "download"):
+                path = self.fetcher.fetch(url)
+        except httpx.TimeoutException:
+            return None, "Download timeout"
+        except httpx.HTTPError as e:
+            return None, f"Download error: {e}"
+        except Exception as e:
+            return None, f"Unexpected error: {e}"
+
+        if path.stat().st_size < MIN_AUDIO_BYTES:
+            path.unlink(missing_ok=True)
+            return None, "Audio file too small"
+        return str(path), None
+
+    def close(self):
+        self.fetcher.close()
+
+
+class GeminiAnalyzer:
+    """Analyzes call audio with Gemini through the File API"""
+
+    def __init__(self, api_key: str = GEMINI_API_KEY, model_name: str = CALL_MODEL_NAME):
+        if not api_key:
+            raise ValueError("GEMINI_API_KEY not found in environment variables")
+        genai.configure(api_key=api_key)
+        self.model_name = model_name
+        self.model = genai.GenerativeModel(model_name=model_name, generation_config=GENERATION_CONFIG)
+
+    def analyze(self, audio_path: str, row_data: Dict, mime_type: str) -> Tuple[Optional[Dict], Optional[str]]:
+        """Analyze one downloaded call. Returns (analysis_dict, error_msg)"""
+        uploaded_file = None
+        response = None
+
+        try:
+            try:
+                with timed_stage("call", "upload"):
+                    uploaded_file = gemini_files.acquire(audio_path, mime_type=mime_type)
+            except ValueError:
+                return None, "Gemini File Processing Failed"
+
+            prompt = build_call_prompt(row_data)
+            with timed_stage("call", "generate") as generate_span:
+                response = gemini_limiter.call("generate", self.model.generate_content, [prompt, uploaded_file])
+
+            if not response.text:
+                return None, "Empty response from Gemini"
+
+            with timed_stage("call", "parse"):
+                analysis = json.loads(_strip_code_fence(response.text))
+            if isinstance(analysis, dict):
+                analysis[USAGE_KEY] = usage_from_response(response, self.model_name, generate_span.seconds)
+            return analysis, None
+
+        except json.JSONDecodeError as e:
+            return {"raw_response": response.text, "parse_error": str(e)}, None
+        except Exception as e:
+            # Quota errors that outlasted the limiter's retries are the caller's to defer
+            if is_retryable_error(e):
+                raise
+            return None, f"API error: {e}"
+
+        finally:
+            # Deleted in the background unless a retry reuses it first
+            if uploaded_file is not None:
+                gemini_files.release(uploaded_file)
+
+
+def build_call_prompt(row_data: Dict) -> str:
+    """Fill the call prompt with a row's store context"""
+    return CALL_ANALYSIS_PROMPT.format(
+        store_name=row_data.get('Store Name', 'Unknown'),
+        locality=row_data.get('Locality', 'Unknown'),
+        city=row_data.get('City', 'Unknown'),
+        state=row_data.get('State', 'Unknown'),
+        region=row_data.get('Region', 'Unknown'),
+        call_date=row_data.get('Date', 'Unknown'),
+        duration=row_data.get('Duration', 'Unknown'),
+    )
+
+
+def _strip_code_fence(text: str) -> str:
+    text = text.strip()
+    if text.startswith("```"):
+        text = text.split("```")[1]
+        if text.startswith("json"):
+            text = text[4:]
+    return text.strip()
+
+
+def recording_mime_type(url: str) -> str:
+    """Audio MIME type from the recording URL's extension (mp3 when unknown)"""
+    mime_type, _ = mimetypes.guess_type(urlparse(url).path)
+    if not mime_type or not mime_type.startswith("audio/"):
+        return "audio/mp3"
+    # Gemini expects audio/wav rather than the legacy audio/x-wav
+    return mime_type.replace("/x-", "/")
+
+
+def load_results(path: Path) -> Optional[pd.DataFrame]:
+    """The results table written by save_results, or None if there isn't one"""
+    path = Path(path)
+    if not path.exists():
+        return None
+    if path.suffix == ".parquet":
+        return pd.read_parquet(path)
+    return pd.read_csv(path)
+
+
+def save_results(df: pd.DataFrame, path: Path):
+    """Write the results table atomically, as Parquet for a .parquet path and CSV otherwise"""
+    path = Path(path)
+    temp_path = path.with_name(path.name + ".tmp")
+    if path.suffix == ".parquet":
+        df.to_parquet(temp_path, index=False)
+    else:
+        df.to_csv(temp_path, index=False)
+    os.replace(temp_path, path)
+
+
+class CallAnalysisPipeline:
+    """Downloads, analyzes and checkpoints every unprocessed call in the input CSV"""
+
+    def __init__(self, input_path: Path = INPUT_CSV, output_path: Path = OUTPUT_PATH,
+                 journal_path: Path = None, analyzer: GeminiAnalyzer = None,
+                 audio_handler: AudioHandler = None, workers: int = CALL_WORKERS):
+        self.input_path = Path(input_path)
+        self.output_path = Path(output_path)
+        self.journal = CheckpointJournal(journal_path or journal_path_for(self.output_path))
+        self.analyzer = analyzer or GeminiAnalyzer()
+        self.audio_handler = audio_handler or AudioHandler()
+        self.workers = max(1, workers)
+        self.stats = {"total": 0, "processed": 0, "success": 0, "failed": 0, "deferred": 0, "skipped": 0}
+
+    def _resume_from_results(self, df: pd.DataFrame) -> int:
+        """Copy values already merged into the results file onto matching input rows"""
+        results = load_results(self.output_path)
+        if results is None or OUTPUT_COLUMN not in results.columns or RECORDING_URL_COLUMN not in results.columns:
+            return 0
+        restored = 0
+        for row_index, url, value in zip(results.index, results[RECORDING_URL_COLUMN], results[OUTPUT_COLUMN]):
+            if not isinstance(value, str) or not value or row_index not in df.index:
+                continue
+            if _journal_url(df.at[row_index, RECORDING_URL_COLUMN]) == _journal_url(url):
+                df.at[row_index, OUTPUT_COLUMN] = value
+                restored += 1
+        return restored
+
+    def load(self, resume: bool = True) -> pd.DataFrame:
+        """Input rows with the results file and then the journal replayed onto the output column"""
+        df = pd.read_csv(self.input_path)
+        if OUTPUT_COLUMN not in df.columns:
+            df[OUTPUT_COLUMN] = None
+        df[OUTPUT_COLUMN] = df[OUTPUT_COLUMN].astype(object)
+
+        if not resume:
+            self.journal.clear()
+            return df
+
+        restored = self._resume_from_results(df)
+        if restored:
+            print(f"♻️  Resumed {restored} rows from {self.output_path.name}")
+
+        replayed = 0
+        for row_index, entry in self.journal.load().items():
+            if row_index in df.index and _journal_url(df.at[row_index, RECORDING_URL_COLUMN]) == _journal_url(entry["url"]):
+                df.at[row_index, OUTPUT_COLUMN] = entry["value"]
+                replayed += 1
+        if replayed:
+            print(f"♻️  Resumed {replayed} rows from {self.journal.path.name}")
+        return df
+
+    @staticmethod
+    def get_unprocessed(df: pd.DataFrame) -> list:
+        """Indices of rows without a value in the output column"""
+        values = df[OUTPUT_COLUMN]
+        return df[values.isna() | (values == '')].index.tolist()
+
+    def process_row(self, row: Dict) -> Tuple[Optional[str], Optional[str]]:
+        """
+        Process a single row (runs on a worker thread). Returns (json_string, error_msg)
+
+        Raises:
+            Retryable Gemini errors, so the row can be deferred
+        """
+        url = row.get(RECORDING_URL_COLUMN)
+        if not isinstance(url, str) or not url.strip():
+            return None, "No recording URL"
+
+        audio_path, error = self.audio_handler.download(url)
+        if error:
+            return None, f"Download: {error}"
+
+        analysis, error = self.analyzer.analyze(audio_path, row, recording_mime_type(url))
+        if error:
+            return None, f"Analysis: {error}"
+        return json.dumps(analysis, ensure_ascii=False), None
+
+    def _record(self, df: pd.DataFrame, idx: int, value: str):
+        df.at[idx, OUTPUT_COLUMN] = value
+        self.journal.append(idx, df.at[idx, RECORDING_URL_COLUMN], value)
+
+    def run(self, resume: bool = True, limit: int = None) -> pd.DataFrame:
+        """Run the pipeline over every unprocessed row (or the first `limit` of them)"""
+        print("\n" + "=" * 60)
+        print("📞 GMB CALL ANALYSIS PIPELINE")
+        print("=" * 60 + "\n")
+
+        start_time = datetime.now()
+        df = self.load(resume)
+        unprocessed = self.get_unprocessed(df)
+        if limit is not None:
+            unprocessed = unprocessed[:limit]
+
+        self.stats["total"] = len(df)
+        self.stats["skipped"] = len(df) - len(self.get_unprocessed(df))
+
+        print(f"📊 Total rows: {len(df)}")
+        print(f"✅ Already processed: {self.stats['skipped']}")
+        print(f"🔄 To process: {len(unprocessed)} ({self.workers} workers)\n")
+
+        # Workers only run process_row; results are recorded on this thread
+        pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="call-analysis")
+        futures = {pool.submit(self.process_row, df.loc[idx].to_dict()): idx for idx in unprocessed}
+        try:
+            for position, future in enumerate(as_completed(futures), start=1):
+                idx = futures[future]
+                store = df.at[idx, 'Store Name'] if 'Store Name' in df.columns else 'Unknown'
+
+                try:
+                    json_result, error = future.result()
+                except Exception as e:
+                    if is_retryable_error(e):
+                        print(f"⏸️  [{position}/{len(unprocessed)}] Row {idx} ({store}): deferred, still rate limited")
+                        self.stats["deferred"] += 1
+                        continue
+                    json_result, error = None, str(e)
+
+                if error:
+                    print(f"❌ [{position}/{len(unprocessed)}] Row {idx} ({store}): {error}")
+                    self._record(df, idx, json.dumps({"error": error, "processed_at": datetime.now().isoformat()}))
+                    self.stats["failed"] += 1
+                else:
+                    print(f"✅ [{position}/{len(unprocessed)}] Row {idx} ({store})")
+                    self._record(df, idx, json_result)
+                    self.stats["success"] += 1
+                self.stats["processed"] += 1
+        finally:
+            # On interrupt, drop queued rows and let in-flight ones finish
+            pool.shutdown(wait=True, cancel_futures=True)
+            # Merge even when interrupted; the journal still holds every finished row
+            self.journal.close()
+            save_results(df, self.output_path)
+            # Everything journaled is in the results file now (deferred rows never are)
+            self.journal.clear()
+
+        duration = datetime.now() - start_time
+        print("\n" + "=" * 60)
+        print("📊 PROCESSING COMPLETE")
+        print("=" * 60)
+        print(f"Total rows:      {self.stats['total']}")
+        print(f"Processed:       {self.stats['processed']}")
+        print(f"Successful:      {self.stats['success']}")
+        print(f"Failed:          {self.stats['failed']}")
+        print(f"Deferred:        {self.stats['deferred']}")
+        print(f"Skipped:         {self.stats['skipped']}")
+        print(f"Duration:        {duration}")
+        if self.stats["processed"]:
+            print(f"Throughput:      {self.stats['processed'] / max(duration.total_seconds(), 1e-9) * 60:.1f} calls/min")
+        print(f"Output:          {self.output_path}")
+        print("=" * 60 + "\n")
+
+        return df
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Analyze GMB call recordings with Gemini")
+    parser.add_argument("--input", type=Path, default=INPUT_CSV, help="Input CSV of calls")
+    parser.add_argument("--output", type=Path, default=OUTPUT_PATH,
+                        help="Results file (.csv, or .parquet with pyarrow installed)")
+    parser.add_argument("--journal", type=Path, default=None,
+                        help="Checkpoint journal (default: <output>.journal.jsonl)")
+    parser.add_argument("--limit", type=int, default=None, help="Process at most N calls")
+    parser.add_argument("--workers", type=int, default=CALL_WORKERS, help="Calls processed concurrently")
+    parser.add_argument("--no-resume", action="store_true", help="Discard the journal and start over")
+    args = parser.parse_args()
+
+    pipeline = CallAnalysisPipeline(args.input, args.output, args.journal, workers=args.workers)
+    try:
+        pipeline.run(resume=not args.no_resume, limit=args.limit)
+    finally:
+        pipeline.audio_handler.close()
+        # The background sweeper dies with this process; don't leave this run's uploads behind
+        deleted = gemini_files.purge_session()
+        if deleted:
+            print(f"🧹 Deleted {deleted} uploaded recordings from Gemini storage")
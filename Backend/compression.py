@@ -0,0 +1,226 @@
+"""
+Response Compression
+Negotiated brotli/gzip compression for JSON APIs, plus a small cache of
+precompressed bodies for the heaviest cached responses
+"""
+
+import gzip
+import threading
+import zlib
+from collections import OrderedDict
+
+from fastapi import Request
+from starlette.datastructures import Headers, MutableHeaders
+
+from json_response import RawJSONResponse
+from request_metrics import request_phase
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli is optional, gzip always works
+    brotli = None
+
+# Bodies smaller than this aren't worth compressing
+COMPRESSION_MIN_SIZE = 1024
+
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+# Precompressed variants are built once per version, so spend more CPU on them
+PRECOMPRESSED_GZIP_LEVEL = 9
+PRECOMPRESSED_BROTLI_QUALITY = 9
+
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/csv", "text/plain", "text/html")
+
+# How many precompressed bodies to keep (two encodings per cached payload)
+PRECOMPRESSED_CACHE_SIZE = 16
+
+
+def choose_encoding(accept_encoding: str):
+    """Pick the best supported encoding from an Accept-Encoding header, or None"""
+    accepted = {}
+    for part in (accept_encoding or "").split(","):
+        coding, _, params = part.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if coding:
+            accepted[coding.lower()] = quality
+
+    for coding in ("br", "gzip"):
+        if coding == "br" and brotli is None:
+            continue
+        if accepted.get(coding, accepted.get("*", 0)) > 0:
+            return coding
+    return None
+
+
+def compress(body: bytes, encoding: str, precompressed: bool = False) -> bytes:
+    """Compress a complete body with the given encoding"""
+    with request_phase("compress"):
+        if encoding == "br":
+            quality = PRECOMPRESSED_BROTLI_QUALITY if precompressed else BROTLI_QUALITY
+            return brotli.compress(body, quality=quality)
+        level = PRECOMPRESSED_GZIP_LEVEL if precompressed else GZIP_LEVEL
+        return gzip.compress(body, compresslevel=level, mtime=0)
+
+
+class _StreamCompressor:
+    """Incremental compressor that flushes after every chunk so streams keep flowing"""
+
+    def __init__(self, encoding: str):
+        if encoding == "br":
+            self._compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+            self._flush = self._compressor.flush
+            self._finish = self._compressor.finish
+            self._process = self._compressor.process
+        else:
+            self._compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+            self._flush = lambda: self._compressor.flush(zlib.Z_SYNC_FLUSH)
+            self._finish = self._compressor.flush
+            self._process = self._compressor.compress
+
+    def chunk(self, data: bytes) -> bytes:
+        with request_phase("compress"):
+            return self._process(data) + self._flush()
+
+    def finish(self) -> bytes:
+        with request_phase("compress"):
+            return self._finish()
+
+
+def add_vary_accept_encoding(headers: MutableHeaders):
+    """Add Accept-Encoding to Vary unless it's already listed"""
+    vary = [token.strip().lower() for token in headers.get("vary", "").split(",")]
+    if "accept-encoding" not in vary:
+        headers.add_vary_header("Accept-Encoding")
+
+
+def _weaken_etag(headers: MutableHeaders):
+    # The compressed bytes differ from the identity ones, so a strong ETag no longer applies
+    etag = headers.get("etag")
+    if etag and not etag.startswith("W/"):
+        headers["etag"] = f"W/{etag}"
+
+
+class CompressionMiddleware:
+    """
+    ASGI middleware compressing responses with brotli or gzip
+
+    Responses that already carry Content-Encoding (precompressed bodies)
+    pass through untouched, as do small bodies, non-text content types and
+    Server-Sent Events.
+    """
+
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        compressor = None
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start_message, compressor, passthrough
+
+            if message["type"] == "http.response.start":
+                headers = Headers(raw=message["headers"])
+                content_type = headers.get("content-type", "").partition(";")[0].strip().lower()
+                passthrough = (
+                    "content-encoding" in headers
+                    or message["status"] in (204, 206, 304)
+                    or content_type not in COMPRESSIBLE_TYPES
+                )
+                if passthrough:
+                    await send(message)
+                else:
+                    # Hold the headers until the first body chunk shows whether to compress
+                    start_message = message
+                return
+
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+            if start_message is not None:
+                headers = MutableHeaders(raw=start_message["headers"])
+                if not more_body and len(body) < self.minimum_size:
+                    passthrough = True
+                    await send(start_message)
+                    await send(message)
+                    return
+
+                headers["content-encoding"] = encoding
+                add_vary_accept_encoding(headers)
+                _weaken_etag(headers)
+                if not more_body:
+                    # Whole body in one message: compress it in one go
+                    body = compress(body, encoding)
+                    headers["content-length"] = str(len(body))
+                    await send(start_message)
+                    await send({"type": "http.response.body", "body": body})
+                    return
+
+                del headers["content-length"]
+                compressor = _StreamCompressor(encoding)
+                await send(start_message)
+                start_message = None
+
+            data = compressor.chunk(body) if body else b""
+            if not more_body:
+                data += compressor.finish()
+            await send({"type": "http.response.body", "body": data, "more_body": more_body})
+
+        await self.app(scope, receive, send_compressed)
+
+
+_precompressed = OrderedDict()
+_precompressed_lock = threading.Lock()
+
+
+def precompressed_json_response(request: Request, cache_key: str, build_body) -> RawJSONResponse:
+    """
+    JSON response for a cached payload, compressed once per cache key and encoding
+
+    Args:
+        request: Incoming request (for Accept-Encoding)
+        cache_key: Identifies this exact body version (e.g. its ETag)
+        build_body: Zero-argument callable returning the identity JSON bytes
+    """
+    body = build_body()
+    encoding = choose_encoding(request.headers.get("accept-encoding"))
+    if encoding is None or len(body) < COMPRESSION_MIN_SIZE:
+        return RawJSONResponse(content=body)
+
+    key = (cache_key, encoding)
+    with _precompressed_lock:
+        compressed = _precompressed.get(key)
+        if compressed is not None:
+            _precompressed.move_to_end(key)
+    if compressed is None:
+        compressed = compress(body, encoding, precompressed=True)
+        with _precompressed_lock:
+            _precompressed[key] = compressed
+            while len(_precompressed) > PRECOMPRESSED_CACHE_SIZE:
+                _precompressed.popitem(last=False)
+
+    return RawJSONResponse(
+        content=compressed,
+        headers={"Content-Encoding": encoding, "Vary": "Accept-Encoding"},
+    )
@@ -1,67 +1,183 @@
 import pandas as pd
 import json
+import threading
 from pathlib import Path
 
+from transcript_store import split_transcript, save_transcript, has_transcript
+from search_index import get_indexed_version, replace_source
+from json_response import dumps, to_python
+from request_metrics import request_phase
+
 CSV_PATH = Path(__file__).parent / "staff_quality_analysis_results.csv"
 
-def load_call_reports():
-    """Load and parse all call reports from CSV"""
+# Parsed reports for the current CSV version, plus the serialized
+# /api/call-reports body. Rebuilt only when the CSV changes; callers must
+# treat the cached reports as read-only.
+_cache = {"version": None, "reports": [], "by_call_id": {}, "payload": None}
+_cache_lock = threading.Lock()
+
+
+def get_csv_version():
+    """Fingerprint of the call CSV (mtime + size), changes whenever the file is rewritten"""
+    stat = CSV_PATH.stat()
+    return f"{stat.st_mtime_ns}-{stat.st_size}"
+
+
+def _build_call_report(idx, record):
+    """
+    Build one call report from a CSV record
+
+    Returns:
+        (report, transcript) - the transcript is kept out of the report
+    """
+    # NumPy scalars / NaN become plain Python values once, here
+    row = {key: to_python(value) for key, value in record.items()}
+    
+    # Call numbers repeat across rows, so the row index identifies the report
+    report_id = f"call_{idx}"
+    
+    # Parse the JSON string
     try:
-        df = pd.read_csv(CSV_PATH)
-        reports = []
+        analysis_json = json.loads(row['call_analysis_json'])
+        analysis_json, transcript = split_transcript(analysis_json)
         
-        for _, row in df.iterrows():
-            # Parse the JSON string
-            try:
-                analysis_json = json.loads(row['call_analysis_json'])
-                
-                # Flatten the structure
-                report = {
-                    # Metadata from CSV
-                    "call_id": str(row['CleanNumber']),
-                    "store_name": row['Store Name'],
-                    "locality": row['Locality'],
-                    "city": row['City'],
-                    "state": row['State'],
-                    "region": row['Region'],
-                    "recording_url": row['Recording URL'],
-                    "duration_seconds": row['Duration'],
-                    "call_date": row['Date'],
-                    "month": row['Month'],
-                    "is_converted": bool(row['is_converted']),
-                    
-                    # Analysis data - flattened
-                    "analysis": analysis_json if not isinstance(analysis_json, str) else {"error": analysis_json}
-                }
-                
-                reports.append(report)
-            except json.JSONDecodeError:
-                # Handle error cases
-                reports.append({
-                    "call_id": str(row['CleanNumber']),
-                    "store_name": row['Store Name'],
-                    "city": row['City'],
-                    "state": row['State'],
-                    "region": row['Region'],
-                    "call_date": row['Date'],
-                    "duration_seconds": row['Duration'],
-                    "is_converted": bool(row['is_converted']),
-                    "analysis": {"error": row['call_analysis_json']}
-                })
-        
-        return reports
+        # Flatten the structure
+        report = {
+            # Metadata from CSV
+            "report_id": report_id,
+            "call_id": str(row['CleanNumber']),
+            "store_name": row['Store Name'],
+            "locality": row['Locality'],
+            "city": row['City'],
+            "state": row['State'],
+            "region": row['Region'],
+            "recording_url": row['Recording URL'],
+            "duration_seconds": row['Duration'],
+            "call_date": row['Date'],
+            "month": row['Month'],
+            "is_converted": bool(row['is_converted']),
+            
+            # Analysis data - flattened
+            "analysis": analysis_json if not isinstance(analysis_json, str) else {"error": analysis_json},
+            "has_transcript": transcript is not None
+        }
+        return report, transcript
+    except (json.JSONDecodeError, TypeError):
+        # Handle error cases
+        return {
+            "report_id": report_id,
+            "call_id": str(row['CleanNumber']),
+            "store_name": row['Store Name'],
+            "city": row['City'],
+            "state": row['State'],
+            "region": row['Region'],
+            "call_date": row['Date'],
+            "duration_seconds": row['Duration'],
+            "is_converted": bool(row['is_converted']),
+            "analysis": {"error": row['call_analysis_json']},
+            "has_transcript": False
+        }, None
+
+
+def _parse_call_reports(version):
+    """
+    Parse every call report from the CSV
+
+    Transcripts are left out of the returned reports. They (and the search
+    index) are rewritten when the CSV version differs from the indexed
+    one; otherwise only missing transcripts are written.
+    """
+    changed = get_indexed_version("call") != version
+    index_documents = [] if changed else None
+    df = pd.read_csv(CSV_PATH)
+    reports = []
+    
+    for idx, record in enumerate(df.to_dict('records')):
+        report, transcript = _build_call_report(idx, record)
+        if transcript is not None and (changed or not has_transcript(report["report_id"])):
+            save_transcript(report["report_id"], transcript)
+        if index_documents is not None:
+            index_documents.append((report["report_id"], report["store_name"], report["analysis"], transcript))
+        reports.append(report)
+    
+    if index_documents is not None:
+        replace_source("call", index_documents, version)
+    return reports
+
+
+def iter_call_reports(include_transcripts: bool = False, chunk_size: int = 500):
+    """
+    Yield call reports straight from the CSV, a chunk at a time
+
+    Used for exports: memory stays bounded by chunk_size regardless of the
+    CSV size, and nothing is cached.
+    """
+    idx = 0
+    for chunk in pd.read_csv(CSV_PATH, chunksize=chunk_size):
+        for record in chunk.to_dict('records'):
+            report, transcript = _build_call_report(idx, record)
+            if include_transcripts:
+                report["transcript"] = transcript
+            idx += 1
+            yield report
+
+
+def _refresh_cache():
+    """Reparse the CSV if it changed since the cache was built; returns the cache"""
+    version = get_csv_version()
+    if _cache["version"] == version:
+        return _cache
+    
+    with _cache_lock, request_phase("load"):
+        if _cache["version"] != version:
+            reports = _parse_call_reports(version)
+            by_call_id = {}
+            for report in reports:
+                by_call_id.setdefault(report["call_id"], report)
+            _cache.update(version=version, reports=reports, by_call_id=by_call_id, payload=None)
+    return _cache
+
+
+def load_call_reports():
+    """Load all call reports from CSV (cached per CSV version)"""
+    try:
+        return _refresh_cache()["reports"]
     except Exception as e:
         print(f"Error loading CSV: {e}")
         return []
 
 
+def get_call_reports_payload() -> bytes:
+    """Serialized /api/call-reports response body, built once per CSV version"""
+    cache = _refresh_cache()
+    payload = cache["payload"]
+    if payload is None:
+        payload = dumps({
+            "status": "success",
+            "total": len(cache["reports"]),
+            "reports": cache["reports"]
+        })
+        cache["payload"] = payload
+    return payload
+
+
+def sync_call_search_index():
+    """Make sure the search index reflects the current call CSV"""
+    if get_indexed_version("call") != get_csv_version():
+        # The cached reports may be current while the index isn't (e.g.
+        # search_index.db was removed), so rebuild rather than reuse them
+        with _cache_lock:
+            _cache["version"] = None
+        load_call_reports()
+
+
 def get_call_report_by_id(call_id: str):
     """Get a specific call report by call ID"""
-    reports = load_call_reports()
-    for report in reports:
-        if report['call_id'] == call_id:
-            return report
-    return None
+    try:
+        return _refresh_cache()["by_call_id"].get(call_id)
+    except Exception as e:
+        print(f"Error loading CSV: {e}")
+        return None
 
 
 def get_call_stats():
@@ -3,6 +3,12 @@ import os
 from pathlib import Path
 import re
 
+from metrics import timed_stage
+from single_flight import SingleFlight
+
+# Concurrent downloads of one Drive file share a single download
+_download_flights = SingleFlight("drive_download")
+
 
 def extract_file_id(drive_url: str) -> str:
     """
@@ -35,41 +41,45 @@ def download_from_drive(drive_url: str, video_id: str) -> str:
         video_id: Unique identifier for the video
     
     Returns:
-        Path to downloaded video file
+        Path to downloaded video file (for a file already being downloaded,
+        the path of that download)
     """
     try:
         # Extract file ID from URL
         file_id = extract_file_id(drive_url)
         print(f"Extracted file ID: {file_id}")
-        
-        # Create temp directory if not exists
-        temp_dir = Path("temp")
-        temp_dir.mkdir(exist_ok=True)
-        
-        # Output path
-        output_path = temp_dir / f"video_{video_id}.mp4"
-        
-        # Download using gdown
-        # Format: https://drive.google.com/uc?id=FILE_ID
-        download_url = f"https://drive.google.com/uc?id={file_id}"
-        
-        print(f"Downloading from: {download_url}")
-        print(f"Saving to: {output_path}")
-        
-        gdown.download(download_url, str(output_path), quiet=False, fuzzy=True)
-        
-        if output_path.exists():
-            file_size = output_path.stat().st_size / (1024 * 1024)  # Size in MB
-            print(f"Download successful! File size: {file_size:.2f} MB")
-            return str(output_path)
-        else:
-            raise Exception("Download completed but file not found")
-        
+        return _download_flights.do(file_id, _download_file, file_id, video_id)
     except Exception as e:
         print(f"Error downloading from Google Drive: {str(e)}")
         raise Exception(f"Failed to download video: {str(e)}")
 
 
+def _download_file(file_id: str, video_id: str) -> str:
+    # Create temp directory if not exists
+    temp_dir = Path("temp")
+    temp_dir.mkdir(exist_ok=True)
+    
+    # Output path
+    output_path = temp_dir / f"video_{video_id}.mp4"
+    
+    # Download using gdown
+    # Format: https://drive.google.com/uc?id=FILE_ID
+    download_url = f"https://drive.google.com/uc?id={file_id}"
+    
+    print(f"Downloading from: {download_url}")
+    print(f"Saving to: {output_path}")
+    
+    with timed_stage("drive", "download"):
+        gdown.download(download_url, str(output_path), quiet=False, fuzzy=True)
+    
+    if output_path.exists():
+        file_size = output_path.stat().st_size / (1024 * 1024)  # Size in MB
+        print(f"Download successful! File size: {file_size:.2f} MB")
+        return str(output_path)
+    else:
+        raise Exception("Download completed but file not found")
+
+
 if __name__ == "__main__":
     # Test the downloader
     test_url = "https://drive.google.com/file/d/18NPNh32N-hQLcnWcMbkK-ofwrv-i4vcq/view?usp=sharing"
@@ -4,18 +4,89 @@ Flattens the nested call_analysis_json column into separate columns
 """
 
 import pandas as pd
+import argparse
+import csv
 import json
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
+from analysis_prompts import CALL_ANALYSIS_SCHEMA
+
 # File paths
 INPUT_CSV = Path(__file__).parent / "csv data.csv"
 OUTPUT_CSV = Path(__file__).parent / "flattened_call_data.csv"
 
+# Both modes read the input the same way: base columns as text, written
+# back unchanged (dtype inference would turn 123 into 123.0 in a column
+# with a blank, and differently per streamed chunk)
+READ_CSV_OPTIONS = {"dtype": str}
+
+# Base CSV columns carried over as-is (output column -> input column)
+BASE_COLUMNS = {
+    'Store_Name': 'Store Name',
+    'Locality': 'Locality',
+    'City': 'City',
+    'State': 'State',
+    'Region': 'Region',
+    'Recording_URL': 'Recording URL',
+    'Duration_Seconds': 'Duration',
+    'Date': 'Date',
+    'Week_Number': 'WeekNum',
+    'Month': 'Month',
+    'Clean_Number': 'CleanNumber',
+    'Is_Converted': 'is_converted',
+}
+ERROR_COLUMNS = ['Analysis_Error', 'Processed_At']
+OVERFLOW_COLUMN = 'Analysis_Overflow'
+
+# Lists of strings (reasons, questions) get a fixed number of columns
+MAX_LIST_ITEMS = 5
+
+# Chunked processing settings
+DEFAULT_CHUNK_SIZE = 2000
+PROGRESS_INTERVAL_SECONDS = 0.25
+
+
+# Shapes found in csv data.csv besides CALL_ANALYSIS_SCHEMA: some analyses
+# nest SoftSkills_Etiquette under RELAX_Framework or put the improvement
+# areas and transcript under Overall_Summary, and unparseable responses
+# are stored as raw_response + parse_error
+CALL_SCHEMA_VARIANTS = {
+    "Agent_Areas": {
+        "RELAX_Framework": {
+            "SoftSkills_Etiquette": CALL_ANALYSIS_SCHEMA["Agent_Areas"]["SoftSkills_Etiquette"],
+        },
+    },
+    "Overall_Summary": {
+        "Top_3_Improvement_Areas": [],
+        "Transcript_Log": CALL_ANALYSIS_SCHEMA["Transcript_Log"],
+    },
+    "raw_response": "",
+    "parse_error": "",
+}
+
+
+def merge_schemas(schema, extra):
+    """Schema with the keys of extra added (nested objects are merged)"""
+    merged = dict(schema)
+    for key, value in extra.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = merge_schemas(merged[key], value)
+        else:
+            merged.setdefault(key, value)
+    return merged
+
 
 def flatten_json(nested_json, parent_key='', sep='_'):
     """
     Recursively flatten a nested JSON object
     
+    The original data-driven flattener, no longer used for output. It stays
+    as the reference test_flatten_csv.py checks the call plan's columns
+    against.
+    
     Args:
         nested_json: The nested JSON object to flatten
         parent_key: The parent key for nested items
@@ -60,68 +131,268 @@ def flatten_json(nested_json, parent_key='', sep='_'):
     return dict(items)
 
 
-def process_csv():
+class FlattenPlan:
+    """
+    Column plan compiled once from the analysis schema
+
+    Every schema leaf gets a fixed column and a direct accessor (parent node
+    index + key), so flattening a row is one pass over the plan instead of a
+    recursive walk, and the column layout never depends on the data. Keys the
+    schema doesn't know about, or values of an unexpected shape, are collected
+    into the overflow column as JSON.
+    """
+
+    VALUE = 'value'
+    STRINGS = 'strings'
+    COUNT = 'count'
+
+    def __init__(self, schema, sep='_', max_list_items=MAX_LIST_ITEMS):
+        self.sep = sep
+        self.max_list_items = max_list_items
+        self.columns = []
+        # (parent node index, key, flattened name, known child keys)
+        self._nodes = [(None, None, '', frozenset(schema))]
+        # (node index, key, kind, first column index, flattened name)
+        self._fields = []
+        self._compile(schema, 0, '')
+
+    def _compile(self, node, node_idx, parent_key):
+        for key, value in node.items():
+            name = f"{parent_key}{self.sep}{key}" if parent_key else key
+
+            if isinstance(value, dict):
+                self._nodes.append((node_idx, key, name, frozenset(value)))
+                self._compile(value, len(self._nodes) - 1, name)
+                continue
+
+            if isinstance(value, list) and value and isinstance(value[0], dict):
+                # Lists of objects (Transcript_Log) are too large for columns, keep the count
+                kind, columns = self.COUNT, [f"{name}_count"]
+            elif isinstance(value, list):
+                kind = self.STRINGS
+                columns = [f"{name}_{idx}" for idx in range(1, self.max_list_items + 1)]
+                columns.append(f"{name}_count")
+            else:
+                kind, columns = self.VALUE, [name]
+
+            self._fields.append((node_idx, key, kind, len(self.columns), name))
+            self.columns.extend(columns)
+
+    def flatten(self, analysis):
+        """
+        Flatten one analysis object against the plan
+
+        Returns:
+            (values aligned with self.columns, overflow dict keyed by flattened path)
+        """
+        values = [None] * len(self.columns)
+        overflow = {}
+
+        if not isinstance(analysis, dict):
+            overflow['value'] = analysis
+            return values, overflow
+
+        # Resolve every object node once, then read leaves straight off their parent
+        nodes = [analysis]
+        for parent_idx, key, name, _ in self._nodes[1:]:
+            parent = nodes[parent_idx]
+            node = parent.get(key) if parent is not None else None
+            if node is not None and not isinstance(node, dict):
+                overflow[name] = node
+                node = None
+            nodes.append(node)
+
+        for node, (_, _, name, known) in zip(nodes, self._nodes):
+            if node is None:
+                continue
+            for key, value in node.items():
+                if key not in known:
+                    overflow[f"{name}{self.sep}{key}" if name else key] = value
+
+        for node_idx, key, kind, col, name in self._fields:
+            node = nodes[node_idx]
+            if node is None or key not in node:
+                continue
+            value = node[key]
+
+            if kind is self.VALUE:
+                if isinstance(value, (dict, list)):
+                    overflow[name] = value
+                else:
+                    values[col] = value
+            elif kind is self.COUNT:
+                values[col] = len(value) if isinstance(value, list) else 0
+            else:
+                if isinstance(value, str):
+                    value = [value]
+                if not isinstance(value, list) or not all(isinstance(item, str) for item in value):
+                    overflow[name] = value
+                    continue
+                shown = value[:self.max_list_items]
+                values[col:col + len(shown)] = shown
+                values[col + self.max_list_items] = len(value)
+                if len(value) > self.max_list_items:
+                    overflow[name] = value[self.max_list_items:]
+
+        return values, overflow
+
+
+# csv data.csv holds call analyses (report_export.py builds the video plan)
+CALL_ANALYSIS_PLAN = FlattenPlan(merge_schemas(CALL_ANALYSIS_SCHEMA, CALL_SCHEMA_VARIANTS))
+OUTPUT_COLUMNS = list(BASE_COLUMNS) + ERROR_COLUMNS + CALL_ANALYSIS_PLAN.columns + [OVERFLOW_COLUMN]
+
+
+def flatten_record(record, plan=CALL_ANALYSIS_PLAN):
+    """
+    Flatten one input CSV record into a list aligned with OUTPUT_COLUMNS
+
+    Args:
+        record: Dict of input CSV column -> value
+        plan: Compiled FlattenPlan for the analysis JSON
+
+    Returns:
+        List of output values
+    """
+    row = [record.get(column) for column in BASE_COLUMNS.values()]
+    error = processed_at = None
+    values = [None] * len(plan.columns)
+    overflow = None
+
+    # Parse and flatten the call_analysis_json
+    try:
+        analysis_json = json.loads(record['call_analysis_json'])
+
+        # Check if it's an error response
+        if isinstance(analysis_json, dict) and 'error' in analysis_json:
+            error = analysis_json.get('error', '')
+            processed_at = analysis_json.get('processed_at', '')
+        else:
+            values, extra = plan.flatten(analysis_json)
+            if extra:
+                overflow = json.dumps(extra, ensure_ascii=False, default=str)
+
+    except json.JSONDecodeError as e:
+        error = f"JSON Parse Error: {str(e)}"
+    except Exception as e:
+        error = f"Processing Error: {str(e)}"
+
+    row.append(error)
+    row.append(processed_at)
+    row.extend(values)
+    row.append(overflow)
+    return row
+
+
+class ProgressReporter:
+    """Prints row progress, throttled to a few updates per second (total may be None when streaming)"""
+
+    def __init__(self, total=None, interval=PROGRESS_INTERVAL_SECONDS):
+        self.total = total
+        self.interval = interval
+        self.done = 0
+        self.start_time = time.monotonic()
+        self._last_report = 0.0
+
+    def update(self, count):
+        self.done += count
+        now = time.monotonic()
+        if now - self._last_report >= self.interval or self.done == self.total:
+            self._last_report = now
+            elapsed = now - self.start_time
+            rate = self.done / elapsed if elapsed > 0 else 0
+            done = f"{self.done}/{self.total}" if self.total is not None else f"{self.done}"
+            print(f"\r⏳ Processed {done} rows ({rate:,.0f} rows/s)", end="", flush=True)
+
+    def close(self):
+        print()
+
+
+def csv_value(value):
+    """Blank out missing values; anything else is written as-is"""
+    if value is None or (isinstance(value, float) and value != value):
+        return ''
+    return value
+
+
+def flatten_records(records):
+    """
+    Flatten a chunk of input records
+
+    Top-level so it can run in a process pool worker; each worker compiles
+    CALL_ANALYSIS_PLAN once at import.
+    """
+    return [flatten_record(record) for record in records]
+
+
+def iter_flattened_chunks(chunks, workers=1):
+    """
+    Flatten record chunks, yielding row lists in input order
+
+    With workers > 1 at most two chunks per worker are in flight, so a lazy
+    chunk iterator is only read as fast as results are consumed.
+    """
+    if workers <= 1:
+        for records in chunks:
+            yield flatten_records(records)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for records in chunks:
+            pending.append(pool.submit(flatten_records, records))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def write_rows(writer, rows):
+    """Write flattened rows without per-chunk dtype inference, so chunking never changes the output"""
+    writer.writerows([csv_value(value) for value in row] for row in rows)
+
+
+def process_csv(workers=1, chunk_size=DEFAULT_CHUNK_SIZE):
     """
     Process the CSV file and flatten the call_analysis_json column
+
+    Args:
+        workers: Number of worker processes (1 flattens in-process)
+        chunk_size: Rows per chunk handed to a worker
     """
     print(f"Reading CSV from: {INPUT_CSV}")
     
     # Read the CSV file
-    df = pd.read_csv(INPUT_CSV)
+    df = pd.read_csv(INPUT_CSV, **READ_CSV_OPTIONS)
     print(f"Loaded {len(df)} rows")
     
-    # Create a list to store flattened records
+    # Split into chunks; JSON decoding + flattening is the expensive part
+    records = df.to_dict('records')
+    del df
+    chunks = [records[i:i + chunk_size] for i in range(0, len(records), chunk_size)]
+    progress = ProgressReporter(len(records))
+    
     flattened_records = []
+    error_count = 0
+    error_idx = len(BASE_COLUMNS)
     
-    for idx, row in df.iterrows():
-        print(f"Processing row {idx + 1}/{len(df)}: {row['Store Name']}")
-        
-        # Start with the base CSV columns
-        flattened_row = {
-            'Store_Name': row['Store Name'],
-            'Locality': row['Locality'],
-            'City': row['City'],
-            'State': row['State'],
-            'Region': row['Region'],
-            'Recording_URL': row['Recording URL'],
-            'Duration_Seconds': row['Duration'],
-            'Date': row['Date'],
-            'Week_Number': row['WeekNum'],
-            'Month': row['Month'],
-            'Clean_Number': row['CleanNumber'],
-            'Is_Converted': row['is_converted']
-        }
-        
-        # Parse and flatten the call_analysis_json
-        try:
-            analysis_json = json.loads(row['call_analysis_json'])
-            
-            # Check if it's an error response
-            if isinstance(analysis_json, dict) and 'error' in analysis_json:
-                flattened_row['Analysis_Error'] = analysis_json.get('error', '')
-                flattened_row['Processed_At'] = analysis_json.get('processed_at', '')
-            else:
-                # Flatten the nested JSON structure
-                flattened_analysis = flatten_json(analysis_json)
-                flattened_row.update(flattened_analysis)
-        
-        except json.JSONDecodeError as e:
-            print(f"  ⚠️  JSON decode error in row {idx + 1}: {e}")
-            flattened_row['Analysis_Error'] = f"JSON Parse Error: {str(e)}"
-        except Exception as e:
-            print(f"  ⚠️  Error processing row {idx + 1}: {e}")
-            flattened_row['Analysis_Error'] = f"Processing Error: {str(e)}"
-        
-        flattened_records.append(flattened_row)
+    with open(OUTPUT_CSV, 'w', encoding='utf-8', newline='') as out:
+        writer = csv.writer(out)
+        writer.writerow(OUTPUT_COLUMNS)
+        for rows in iter_flattened_chunks(chunks, workers):
+            write_rows(writer, rows)
+            error_count += sum(1 for row in rows if row[error_idx] is not None)
+            flattened_records.extend(rows)
+            progress.update(len(rows))
+    progress.close()
     
-    # Create DataFrame from flattened records
-    flattened_df = pd.DataFrame(flattened_records)
+    # Create DataFrame with the fixed column layout
+    flattened_df = pd.DataFrame(flattened_records, columns=OUTPUT_COLUMNS)
     
-    # Save to new CSV
-    flattened_df.to_csv(OUTPUT_CSV, index=False, encoding='utf-8')
     print(f"\n✓ Successfully saved flattened data to: {OUTPUT_CSV}")
     print(f"✓ Total columns: {len(flattened_df.columns)}")
     print(f"✓ Total rows: {len(flattened_df)}")
+    if error_count:
+        print(f"⚠️  Rows with analysis errors: {error_count}")
     
     # Display column names
     print("\n📋 Column names:")
@@ -131,6 +402,47 @@ def process_csv():
     return flattened_df
 
 
+def stream_csv(workers=1, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Flatten the CSV in constant memory
+
+    Reads the input with chunksize and appends each flattened chunk to the
+    output. The column layout comes from the precompiled plan, so no pass
+    over the data is needed to discover columns. Base columns are read as
+    text and written back unchanged.
+
+    Returns:
+        Dict with row, error and column counts
+    """
+    print(f"Streaming CSV from: {INPUT_CSV}")
+    
+    reader = pd.read_csv(INPUT_CSV, chunksize=chunk_size, **READ_CSV_OPTIONS)
+    chunks = (chunk.to_dict('records') for chunk in reader)
+    progress = ProgressReporter()
+    
+    row_count = 0
+    error_count = 0
+    error_idx = len(BASE_COLUMNS)
+    
+    with open(OUTPUT_CSV, 'w', encoding='utf-8', newline='') as out:
+        writer = csv.writer(out)
+        writer.writerow(OUTPUT_COLUMNS)
+        for rows in iter_flattened_chunks(chunks, workers):
+            write_rows(writer, rows)
+            row_count += len(rows)
+            error_count += sum(1 for row in rows if row[error_idx] is not None)
+            progress.update(len(rows))
+    progress.close()
+    
+    print(f"\n✓ Successfully saved flattened data to: {OUTPUT_CSV}")
+    print(f"✓ Total columns: {len(OUTPUT_COLUMNS)}")
+    print(f"✓ Total rows: {row_count}")
+    if error_count:
+        print(f"⚠️  Rows with analysis errors: {error_count}")
+    
+    return {"rows": row_count, "errors": error_count, "columns": len(OUTPUT_COLUMNS)}
+
+
 def get_column_summary(df):
     """
     Get a summary of all columns and their data types
@@ -145,16 +457,28 @@ def get_column_summary(df):
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Flatten call_analysis_json into columns")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Worker processes for flattening (default: 1)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE,
+                        help=f"Rows per chunk (default: {DEFAULT_CHUNK_SIZE})")
+    parser.add_argument("--stream", action="store_true",
+                        help="Stream chunks to the output in constant memory (skips the column summary)")
+    args = parser.parse_args()
+    
     print("=" * 80)
     print("CSV JSON FLATTENING SCRIPT")
     print("=" * 80)
     print()
     
-    # Process the CSV
-    flattened_df = process_csv()
-    
-    # Show column summary
-    get_column_summary(flattened_df)
+    if args.stream:
+        stream_csv(workers=args.workers, chunk_size=args.chunk_size)
+    else:
+        # Process the CSV
+        flattened_df = process_csv(workers=args.workers, chunk_size=args.chunk_size)
+        
+        # Show column summary
+        get_column_summary(flattened_df)
     
     print("\n" + "=" * 80)
     print("✓ PROCESSING COMPLETE")
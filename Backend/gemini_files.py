@@ -0,0 +1,327 @@
+"""
+Gemini File Registry
+Reuses uploaded Gemini files across retries and re-runs, and deletes them
+in the background once nothing needs them
+
+Uploads are keyed by the sha256 of the file content. A retry or prompt
+re-run of the same recording gets the file already in Gemini storage
+(skipping the upload and the PROCESSING wait) as long as it is not close
+to its expiry. Files nobody has used for GEMINI_FILE_KEEP_SECONDS are
+deleted by a background sweeper, so storage quota doesn't leak; one-shot
+scripts call purge_session() on exit instead. pin() keeps a file past
+this process (a submitted batch job still needs it) until unpin(). The registry is saved to
+disk, and every change re-reads it under a file lock, so the server and
+the CLI share it without overwriting each other's entries.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+import google.generativeai as genai
+
+from gemini_limiter import gemini_limiter
+from metrics import REGISTRY
+from single_flight import SingleFlight
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows: the thread lock still applies within a process
+    fcntl = None
+
+GEMINI_FILE_REGISTRY = Path(os.getenv("GEMINI_FILE_REGISTRY", str(Path(__file__).parent / "gemini_files.json")))
+# Unused files are deleted this long after their last use
+GEMINI_FILE_KEEP_SECONDS = float(os.getenv("GEMINI_FILE_KEEP_SECONDS", "3600"))
+# Files closer than this to expiring are uploaded again rather than reused
+GEMINI_FILE_REUSE_MARGIN_SECONDS = float(os.getenv("GEMINI_FILE_REUSE_MARGIN_SECONDS", "3600"))
+# Gemini keeps uploaded files for 48 hours
+GEMINI_FILE_LIFETIME_SECONDS = 48 * 3600
+SWEEP_INTERVAL_SECONDS = 300
+PROCESSING_POLL_SECONDS = 2
+HASH_CHUNK_BYTES = 1024 * 1024
+
+GEMINI_FILE_UPLOADS = REGISTRY.counter(
+    "gemini_file_uploads_total",
+    "Gemini file requests by whether an uploaded file was reused",
+    ("result",),
+)
+GEMINI_FILE_DELETES = REGISTRY.counter(
+    "gemini_file_deletes_total",
+    "Uploaded Gemini files deleted by the registry",
+    ("result",),
+)
+
+
+def file_sha256(path) -> str:
+    """Content hash of a local file"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_BYTES), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _expiry(file, uploaded_at: float) -> float:
+    expiration = getattr(file, "expiration_time", None)
+    if isinstance(expiration, datetime):
+        return expiration.timestamp()
+    return uploaded_at + GEMINI_FILE_LIFETIME_SECONDS
+
+
+class GeminiFileRegistry:
+    """
+    Content hash -> uploaded Gemini file, with use counts and expiry
+
+    acquire() returns an ACTIVE file for a local path, uploading it only
+    when no valid handle exists; pair each acquire() with a release().
+    Thread-safe. client is the google.generativeai module (or a stand-in
+    with upload_file / get_file / delete_file).
+    """
+
+    def __init__(self, path: Path = GEMINI_FILE_REGISTRY, keep_seconds: float = GEMINI_FILE_KEEP_SECONDS,
+                 reuse_margin: float = GEMINI_FILE_REUSE_MARGIN_SECONDS, client=genai, sleep=time.sleep):
+        self.path = Path(path)
+        self.keep_seconds = keep_seconds
+        self.reuse_margin = reuse_margin
+        self.client = client
+        self._sleep = sleep
+        self._refs = {}
+        # Digests this process has acquired (purge_session deletes them)
+        self._session = set()
+        self._lock = threading.Lock()
+        self._flights = SingleFlight("gemini_file")
+        self._sweeper = None
+        self._stop = threading.Event()
+
+    @contextmanager
+    def _store(self):
+        """
+        The registry as on disk, written back if the caller changes it
+
+        Holds the thread lock and an exclusive lock on a sidecar file, so
+        read-modify-write cycles from other processes don't interleave.
+        """
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path.with_name(self.path.name + ".lock"), "a") as lock_file:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    original = self.path.read_text(encoding="utf-8")
+                    entries = json.loads(original)
+                except (OSError, ValueError):
+                    original, entries = None, {}
+                yield entries
+                updated = json.dumps(entries, indent=2)
+                if updated != original:
+                    tmp = self.path.with_name(self.path.name + ".tmp")
+                    tmp.write_text(updated, encoding="utf-8")
+                    os.replace(tmp, self.path)
+
+    def entries(self) -> dict:
+        with self._store() as entries:
+            return {digest: dict(entry) for digest, entry in entries.items()}
+
+    def acquire(self, path, mime_type: str = None, content_hash: str = None):
+        """
+        Uploaded, ACTIVE Gemini file for a local file
+
+        Args:
+            path: Local file to upload
+            mime_type: Passed to upload_file when given
+            content_hash: sha256 of the file, if the caller already has it
+
+        Raises:
+            ValueError when Gemini fails to process the upload
+        """
+        self._start_sweeper()
+        digest = content_hash or file_sha256(path)
+        with self._lock:
+            self._refs[digest] = self._refs.get(digest, 0) + 1
+            self._session.add(digest)
+        try:
+            file = self._flights.do(digest, self._get_or_upload, digest, path, mime_type)
+        except BaseException:
+            self._drop_ref(digest)
+            raise
+        return file
+
+    def release(self, file_or_hash):
+        """Done with a file from acquire(); it is deleted once unused for keep_seconds"""
+        digest = file_or_hash if isinstance(file_or_hash, str) else self._digest_for(file_or_hash.name)
+        if digest is not None:
+            self._drop_ref(digest)
+
+    def _drop_ref(self, digest: str):
+        with self._store() as entries:
+            self._refs[digest] = self._refs.get(digest, 1) - 1
+            if self._refs[digest] <= 0:
+                del self._refs[digest]
+            entry = entries.get(digest)
+            if entry is not None:
+                entry["last_used_at"] = time.time()
+
+    def pin(self, file_or_hash) -> Optional[str]:
+        """
+        Keep a file from being deleted until unpin(), across processes
+
+        Returns:
+            The file's content hash, for the matching unpin()
+        """
+        digest = file_or_hash if isinstance(file_or_hash, str) else self._digest_for(file_or_hash.name)
+        with self._store() as entries:
+            entry = entries.get(digest)
+            if entry is None:
+                return None
+            entry["pins"] = entry.get("pins", 0) + 1
+        return digest
+
+    def unpin(self, digest: str):
+        """Undo one pin(); the file is deleted once unused for keep_seconds"""
+        with self._store() as entries:
+            entry = entries.get(digest)
+            if entry is not None:
+                entry["pins"] = max(0, entry.get("pins", 0) - 1)
+                entry["last_used_at"] = time.time()
+
+    def _digest_for(self, name: str) -> Optional[str]:
+        with self._store() as entries:
+            for digest, entry in entries.items():
+                if entry["name"] == name:
+                    return digest
+        return None
+
+    def _get_or_upload(self, digest: str, path, mime_type: str):
+        now = time.time()
+        with self._store() as entries:
+            entry = entries.get(digest)
+        if entry is not None and entry["expires_at"] > now + self.reuse_margin:
+            try:
+                file = gemini_limiter.call("get_file", self.client.get_file, entry["name"])
+            except Exception as e:
+                # Deleted or expired on Gemini's side
+                print(f"⚠️  Uploaded file {entry['name']} is gone ({str(e)[:60]}), uploading again")
+                with self._store() as entries:
+                    entries.pop(digest, None)
+            else:
+                if file.state.name == "ACTIVE":
+                    GEMINI_FILE_UPLOADS.inc(result="reused")
+                    self._record(digest, file, entry["uploaded_at"])
+                    return file
+
+        kwargs = {"mime_type": mime_type} if mime_type else {}
+        file = gemini_limiter.call("upload", self.client.upload_file, str(path), **kwargs)
+        uploaded_at = time.time()
+        while file.state.name == "PROCESSING":
+            self._sleep(PROCESSING_POLL_SECONDS)
+            file = gemini_limiter.call("get_file", self.client.get_file, file.name)
+        if file.state.name == "FAILED":
+            self._delete(file.name)
+            raise ValueError(f"Gemini file processing failed: {file.name}")
+        GEMINI_FILE_UPLOADS.inc(result="uploaded")
+        stale = self._record(digest, file, uploaded_at)
+        if stale is not None and stale != file.name:
+            self._delete(stale)
+        return file
+
+    def _record(self, digest: str, file, uploaded_at: float) -> Optional[str]:
+        """Store the handle for digest; returns the file name it replaced, if any"""
+        with self._store() as entries:
+            previous = entries.get(digest, {}).get("name")
+            pins = entries.get(digest, {}).get("pins", 0)
+            entries[digest] = {
+                "name": file.name,
+                "uri": getattr(file, "uri", None),
+                "uploaded_at": uploaded_at,
+                "expires_at": _expiry(file, uploaded_at),
+                "last_used_at": time.time(),
+                "pins": pins,
+            }
+        return previous
+
+    def _delete(self, name: str) -> bool:
+        try:
+            gemini_limiter.call("delete_file", self.client.delete_file, name)
+        except Exception as e:
+            GEMINI_FILE_DELETES.inc(result="failed")
+            print(f"⚠️  Could not delete Gemini file {name}: {str(e)[:60]}")
+            return False
+        GEMINI_FILE_DELETES.inc(result="deleted")
+        return True
+
+    def sweep(self, now: float = None) -> int:
+        """
+        Delete files unused for keep_seconds and forget expired ones
+
+        Returns:
+            Number of files deleted
+        """
+        now = time.time() if now is None else now
+        with self._store() as entries:
+            expired = [digest for digest, entry in entries.items() if entry["expires_at"] <= now]
+            idle = [
+                (digest, entry["name"]) for digest, entry in entries.items()
+                if digest not in self._refs and not entry.get("pins") and entry["expires_at"] > now
+                and entry["last_used_at"] + self.keep_seconds <= now
+            ]
+            # Gemini has already removed expired files
+            for digest in expired:
+                del entries[digest]
+        return self._delete_unused(idle)
+
+    def purge_session(self) -> int:
+        """
+        Delete every file this process acquired and no longer holds or pins
+
+        For one-shot scripts, whose sweeper thread dies with them.
+
+        Returns:
+            Number of files deleted
+        """
+        with self._store() as entries:
+            owned = [
+                (digest, entries[digest]["name"]) for digest in self._session
+                if digest in entries and digest not in self._refs and not entries[digest].get("pins")
+            ]
+        return self._delete_unused(owned)
+
+    def _delete_unused(self, candidates) -> int:
+        deleted = 0
+        for digest, name in candidates:
+            if self._flights.in_flight(digest) or not self._delete(name):
+                continue
+            deleted += 1
+            with self._store() as entries:
+                self._session.discard(digest)
+                # Unless it was reacquired (and maybe re-uploaded) meanwhile
+                entry = entries.get(digest, {})
+                if digest not in self._refs and not entry.get("pins") and entry.get("name") == name:
+                    del entries[digest]
+        return deleted
+
+    def _start_sweeper(self):
+        with self._lock:
+            if self._sweeper is not None:
+                return
+            self._sweeper = threading.Thread(target=self._sweep_loop, name="gemini-file-sweeper", daemon=True)
+            self._sweeper.start()
+
+    def _sweep_loop(self):
+        while not self._stop.wait(SWEEP_INTERVAL_SECONDS):
+            try:
+                self.sweep()
+            except Exception as e:
+                print(f"⚠️  Gemini file sweep failed: {e}")
+
+    def close(self):
+        self._stop.set()
+
+
+# Shared by every Gemini caller in the process
+gemini_files = GeminiFileRegistry()
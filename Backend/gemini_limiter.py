@@ -0,0 +1,277 @@
+"""
+Gemini Rate Limiting
+Client-side request pacing and adaptive concurrency shared by every
+Gemini call (generate_content, upload_file, ...)
+
+- A token bucket keeps requests under the per-minute quota (RPM), and an
+  optional second bucket tracks tokens per minute (TPM) from actual usage.
+- AIMD concurrency: the number of calls allowed in flight grows by one
+  per window of successes and halves on 429 / 503, so throughput settles
+  just under quota without hand tuning.
+- Retryable errors (rate limits, overload, timeouts, 5xx) are retried
+  with full-jitter exponential backoff instead of failing the video.
+- Calls made inside background_calls() (the preprocessing backlog) give
+  way to interactive calls waiting for a concurrency slot.
+"""
+
+import contextvars
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+from metrics import REGISTRY
+
+GEMINI_RPM = float(os.getenv("GEMINI_RPM", "60"))
+# 0 disables the tokens-per-minute bucket
+GEMINI_TPM = float(os.getenv("GEMINI_TPM", "0"))
+GEMINI_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", "8"))
+GEMINI_INITIAL_CONCURRENCY = int(os.getenv("GEMINI_INITIAL_CONCURRENCY", "2"))
+GEMINI_MAX_ATTEMPTS = int(os.getenv("GEMINI_MAX_ATTEMPTS", "6"))
+
+BACKOFF_BASE_SECONDS = 2.0
+BACKOFF_MAX_SECONDS = 60.0
+
+# HTTP status codes worth retrying; 429 and 503 also mean "slow down"
+OVERLOAD_STATUS_CODES = (429, 503)
+RETRYABLE_STATUS_CODES = (408, 429, 500, 502, 503, 504)
+RETRYABLE_MESSAGES = ("429", "503", "resource exhausted", "rate limit", "quota", "overloaded", "unavailable", "deadline exceeded", "timed out")
+
+GEMINI_RETRIES = REGISTRY.counter(
+    "gemini_retries_total",
+    "Gemini calls retried after a retryable error",
+    ("operation", "reason"),
+)
+GEMINI_CONCURRENCY_LIMIT = REGISTRY.gauge(
+    "gemini_concurrency_limit",
+    "Current adaptive limit on concurrent Gemini calls",
+)
+GEMINI_LIMITER_WAIT = REGISTRY.histogram(
+    "gemini_limiter_wait_seconds",
+    "Time calls spent waiting for the rate limiter and a concurrency slot",
+    ("operation",),
+)
+
+_background = contextvars.ContextVar("gemini_background_calls", default=False)
+
+
+@contextmanager
+def background_calls():
+    """Mark Gemini calls made in this context as background work"""
+    token = _background.set(True)
+    try:
+        yield
+    finally:
+        _background.reset(token)
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket refilled continuously at rate_per_minute
+
+    debit() may take the balance negative (for costs only known after the
+    call, like tokens used); later acquire() calls wait until it recovers.
+    """
+
+    def __init__(self, rate_per_minute: float, capacity: float = None, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else max(rate_per_minute / 60.0, 1.0)
+        self._tokens = self.capacity
+        self._clock = clock
+        self._sleep = sleep
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = self._clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, amount: float = 1.0):
+        """Block until amount tokens are available, then take them"""
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= amount:
+                    self._tokens -= amount
+                    return
+                wait = (amount - self._tokens) / self.rate
+            self._sleep(wait)
+
+    def debit(self, amount: float):
+        with self._lock:
+            self._refill()
+            self._tokens -= amount
+
+
+class AdaptiveConcurrency:
+    """
+    AIMD limit on concurrent calls
+
+    Each success adds 1/limit (so +1 per limit's worth of successes); an
+    overload signal halves the limit. Only calls started after the latest
+    decrease can trigger another one, so a burst of 429s from calls that
+    were already in flight counts as a single signal.
+
+    Background callers don't take a free slot while an interactive caller
+    is waiting for one.
+    """
+
+    def __init__(self, initial: int, minimum: int = 1, maximum: int = 8, decrease_factor: float = 0.5):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.decrease_factor = decrease_factor
+        self._limit = float(min(max(initial, minimum), maximum))
+        self._in_flight = 0
+        self._interactive_waiting = 0
+        self._generation = 0
+        self._condition = threading.Condition()
+        GEMINI_CONCURRENCY_LIMIT.set(self.limit)
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def acquire(self, background: bool = False) -> int:
+        """Wait for a slot; returns the generation to pass to on_overload()"""
+        with self._condition:
+            if background:
+                while self._in_flight >= self.limit or self._interactive_waiting:
+                    self._condition.wait()
+            else:
+                self._interactive_waiting += 1
+                try:
+                    while self._in_flight >= self.limit:
+                        self._condition.wait()
+                finally:
+                    self._interactive_waiting -= 1
+                    self._condition.notify_all()
+            self._in_flight += 1
+            return self._generation
+
+    def release(self):
+        with self._condition:
+            self._in_flight -= 1
+            self._condition.notify_all()
+
+    def on_success(self):
+        with self._condition:
+            self._limit = min(self.maximum, self._limit + 1.0 / max(self._limit, 1.0))
+            self._condition.notify_all()
+        GEMINI_CONCURRENCY_LIMIT.set(self.limit)
+
+    def on_overload(self, generation: int):
+        with self._condition:
+            if generation != self._generation:
+                return
+            self._generation += 1
+            self._limit = max(self.minimum, self._limit * self.decrease_factor)
+        GEMINI_CONCURRENCY_LIMIT.set(self.limit)
+
+
+def _status_code(error):
+    # google.api_core exceptions carry the HTTP status as .code
+    for attribute in ("code", "status_code"):
+        value = getattr(error, attribute, None)
+        if isinstance(value, int):
+            return value
+    return None
+
+
+def classify_error(error):
+    """
+    Returns:
+        (retryable, overload) for an exception raised by a Gemini call
+    """
+    status = _status_code(error)
+    if status is not None:
+        return status in RETRYABLE_STATUS_CODES, status in OVERLOAD_STATUS_CODES
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True, False
+    message = str(error).lower()
+    retryable = any(fragment in message for fragment in RETRYABLE_MESSAGES)
+    overload = retryable and any(fragment in message for fragment in ("429", "503", "resource exhausted", "rate limit", "quota", "overloaded"))
+    return retryable, overload
+
+
+def is_retryable_error(error) -> bool:
+    """True if the error, or any error it was raised from, is worth retrying later"""
+    while error is not None:
+        if classify_error(error)[0]:
+            return True
+        error = error.__cause__
+    return False
+
+
+class GeminiLimiter:
+    """Rate limiter + adaptive concurrency + retries around Gemini calls"""
+
+    def __init__(self, rpm: float = GEMINI_RPM, tpm: float = GEMINI_TPM,
+                 initial_concurrency: int = GEMINI_INITIAL_CONCURRENCY,
+                 max_concurrency: int = GEMINI_MAX_CONCURRENCY,
+                 max_attempts: int = GEMINI_MAX_ATTEMPTS,
+                 backoff_base: float = BACKOFF_BASE_SECONDS, backoff_max: float = BACKOFF_MAX_SECONDS,
+                 sleep=time.sleep):
+        self.requests = TokenBucket(rpm, sleep=sleep)
+        self.tokens = TokenBucket(tpm, capacity=tpm, sleep=sleep) if tpm else None
+        self.concurrency = AdaptiveConcurrency(initial_concurrency, maximum=max_concurrency)
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._sleep = sleep
+
+    def backoff(self, attempt: int) -> float:
+        """Full-jitter exponential backoff for the given (1-based) attempt"""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** (attempt - 1)))
+
+    def call(self, operation: str, fn, *args, **kwargs):
+        """
+        Run fn(*args, **kwargs) under the limiter, retrying retryable errors
+
+        Args:
+            operation: Label for metrics ("generate", "upload", ...)
+            fn: The Gemini call
+
+        Raises:
+            The last error when it isn't retryable or attempts run out
+        """
+        for attempt in range(1, self.max_attempts + 1):
+            start = time.perf_counter()
+            self.requests.acquire()
+            if self.tokens is not None:
+                # Only waits while earlier calls' token usage is still being paid off
+                self.tokens.acquire(0)
+            generation = self.concurrency.acquire(background=_background.get())
+            GEMINI_LIMITER_WAIT.observe(time.perf_counter() - start, operation=operation)
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                retryable, overload = classify_error(e)
+                if overload:
+                    self.concurrency.on_overload(generation)
+                if not retryable or attempt == self.max_attempts:
+                    raise
+                GEMINI_RETRIES.inc(operation=operation, reason="overload" if overload else "transient")
+                delay = self.backoff(attempt)
+                print(f"⚠️  Gemini {operation} failed ({str(e)[:80]}), retry {attempt}/{self.max_attempts - 1} in {delay:.1f}s")
+            else:
+                self.concurrency.on_success()
+                self._record_tokens(result)
+                return result
+            finally:
+                self.concurrency.release()
+            self._sleep(delay)
+
+    def _record_tokens(self, result):
+        usage = getattr(result, "usage_metadata", None)
+        if self.tokens is not None and usage is not None:
+            self.tokens.debit(getattr(usage, "total_token_count", 0) or 0)
+
+
+# Shared by every Gemini caller in the process
+gemini_limiter = GeminiLimiter()
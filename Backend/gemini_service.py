@@ -1,10 +1,15 @@
 import google.generativeai as genai
 import os
 import json
-import time
 from dotenv import load_dotenv
 from pathlib import Path
 
+from metrics import timed_stage
+from gemini_limiter import gemini_limiter
+from gemini_files import gemini_files
+from prompt_cache import prompt_cache
+from gemini_usage import USAGE_KEY, usage_from_response
+
 # Load environment variables
 load_dotenv()
 
@@ -385,28 +390,22 @@ def upload_video_to_gemini(video_path: str):
     """
     Upload video file to Gemini API
     
+    A file with the same content uploaded earlier is reused while it is
+    still valid. Hand the result to gemini_files.release() when done.
+    
     Args:
         video_path: Path to video file
     
     Returns:
-        Uploaded file object
+        Uploaded file object, processed (ACTIVE)
     """
     print(f"Uploading video to Gemini: {video_path}")
     
-    # Upload the file
-    video_file = genai.upload_file(path=video_path)
-    print(f"Upload complete! File URI: {video_file.uri}")
-    
-    # Wait for the file to be processed
-    print("Waiting for video processing...")
-    while video_file.state.name == "PROCESSING":
-        time.sleep(2)
-        video_file = genai.get_file(video_file.name)
+    # Upload the file and wait for it to be processed
+    with timed_stage("gemini", "upload"):
+        video_file = gemini_files.acquire(video_path)
     
-    if video_file.state.name == "FAILED":
-        raise ValueError(f"Video processing failed: {video_file.state.name}")
-    
-    print(f"Video processed successfully! State: {video_file.state.name}")
+    print(f"Video ready! File URI: {video_file.uri}, State: {video_file.state.name}")
     return video_file
 
 
@@ -420,34 +419,47 @@ def analyze_video_with_gemini(video_path: str) -> dict:
     Returns:
         Analysis result as dictionary
     """
+    video_file = None
     try:
         # Upload video to Gemini
         video_file = upload_video_to_gemini(video_path)
         
-        # Create the model
-        model = genai.GenerativeModel(model_name=MODEL_NAME)
+        # Create the model; with the prompt cached only the video is sent
+        model = prompt_cache.model(MODEL_NAME, "gemini_service_analysis", ANALYSIS_PROMPT)
+        if model is not None:
+            contents = [video_file]
+        else:
+            model = genai.GenerativeModel(model_name=MODEL_NAME)
+            contents = [video_file, ANALYSIS_PROMPT]
         
         print("Sending analysis request to Gemini...")
         
         # Generate content with video and prompt
-        response = model.generate_content(
-            [video_file, ANALYSIS_PROMPT],
-            request_options={"timeout": 600}  # 10 minute timeout
-        )
+        with timed_stage("gemini", "generate") as generate_span:
+            response = gemini_limiter.call(
+                "generate", model.generate_content,
+                contents,
+                request_options={"timeout": 600}  # 10 minute timeout
+            )
         
         print("Analysis complete! Processing response...")
+        usage = usage_from_response(response, MODEL_NAME, generate_span.seconds)
         
         # Extract JSON from response
         response_text = response.text
         
-        # Clean up response (remove markdown code blocks if present)
-        if "```json" in response_text:
-            response_text = response_text.split("```json")[1].split("```")[0].strip()
-        elif "```" in response_text:
-            response_text = response_text.split("```")[1].split("```")[0].strip()
+        with timed_stage("gemini", "parse"):
+            # Clean up response (remove markdown code blocks if present)
+            if "```json" in response_text:
+                response_text = response_text.split("```json")[1].split("```")[0].strip()
+            elif "```" in response_text:
+                response_text = response_text.split("```")[1].split("```")[0].strip()
+            
+            # Parse JSON
+            analysis_result = json.loads(response_text)
         
-        # Parse JSON
-        analysis_result = json.loads(response_text)
+        if isinstance(analysis_result, dict):
+            analysis_result[USAGE_KEY] = usage
         
         print("✓ Analysis successful!")
         return analysis_result
@@ -455,11 +467,16 @@ def analyze_video_with_gemini(video_path: str) -> dict:
     except json.JSONDecodeError as e:
         print(f"Error parsing JSON response: {e}")
         print(f"Response text: {response_text[:500]}...")
-        raise Exception(f"Failed to parse Gemini response as JSON: {str(e)}")
+        raise Exception(f"Failed to parse Gemini response as JSON: {str(e)}") from e
     
     except Exception as e:
         print(f"Error during Gemini analysis: {str(e)}")
-        raise Exception(f"Gemini analysis failed: {str(e)}")
+        raise Exception(f"Gemini analysis failed: {str(e)}") from e
+    
+    finally:
+        # Kept for a while so a retry reuses it, then deleted in the background
+        if video_file is not None:
+            gemini_files.release(video_file)
 
 
 if __name__ == "__main__":
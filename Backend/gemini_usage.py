@@ -0,0 +1,225 @@
+"""
+Gemini Usage Accounting
+Token counts, latency and cost for each Gemini analysis, aggregated per
+store and day, plus a pre-flight estimate for the pending backlog
+
+Each analysis carries its usage in an "Analysis_Metadata" block, so the
+numbers live alongside the result they belong to.
+"""
+
+import json
+import os
+from collections import defaultdict
+from datetime import datetime
+from statistics import median
+
+from metrics import REGISTRY
+
+USAGE_KEY = "Analysis_Metadata"
+
+# USD per 1M tokens (input, output) at list price for prompts up to 128k
+# tokens; override with GEMINI_PRICING='{"model": [input, output], ...}'
+DEFAULT_PRICING = {
+    "gemini-1.5-flash": (0.075, 0.30),
+    "gemini-1.5-pro": (1.25, 5.00),
+    "gemini-2.0-flash": (0.10, 0.40),
+    "gemini-2.5-flash": (0.30, 2.50),
+    "gemini-2.5-pro": (1.25, 10.00),
+}
+PRICING = {**DEFAULT_PRICING, **{
+    model: tuple(prices) for model, prices in json.loads(os.getenv("GEMINI_PRICING", "{}")).items()
+}}
+
+# Batch API requests are billed at half the interactive price
+BATCH_PRICE_FACTOR = 0.5
+
+# Used by the estimator until there is history to learn from: Gemini
+# tokenizes video at roughly 300 tokens per second (frames + audio)
+DEFAULT_TOKENS_PER_VIDEO_SECOND = 300
+DEFAULT_OUTPUT_TOKENS = 2500
+DEFAULT_SECONDS_PER_ANALYSIS = 30.0
+
+GEMINI_TOKENS = REGISTRY.counter(
+    "gemini_tokens_total",
+    "Tokens consumed by Gemini analyses",
+    ("model", "kind"),
+)
+
+
+def parse_duration(value) -> int:
+    """Seconds in an 'HH:MM:SS' / 'MM:SS' duration (numbers pass through); None if unparseable"""
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return None if value != value else int(value)
+    try:
+        seconds = 0
+        for part in str(value).strip().split(":"):
+            seconds = seconds * 60 + int(float(part))
+        return seconds
+    except ValueError:
+        return None
+
+
+def usage_from_response(response, model_name: str, latency_seconds: float, mode: str = "interactive") -> dict:
+    """Usage record for a generate_content response ("batch" mode for Batch API results)"""
+    usage = getattr(response, "usage_metadata", None)
+    prompt_tokens = getattr(usage, "prompt_token_count", 0) or 0
+    output_tokens = getattr(usage, "candidates_token_count", 0) or 0
+    record = {
+        "model": model_name,
+        "prompt_tokens": prompt_tokens,
+        "output_tokens": output_tokens,
+        "cached_tokens": getattr(usage, "cached_content_token_count", 0) or 0,
+        "total_tokens": getattr(usage, "total_token_count", 0) or prompt_tokens + output_tokens,
+        "latency_seconds": round(latency_seconds, 3),
+        "mode": mode,
+        "analyzed_at": datetime.now().isoformat(),
+    }
+    cost = estimate_cost(model_name, prompt_tokens, output_tokens)
+    if cost is not None and mode == "batch":
+        cost = round(cost * BATCH_PRICE_FACTOR, 6)
+    record["cost_usd"] = cost
+
+    GEMINI_TOKENS.inc(prompt_tokens, model=model_name, kind="prompt")
+    GEMINI_TOKENS.inc(output_tokens, model=model_name, kind="output")
+    return record
+
+
+def estimate_cost(model_name: str, prompt_tokens: int, output_tokens: int):
+    """Cost in USD at list price, or None for a model without pricing"""
+    prices = PRICING.get(_base_model(model_name))
+    if prices is None:
+        return None
+    return round((prompt_tokens * prices[0] + output_tokens * prices[1]) / 1_000_000, 6)
+
+
+def _base_model(model_name: str) -> str:
+    # "models/gemini-1.5-flash-002" and "gemini-1.5-flash-latest" price like "gemini-1.5-flash"
+    name = (model_name or "").removeprefix("models/")
+    for model in sorted(PRICING, key=len, reverse=True):
+        if name.startswith(model):
+            return model
+    return name
+
+
+def summarize_usage(reports) -> dict:
+    """
+    Aggregate usage by store and day (of analysis)
+
+    Args:
+        reports: Video reports with store_name, duration and analysis_data
+
+    Returns:
+        Dict with per-group rows and overall totals, including tokens per
+        second of video and cost
+    """
+    groups = defaultdict(lambda: defaultdict(float))
+    for report in reports:
+        usage = (report.get("analysis_data") or {}).get(USAGE_KEY)
+        if not usage:
+            continue
+        day = (usage.get("analyzed_at") or "")[:10] or "unknown"
+        key = (report.get("store_name") or "Unknown", day)
+        _accumulate(groups[key], usage, parse_duration(report.get("duration")))
+
+    rows = [
+        {"store_name": store_name, "day": day, **_finish(values)}
+        for (store_name, day), values in sorted(groups.items())
+    ]
+    totals = defaultdict(float)
+    for values in groups.values():
+        for field, value in values.items():
+            totals[field] += value
+    return {"groups": rows, "totals": _finish(totals)}
+
+
+def _accumulate(values, usage, duration_seconds):
+    values["videos"] += 1
+    values["prompt_tokens"] += usage.get("prompt_tokens", 0)
+    values["output_tokens"] += usage.get("output_tokens", 0)
+    values["total_tokens"] += usage.get("total_tokens", 0)
+    values["latency_seconds"] += usage.get("latency_seconds", 0)
+    values["cost_usd"] += usage.get("cost_usd") or 0
+    if duration_seconds:
+        values["video_seconds"] += duration_seconds
+        values["timed_tokens"] += usage.get("total_tokens", 0)
+
+
+def _finish(values) -> dict:
+    videos = int(values["videos"])
+    video_seconds = values["video_seconds"]
+    return {
+        "videos": videos,
+        "video_seconds": int(video_seconds),
+        "prompt_tokens": int(values["prompt_tokens"]),
+        "output_tokens": int(values["output_tokens"]),
+        "total_tokens": int(values["total_tokens"]),
+        # Only videos with a known duration count towards the rate
+        "tokens_per_video_second": round(values["timed_tokens"] / video_seconds, 1) if video_seconds else None,
+        "avg_latency_seconds": round(values["latency_seconds"] / videos, 2) if videos else None,
+        "cost_usd": round(values["cost_usd"], 6),
+    }
+
+
+def estimate_backlog(reports, model_name: str, prompt_overhead_tokens: int = 0, min_duration_seconds: int = 0) -> dict:
+    """
+    Pre-flight estimate of tokens, cost and serial time for unanalyzed videos
+
+    Videos shorter than min_duration_seconds are counted as trivial: they
+    are classified from their duration and cost nothing.
+
+    Rates are learned from videos already analyzed (prompt tokens per
+    second of video, median output tokens, median latency), falling back
+    to defaults when there is no history yet. Costs are given for every
+    priced model so models can be compared per unit of throughput.
+    """
+    rate_samples, output_samples, latency_samples = [], [], []
+    pending_seconds, pending_count, unknown_duration, trivial_count = 0, 0, 0, 0
+
+    for report in reports:
+        analysis = report.get("analysis_data")
+        duration = parse_duration(report.get("duration"))
+        usage = (analysis or {}).get(USAGE_KEY)
+        if usage:
+            if duration:
+                video_tokens = max(usage.get("prompt_tokens", 0) - prompt_overhead_tokens, 0)
+                rate_samples.append(video_tokens / duration)
+            output_samples.append(usage.get("output_tokens", 0))
+            if usage.get("mode") != "batch":
+                # Batch latency is queue turnaround, not per-call time
+                latency_samples.append(usage.get("latency_seconds", 0))
+        elif analysis is None and duration is not None and duration < min_duration_seconds:
+            trivial_count += 1
+        elif analysis is None:
+            pending_count += 1
+            if duration:
+                pending_seconds += duration
+            else:
+                unknown_duration += 1
+
+    tokens_per_second = median(rate_samples) if rate_samples else DEFAULT_TOKENS_PER_VIDEO_SECOND
+    output_per_video = median(output_samples) if output_samples else DEFAULT_OUTPUT_TOKENS
+    seconds_per_video = median(latency_samples) if latency_samples else DEFAULT_SECONDS_PER_ANALYSIS
+
+    prompt_tokens = int(pending_seconds * tokens_per_second + pending_count * prompt_overhead_tokens)
+    output_tokens = int(pending_count * output_per_video)
+    cost = estimate_cost(model_name, prompt_tokens, output_tokens)
+    return {
+        "pending_videos": pending_count,
+        "trivial_videos": trivial_count,
+        "pending_video_seconds": pending_seconds,
+        "videos_without_duration": unknown_duration,
+        "based_on_history": bool(rate_samples),
+        "tokens_per_video_second": round(tokens_per_second, 1),
+        "output_tokens_per_video": int(output_per_video),
+        "estimated_prompt_tokens": prompt_tokens,
+        "estimated_output_tokens": output_tokens,
+        "estimated_serial_seconds": round(pending_count * seconds_per_video, 1),
+        "model": model_name,
+        "estimated_cost_usd": cost,
+        "estimated_batch_cost_usd": round(cost * BATCH_PRICE_FACTOR, 6) if cost is not None else None,
+        "cost_by_model": {
+            model: estimate_cost(model, prompt_tokens, output_tokens) for model in sorted(PRICING)
+        },
+    }
@@ -0,0 +1,55 @@
+"""
+HTTP Caching Helpers
+Strong ETags derived from source data versions, with 304 responses on
+If-None-Match
+"""
+
+import hashlib
+
+from fastapi import Request
+from fastapi.responses import Response
+
+from compression import add_vary_accept_encoding
+
+# Browsers may keep the response but must revalidate it; an unchanged
+# report list then costs a 304 round-trip instead of the full body
+CACHE_CONTROL = "private, no-cache"
+
+
+def make_etag(*parts) -> str:
+    """Strong ETag for a resource at a given data version"""
+    digest = hashlib.sha1(":".join(str(part) for part in parts).encode("utf-8")).hexdigest()
+    return f'"{digest[:24]}"'
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """Check an If-None-Match header against an ETag (weak comparison, as RFC 9110 requires here)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = (tag.strip() for tag in if_none_match.split(","))
+    return any(tag.removeprefix("W/") == etag for tag in candidates)
+
+
+def conditional_response(request: Request, etag: str, render) -> Response:
+    """
+    Answer with 304 if the client already has this version, otherwise call render()
+
+    Args:
+        request: Incoming request (for If-None-Match)
+        etag: ETag of the current version
+        render: Zero-argument callable building the full response
+
+    Returns:
+        Response carrying ETag and Cache-Control headers
+    """
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        response = Response(status_code=304)
+    else:
+        response = render()
+    # A precompressed body is a different representation, so its ETag is weak
+    response.headers["ETag"] = f"W/{etag}" if "content-encoding" in response.headers else etag
+    response.headers["Cache-Control"] = CACHE_CONTROL
+    add_vary_accept_encoding(response.headers)
+    return response
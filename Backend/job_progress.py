@@ -0,0 +1,151 @@
+"""
+Analysis Job Progress
+Tracks video analysis jobs through their stages and pushes every state
+change to Server-Sent Events subscribers, so clients don't have to poll
+"""
+
+import asyncio
+import itertools
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+# Stages in pipeline order; "saved" and "failed" are terminal
+JOB_STATES = ("queued", "downloading", "uploading", "processing", "parsing", "saved", "failed")
+TERMINAL_STATES = ("saved", "failed")
+
+# Finished jobs kept around for late subscribers / GET /api/jobs
+MAX_FINISHED_JOBS = 200
+
+# Events buffered per subscriber before a slow client starts missing them
+SUBSCRIBER_QUEUE_SIZE = 1000
+
+
+class JobTracker:
+    """
+    In-memory registry of analysis jobs
+
+    Jobs are updated from worker threads; subscribers are asyncio queues,
+    fed through their event loop with call_soon_threadsafe.
+    """
+
+    def __init__(self):
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._ids = itertools.count(1)
+
+    def create_job(self, report_id: str, source: str = "interactive") -> str:
+        """Register a new job in the queued state; returns its job_id"""
+        now = time.monotonic()
+        with self._lock:
+            job_id = f"job_{next(self._ids)}"
+            self._jobs[job_id] = {
+                "job_id": job_id,
+                "report_id": report_id,
+                "source": source,
+                "state": "queued",
+                "error": None,
+                "created_at": datetime.now().isoformat(),
+                "updated_at": datetime.now().isoformat(),
+                "stages": {},
+                "_created": now,
+                "_entered": now,
+            }
+            event = self._event(self._jobs[job_id], None)
+        self._publish(event)
+        return job_id
+
+    def update(self, job_id: str, state: str, error: str = None):
+        """Move a job to a new state, recording how long the previous one took"""
+        if state not in JOB_STATES:
+            raise ValueError(f"Unknown job state: {state}")
+        now = time.monotonic()
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job["state"] in TERMINAL_STATES:
+                return
+            previous = job["state"]
+            job["stages"][previous] = round((now - job["_entered"]) * 1000, 1)
+            job["state"] = state
+            job["error"] = error
+            job["updated_at"] = datetime.now().isoformat()
+            job["_entered"] = now
+            event = self._event(job, previous)
+            if state in TERMINAL_STATES:
+                self._trim()
+        self._publish(event)
+
+    def progress_callback(self, job_id: str):
+        """Callable(state) for pipeline code that shouldn't know about job ids"""
+        return lambda state: self.update(job_id, state)
+
+    def get_job(self, job_id: str):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return self._public(job) if job is not None else None
+
+    def list_jobs(self, active_only: bool = False):
+        with self._lock:
+            return [
+                self._public(job) for job in self._jobs.values()
+                if not active_only or job["state"] not in TERMINAL_STATES
+            ]
+
+    def subscribe(self) -> asyncio.Queue:
+        """Queue receiving every job event from now on (call from the event loop)"""
+        queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        with self._lock:
+            self._subscribers.add((asyncio.get_running_loop(), queue))
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        with self._lock:
+            self._subscribers = {sub for sub in self._subscribers if sub[1] is not queue}
+
+    def _publish(self, event: dict):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(_offer, queue, event)
+            except RuntimeError:
+                # Loop already closed; the subscriber is gone
+                self.unsubscribe(queue)
+
+    def _event(self, job: dict, previous: str) -> dict:
+        now = time.monotonic()
+        return {
+            "job_id": job["job_id"],
+            "report_id": job["report_id"],
+            "source": job["source"],
+            "state": job["state"],
+            "previous_state": previous,
+            "stage_ms": job["stages"].get(previous) if previous else None,
+            "elapsed_ms": round((now - job["_created"]) * 1000, 1),
+            "error": job["error"],
+            "at": job["updated_at"],
+        }
+
+    def _public(self, job: dict) -> dict:
+        return {key: value for key, value in job.items() if not key.startswith("_")} | {
+            "elapsed_ms": round((time.monotonic() - job["_created"]) * 1000, 1),
+            "stages": dict(job["stages"]),
+        }
+
+    def _trim(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job["state"] in TERMINAL_STATES]
+        for job_id in finished[:-MAX_FINISHED_JOBS]:
+            del self._jobs[job_id]
+
+
+def _offer(queue: asyncio.Queue, event: dict):
+    try:
+        queue.put_nowait(event)
+    except asyncio.QueueFull:
+        pass
+
+
+# Shared tracker for the API and the preprocessing run
+job_tracker = JobTracker()
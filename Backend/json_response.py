@@ -0,0 +1,66 @@
+"""
+JSON Response Helpers
+Fast JSON encoding for large report payloads
+
+Uses orjson when installed (native NumPy support, no Python-level walk of
+every value) and falls back to the standard json module otherwise.
+Returning one of these responses directly from an endpoint also skips
+FastAPI's jsonable_encoder pass.
+"""
+
+import json
+import math
+
+from fastapi.responses import JSONResponse, Response
+
+from request_metrics import request_phase
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+
+def to_python(value):
+    """Convert NumPy scalars to Python values and NaN to None"""
+    if hasattr(value, "item"):
+        value = value.item()
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    return value
+
+
+def _default(value):
+    if hasattr(value, "item"):
+        return value.item()
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content) -> bytes:
+    """Serialize content to compact UTF-8 JSON bytes"""
+    with request_phase("serialize"):
+        if orjson is not None:
+            return orjson.dumps(content, default=_default, option=_ORJSON_OPTIONS)
+        return json.dumps(
+            content, default=_default, ensure_ascii=False, allow_nan=False, separators=(",", ":")
+        ).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson (or compact stdlib json)"""
+
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+
+class RawJSONResponse(Response):
+    """Response for JSON bytes that were serialized ahead of time"""
+
+    media_type = "application/json"
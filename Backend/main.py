@@ -1,5 +1,6 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response, StreamingResponse
 from pydantic import BaseModel
 from typing import List, Optional
 import os
@@ -9,13 +10,25 @@ import uvicorn
 from datetime import timedelta
 import asyncio
 
-from csv_analysis_service import load_call_reports, get_call_report_by_id, get_call_stats
-from video_analysis_service import analyze_video_with_gemini, get_all_video_reports_with_metadata, get_video_analysis_by_id, save_video_analysis
+from csv_analysis_service import get_call_reports_payload, get_call_report_by_id, get_call_stats, sync_call_search_index, get_csv_version, iter_call_reports
+from video_analysis_service import run_analysis_job, get_all_video_reports_with_metadata, get_video_analysis_by_id, sync_video_search_index, load_video_transcript, video_has_transcript, get_video_reports_payload, get_video_store_version, iter_video_reports_with_metadata, get_usage_summary, estimate_pending_backlog
+from search_index import search
+from job_progress import job_tracker
+from metrics import REGISTRY, PROMETHEUS_CONTENT_TYPE, stage_summary
+from request_metrics import RequestMetricsMiddleware
+from json_response import FastJSONResponse, dumps
+from http_cache import conditional_response, make_etag
+from compression import CompressionMiddleware, precompressed_json_response
+from report_export import EXPORT_FORMATS, CALL_EXPORT_FIELDS, VIDEO_EXPORT_FIELDS, CALL_EXPORT_PLAN, VIDEO_EXPORT_PLAN, export_stream
+from transcript_store import load_transcript, split_transcript
 from auth_service import authenticate_admin, create_access_token, create_admin_in_db
 from preprocess_videos import preprocess_all_videos
+from batch_analysis import run_batch_backlog, get_batch_status
+from analysis_scheduler import analysis_scheduler, INTERACTIVE
+from prompt_cache import prompt_cache
 
 
-app = FastAPI(title="Duroflex Video Analysis API")
+app = FastAPI(title="Duroflex Video Analysis API", default_response_class=FastJSONResponse)
 
 # CORS middleware for frontend
 app.add_middleware(
@@ -26,12 +39,35 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Negotiated brotli/gzip compression for responses above the size threshold
+app.add_middleware(CompressionMiddleware)
+
+# Per-route latency / size / status metrics and slow-request logging (outermost)
+app.add_middleware(RequestMetricsMiddleware)
+
 # Create necessary directories
 RESULTS_DIR = Path("results")
 TEMP_DIR = Path("temp")
 RESULTS_DIR.mkdir(exist_ok=True)
 TEMP_DIR.mkdir(exist_ok=True)
 
+# "interactive" analyzes the backlog one call per video at startup; "batch"
+# submits it to the Gemini Batch API and collects results in the background
+PREPROCESS_MODE = os.getenv("PREPROCESS_MODE", "interactive")
+
+# Idle SSE connections get a comment line this often (keeps proxies from timing out)
+SSE_KEEPALIVE_SECONDS = 15
+
+# Background tasks are referenced here so they aren't garbage collected mid-run
+_background_tasks = set()
+
+
+def _start_background(coro):
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return task
+
 
 # Request models
 class LoginRequest(BaseModel):
@@ -57,18 +93,25 @@ async def startup_event():
     print("👤 Initializing admin user...")
     create_admin_in_db()
     
-    # Preprocess all videos
-    print("🎬 Starting video preprocessing...")
+    # Preprocess all videos in the background; progress is on /api/jobs/events
+    print(f"🎬 Starting video preprocessing in the background ({PREPROCESS_MODE} mode)...")
+    _start_background(_preprocess_videos())
+    
     print("=" * 80)
+    print("✅ APPLICATION READY")
+    print("=" * 80 + "\n")
+
+
+async def _preprocess_videos():
     try:
-        await preprocess_all_videos()
+        if PREPROCESS_MODE == "batch":
+            result = await run_batch_backlog()
+            print(f"📦 Batch preprocessing finished: {result}")
+        else:
+            await preprocess_all_videos()
     except Exception as e:
         print(f"⚠️  Warning: Video preprocessing encountered an issue: {e}")
         print("   System will continue, but some videos may not be analyzed")
-    
-    print("=" * 80)
-    print("✅ APPLICATION READY")
-    print("=" * 80 + "\n")
 
 
 # ===== AUTHENTICATION ENDPOINTS =====
@@ -104,12 +147,24 @@ async def root():
         "endpoints": {
             "login": "POST /api/auth/login",
             "video_reports": "GET /api/video-reports",
+            "video_reports_export": "GET /api/video-reports/export?format=ndjson|csv",
             "video_report_detail": "GET /api/video-reports/{report_id}",
-            "analyze_video": "POST /api/video-reports/analyze",
+            "video_report_transcript": "GET /api/video-reports/{report_id}/transcript",
+            "analyze_video": "POST /api/video-reports/analyze/{report_id}?wait=true|false",
+            "jobs": "GET /api/jobs",
+            "batches": "GET /api/batches",
+            "job_events": "GET /api/jobs/events (Server-Sent Events)",
             "get_result": "GET /api/results/{video_id}",
             "get_all_results": "GET /api/results",
             "health": "GET /api/health",
-            "call_reports": "GET /api/call-reports"
+            "call_reports": "GET /api/call-reports",
+            "call_reports_export": "GET /api/call-reports/export?format=ndjson|csv",
+            "call_report_transcript": "GET /api/call-reports/{report_id}/transcript",
+            "search": "GET /api/search?q=...",
+            "metrics": "GET /metrics (Prometheus)",
+            "stage_latency": "GET /api/metrics/stages",
+            "gemini_usage": "GET /api/usage/summary",
+            "backlog_estimate": "GET /api/usage/estimate"
         }
     }
 
@@ -121,42 +176,109 @@ async def health_check():
 
 # ===== VIDEO ANALYSIS ENDPOINTS (NEW) =====
 
+def _transcript_response(report_id: str, load=load_transcript):
+    """Response for a transcript from the transcript store"""
+    transcript = load(report_id)
+    if transcript is None:
+        raise HTTPException(status_code=404, detail=f"Transcript not found for report {report_id}")
+    
+    return FastJSONResponse({
+        "status": "success",
+        "report_id": report_id,
+        "transcript": transcript
+    })
+
+
+def _export_response(name: str, reports, export_format: str, fields, analysis_key: str, plan):
+    """Streaming download of reports as NDJSON or CSV"""
+    extension = "csv" if export_format == "csv" else "ndjson"
+    return StreamingResponse(
+        export_stream(reports, export_format, fields, analysis_key, plan),
+        media_type=EXPORT_FORMATS[export_format],
+        headers={"Content-Disposition": f'attachment; filename="{name}.{extension}"'},
+    )
+
+
 @app.get("/api/video-reports")
-async def get_all_video_reports():
+async def get_all_video_reports(request: Request):
     """Get all video reports from CSV with analysis status"""
     try:
-        reports = get_all_video_reports_with_metadata()
-        return {
-            "status": "success",
-            "total": len(reports),
-            "reports": reports
-        }
+        version = get_video_store_version()
+        etag = make_etag("video-reports", version)
+        return conditional_response(request, etag, lambda: precompressed_json_response(
+            request, etag, lambda: get_video_reports_payload(version)
+        ))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/api/video-reports/export")
+def export_video_reports(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    include_transcripts: bool = False,
+):
+    """Stream every video report (with its analysis) as NDJSON or CSV"""
+    return _export_response(
+        "video_reports",
+        iter_video_reports_with_metadata(include_transcripts=include_transcripts),
+        format, VIDEO_EXPORT_FIELDS, "analysis_data", VIDEO_EXPORT_PLAN,
+    )
+
+
 @app.get("/api/video-reports/{report_id}")
-async def get_video_report_detail(report_id: str):
+async def get_video_report_detail(report_id: str, request: Request):
     """Get detailed analysis for a specific video report"""
-    try:
+    def render():
         analysis = get_video_analysis_by_id(report_id)
         if not analysis:
             raise HTTPException(status_code=404, detail=f"Analysis not found for report {report_id}")
         
-        return {
+        # Returned as a response object so FastAPI skips jsonable_encoder
+        return FastJSONResponse({
             "status": "success",
             "report_id": report_id,
-            "analysis": analysis
-        }
+            "analysis": analysis,
+            "has_transcript": video_has_transcript(report_id)
+        })
+    
+    try:
+        etag = make_etag("video-report", report_id, get_video_store_version())
+        return conditional_response(request, etag, render)
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/api/video-reports/{report_id}/transcript")
+async def get_video_report_transcript(report_id: str, request: Request):
+    """Get the transcript for a video report (loaded on demand from the transcript store)"""
+    etag = make_etag("video-transcript", report_id, get_video_store_version())
+    return conditional_response(request, etag, lambda: _transcript_response(report_id, load_video_transcript))
+
+
+def _analyze_interactive(job_id: str, report: dict):
+    """Run the analysis in the scheduler's interactive lane, ahead of the preprocessing backlog"""
+    return asyncio.wrap_future(analysis_scheduler.submit(
+        INTERACTIVE, run_analysis_job, job_id, report["report_id"], report["recording_url"], report["store_name"]
+    ))
+
+
+async def _run_job_in_background(job_id: str, report: dict):
+    try:
+        await _analyze_interactive(job_id, report)
+    except Exception as e:
+        print(f"Error analyzing video {report['report_id']}: {str(e)}")
+
+
 @app.post("/api/video-reports/analyze/{report_id}")
-async def analyze_video_report(report_id: str):
-    """Trigger analysis for a specific video by report_id"""
+async def analyze_video_report(report_id: str, wait: bool = True):
+    """
+    Trigger analysis for a specific video by report_id
+
+    With wait=false the job is started in the background and the response
+    (202) carries its job_id; follow it on /api/jobs/events.
+    """
     try:
         # Get all reports
         reports = get_all_video_reports_with_metadata()
@@ -180,20 +302,28 @@ async def analyze_video_report(report_id: str):
                 "analysis": target_report["analysis_data"]
             }
         
-        # Analyze the video
-        print(f"Starting analysis for {report_id}...")
-        analysis_result = analyze_video_with_gemini(
-            video_url=target_report["recording_url"],
-            store_name=target_report["store_name"]
-        )
+        job_id = job_tracker.create_job(report_id)
         
-        # Save the analysis
-        save_video_analysis(report_id, analysis_result)
+        if not wait:
+            _start_background(_run_job_in_background(job_id, target_report))
+            return FastJSONResponse(status_code=202, content={
+                "status": "queued",
+                "message": f"Video {report_id} queued for analysis",
+                "report_id": report_id,
+                "job_id": job_id,
+                "events": f"/api/jobs/events?report_id={report_id}"
+            })
+        
+        # Analyze and save the video on a scheduler worker so the event loop keeps serving
+        print(f"Starting analysis for {report_id}...")
+        analysis_result = await _analyze_interactive(job_id, target_report)
+        analysis_result, _ = split_transcript(analysis_result)
         
         return {
             "status": "success",
             "message": f"Video {report_id} analyzed successfully",
             "report_id": report_id,
+            "job_id": job_id,
             "analysis": analysis_result
         }
         
@@ -204,52 +334,209 @@ async def analyze_video_report(report_id: str):
         raise HTTPException(status_code=500, detail=f"Error analyzing video: {str(e)}")
 
 
+# ===== ANALYSIS JOB PROGRESS =====
+
+def _sse_message(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {dumps(data).decode('utf-8')}\n\n"
+
+
+@app.get("/api/jobs")
+async def list_jobs(active: bool = False):
+    """Current state and stage timings of recent analysis jobs"""
+    jobs = job_tracker.list_jobs(active_only=active)
+    return {"status": "success", "total": len(jobs), "scheduler": analysis_scheduler.status(), "jobs": jobs}
+
+
+@app.get("/api/jobs/events")
+async def job_events(request: Request, report_id: Optional[str] = None):
+    """
+    Server-Sent Events stream of analysis job state changes
+
+    Starts with a "snapshot" event per active job, then sends a "job" event
+    for every transition (queued -> downloading -> uploading -> processing
+    -> parsing -> saved / failed) with stage and total timings.
+    """
+    async def stream():
+        queue = job_tracker.subscribe()
+        try:
+            for job in job_tracker.list_jobs(active_only=True):
+                if report_id is None or job["report_id"] == report_id:
+                    yield _sse_message("snapshot", job)
+            
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), SSE_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield ": keepalive\n\n"
+                    continue
+                if report_id is None or event["report_id"] == report_id:
+                    yield _sse_message("job", event)
+        finally:
+            job_tracker.unsubscribe(queue)
+    
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.get("/api/batches")
+async def list_batches():
+    """Gemini Batch API jobs submitted for the video backlog"""
+    try:
+        return {"status": "success", **get_batch_status()}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/api/jobs/{job_id}")
+async def get_job(job_id: str):
+    """State and stage timings of one analysis job"""
+    job = job_tracker.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return {"status": "success", "job": job}
+
+
 # ===== CSV CALL ANALYSIS ENDPOINTS =====
 
 @app.get("/api/call-reports")
-async def get_all_call_reports():
-    """Get all call analysis reports from CSV"""
+async def get_all_call_reports(request: Request):
+    """Get all call analysis reports from CSV (body is serialized once per CSV version)"""
     try:
-        reports = load_call_reports()
-        return {
-            "status": "success",
-            "total": len(reports),
-            "reports": reports
-        }
+        etag = make_etag("call-reports", get_csv_version())
+        return conditional_response(request, etag, lambda: precompressed_json_response(
+            request, etag, get_call_reports_payload
+        ))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/api/call-reports/export")
+def export_call_reports(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    include_transcripts: bool = False,
+):
+    """Stream every call report straight from the CSV as NDJSON or CSV"""
+    return _export_response(
+        "call_reports",
+        iter_call_reports(include_transcripts=include_transcripts),
+        format, CALL_EXPORT_FIELDS, "analysis", CALL_EXPORT_PLAN,
+    )
+
+
 @app.get("/api/call-reports/{call_id}")
-async def get_call_report(call_id: str):
+async def get_call_report(call_id: str, request: Request):
     """Get a specific call report by call ID"""
-    try:
+    def render():
         report = get_call_report_by_id(call_id)
         if not report:
             raise HTTPException(status_code=404, detail=f"Call report not found for ID {call_id}")
-        return {
+        return FastJSONResponse({
             "status": "success",
             "report": report
-        }
+        })
+    
+    try:
+        etag = make_etag("call-report", call_id, get_csv_version())
+        return conditional_response(request, etag, render)
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/api/call-reports/{report_id}/transcript")
+async def get_call_report_transcript(report_id: str, request: Request):
+    """Get the transcript for a call report by its report_id (loaded on demand from the transcript store)"""
+    etag = make_etag("call-transcript", report_id, get_csv_version())
+    return conditional_response(request, etag, lambda: _transcript_response(report_id))
+
+
 @app.get("/api/call-reports/stats/overview")
-async def get_call_reports_stats():
+async def get_call_reports_stats(request: Request):
     """Get aggregate statistics for all call reports"""
     try:
-        stats = get_call_stats()
+        etag = make_etag("call-stats", get_csv_version())
+        return conditional_response(request, etag, lambda: FastJSONResponse({
+            "status": "success",
+            "stats": get_call_stats()
+        }))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+# ===== SEARCH =====
+
+@app.get("/api/search")
+def search_reports(
+    q: str = Query(..., min_length=1),
+    source: Optional[str] = Query(None, pattern="^(call|video)$"),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+):
+    """
+    Full-text search over transcripts, questions asked, barriers and summaries
+
+    A plain def, so FastAPI runs it in the threadpool: syncing the index
+    can parse the CSV / JSON store and rebuild FTS5.
+    """
+    try:
+        if source in (None, "call"):
+            sync_call_search_index()
+        if source in (None, "video"):
+            sync_video_search_index()
+        
+        results = search(q, limit=limit, offset=offset, source=source)
         return {
             "status": "success",
-            "stats": stats
+            "query": q,
+            "total": results["total"],
+            "limit": limit,
+            "offset": offset,
+            "results": results["results"]
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+# ===== METRICS =====
+
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    """Prometheus scrape endpoint"""
+    return Response(content=REGISTRY.render(), media_type=PROMETHEUS_CONTENT_TYPE)
+
+
+@app.get("/api/metrics/stages")
+async def get_stage_latency():
+    """p50/p95/p99 latency (seconds) of each analysis pipeline stage since startup"""
+    return {"status": "success", "stages": stage_summary()}
+
+
+# ===== GEMINI USAGE =====
+
+@app.get("/api/usage/summary")
+async def get_gemini_usage():
+    """Gemini tokens, tokens per second of video, latency and cost by store and day"""
+    try:
+        return {"status": "success", **get_usage_summary(), "prompt_cache": prompt_cache.status()}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/api/usage/estimate")
+async def get_backlog_estimate(model: Optional[str] = None):
+    """Pre-flight estimate of tokens, cost and serial time for the pending video backlog"""
+    try:
+        return {"status": "success", "estimate": estimate_pending_backlog(model)}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 if __name__ == "__main__":
     print("Starting Duroflex Video Analysis API...")
     print("API will be available at http://localhost:8000")
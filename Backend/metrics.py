@@ -0,0 +1,253 @@
+"""
+Metrics
+Minimal in-process counters, gauges and histograms rendered in the
+Prometheus text exposition format, plus timing spans for pipeline stages
+
+Histograms use fixed buckets (cheap to update from any thread, mergeable
+by Prometheus); p50/p95/p99 are estimated from the buckets the same way
+PromQL's histogram_quantile does.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+
+# Pipeline stages range from milliseconds (JSON parsing) to minutes (Gemini)
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300, 600)
+
+REPORTED_QUANTILES = (0.5, 0.95, 0.99)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs.extend(f'{name}="{_escape(value)}"' for name, value in extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    type_name = None
+
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.extend(self._render_sample(key, value))
+        return lines
+
+    def _render_sample(self, key, value):
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"]
+
+
+class Counter(_Metric):
+    """Monotonically increasing count"""
+
+    type_name = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    """Value that goes up and down"""
+
+    type_name = "gauge"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(_Metric):
+    """Bucketed distribution of observed values"""
+
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames=(), buckets=STAGE_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = self._values[key] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for idx, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["counts"][idx] += 1
+                    break
+            series["sum"] += value
+            series["count"] += 1
+
+    def quantile(self, q: float, **labels):
+        """Estimate a quantile by linear interpolation within its bucket (None when empty)"""
+        with self._lock:
+            series = self._values.get(self._key(labels))
+            if series is None or series["count"] == 0:
+                return None
+            counts = list(series["counts"])
+            total = series["count"]
+
+        rank = q * total
+        cumulative = 0
+        lower = 0.0
+        for bound, count in zip(self.buckets, counts):
+            if count and cumulative + count >= rank:
+                if bound == float("inf"):
+                    # Past the largest bucket: the best estimate is its lower edge
+                    return lower
+                return lower + (bound - lower) * (rank - cumulative) / count
+            cumulative += count
+            if bound != float("inf"):
+                lower = bound
+        return lower
+
+    def summary(self):
+        """{label values: {"count", "sum", "p50", "p95", "p99"}} for every series"""
+        with self._lock:
+            keys = sorted(self._values)
+        result = {}
+        for key in keys:
+            labels = dict(zip(self.labelnames, key))
+            with self._lock:
+                series = self._values[key]
+                entry = {"count": series["count"], "sum": round(series["sum"], 6)}
+            for q in REPORTED_QUANTILES:
+                value = self.quantile(q, **labels)
+                entry[f"p{int(q * 100)}"] = round(value, 6) if value is not None else None
+            result[key] = entry
+        return result
+
+    def _render_sample(self, key, series):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, series["counts"]):
+            cumulative += count
+            labels = _format_labels(self.labelnames, key, [("le", _format_value(bound))])
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        labels = _format_labels(self.labelnames, key)
+        lines.append(f"{self.name}_sum{labels} {_format_value(series['sum'])}")
+        lines.append(f"{self.name}_count{labels} {series['count']}")
+        return lines
+
+
+class Registry:
+    """Holds metrics and renders them for /metrics"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=STAGE_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# Prometheus text exposition format
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "analysis_stage_duration_seconds",
+    "Time spent in each stage of the analysis pipeline",
+    ("component", "stage", "outcome"),
+)
+
+
+class Span:
+    """Result of a timed_stage block; seconds is set when the block exits"""
+
+    __slots__ = ("component", "stage", "seconds")
+
+    def __init__(self, component: str, stage: str):
+        self.component = component
+        self.stage = stage
+        self.seconds = None
+
+
+@contextmanager
+def timed_stage(component: str, stage: str):
+    """
+    Span timing one pipeline stage into analysis_stage_duration_seconds
+
+    Usage:
+        with timed_stage("gemini", "generate") as span:
+            response = model.generate_content(...)
+        latency = span.seconds
+
+    The outcome label is "error" when the block raises, "ok" otherwise.
+    """
+    span = Span(component, stage)
+    start = time.perf_counter()
+    outcome = "ok"
+    try:
+        yield span
+    except BaseException:
+        outcome = "error"
+        raise
+    finally:
+        span.seconds = time.perf_counter() - start
+        STAGE_SECONDS.observe(span.seconds, component=component, stage=stage, outcome=outcome)
+
+
+def stage_summary():
+    """p50/p95/p99 per pipeline stage, for the JSON metrics endpoint"""
+    return [
+        {"component": component, "stage": stage, "outcome": outcome, **values}
+        for (component, stage, outcome), values in STAGE_SECONDS.summary().items()
+    ]
@@ -2,10 +2,19 @@ import asyncio
 from pathlib import Path
 from video_analysis_service import (
     load_video_csv,
-    analyze_video_with_gemini,
+    run_analysis_job,
     save_video_analysis,
     load_all_video_analyses,
+    estimate_pending_backlog,
 )
+from job_progress import job_tracker
+from gemini_limiter import is_retryable_error
+from batch_analysis import get_batched_report_ids
+from metrics import timed_stage
+from recording_fetcher import recording_fetcher
+from backlog_scheduler import BacklogItem, split_trivial, trivial_analysis, triage_expiry, prefetch, MIN_ANALYSIS_SECONDS
+from gemini_usage import DEFAULT_SECONDS_PER_ANALYSIS
+from analysis_scheduler import analysis_scheduler, BACKGROUND
 import pandas as pd
 import json
 from datetime import datetime
@@ -14,7 +23,19 @@ from datetime import datetime
 async def preprocess_all_videos():
     """
     Preprocess and analyze all videos from CSV
-    This runs automatically on backend startup
+    This runs automatically on backend startup, in the background
+
+    Every pending video gets a job in the job tracker up front, so clients
+    following /api/jobs/events see the whole queue and each stage.
+    Analyses run in the analysis scheduler's background lane, so on-demand
+    requests from the analyze endpoint go ahead of the queued backlog.
+
+    Videos run shortest first, and calls under MIN_ANALYSIS_SECONDS are
+    classified from their duration without a Gemini analysis. Recordings
+    the queue would reach after their presigned URL expires are
+    prefetched before analysis starts, and rows whose URL has already
+    expired are reported (job failed, no analysis stored) without being
+    attempted.
     """
     print("\n" + "=" * 80)
     print("🎬 VIDEO PREPROCESSING STARTED")
@@ -36,44 +57,111 @@ async def preprocess_all_videos():
         print(f"✓ Already analyzed: {already_analyzed}")
         print(f"⏳ Pending analysis: {len(df) - already_analyzed}")
         
-        # Process each video
+        # Videos already submitted to a running batch job are left to it
+        batched = get_batched_report_ids()
+        
         analyzed_count = 0
         error_count = 0
         skipped_count = 0
+        deferred_count = 0
         
+        # Queue a job for every video that still needs analysis
+        jobs = {}
+        backlog = []
         for idx, row in df.iterrows():
             report_id = f"video_{idx}"
             store_name = row.get('Store Name', f'Store {idx}')
             recording_url = row.get('Recording URL', '')
             
-            # Skip if already analyzed
+            # Skip if already analyzed (or waiting on a batch job)
+            if report_id in batched:
+                print(f"📦 [{idx + 1}/{len(df)}] {store_name} - SKIPPED (in a running batch)")
+                skipped_count += 1
+                continue
             if report_id in existing_analyses:
                 print(f"⏭️  [{idx + 1}/{len(df)}] {store_name} - SKIPPED (already analyzed)")
                 skipped_count += 1
                 continue
             
             # Check if URL is valid
-            if not recording_url or recording_url.strip() == '':
+            if not isinstance(recording_url, str) or not recording_url.strip():
                 print(f"❌ [{idx + 1}/{len(df)}] {store_name} - SKIPPED (no URL)")
                 error_count += 1
                 continue
             
+            jobs[report_id] = job_tracker.create_job(report_id, source="preprocess")
+            backlog.append(BacklogItem(report_id, store_name, recording_url, idx, row.get('Duration')))
+        
+        # Calls too short to hold a conversation don't need Gemini
+        backlog, trivial = split_trivial(backlog)
+        for item in trivial:
+            await asyncio.to_thread(save_video_analysis, item.report_id, trivial_analysis(item))
+            job_tracker.update(jobs[item.report_id], "saved")
+            print(f"⏩ {item.store_name} ({item.report_id}) - CLASSIFIED ({item.duration}s < {MIN_ANALYSIS_SECONDS}s, not analyzed)")
+        
+        # Shortest first; expired URLs aren't worth an attempt
+        # (the estimate reads the CSV and every stored analysis)
+        backlog_estimate = await asyncio.to_thread(estimate_pending_backlog)
+        if backlog_estimate["pending_videos"]:
+            seconds_per_video = backlog_estimate["estimated_serial_seconds"] / backlog_estimate["pending_videos"]
+        else:
+            seconds_per_video = DEFAULT_SECONDS_PER_ANALYSIS
+        queue, at_risk, expired = triage_expiry(backlog, seconds_per_video)
+        for item in expired:
+            print(f"⌛ {item.store_name} ({item.report_id}) - SKIPPED ({item.error})")
+            job_tracker.update(jobs[item.report_id], "failed", error=item.error)
+        if queue:
+            queued_seconds = sum(item.duration or 0 for item in queue)
+            print(f"⏱️  Estimated backlog time: {len(queue) * seconds_per_video / 60:.1f} min for {len(queue)} videos "
+                  f"({queued_seconds / 60:.1f} min of recordings, shortest first)")
+        
+        # Size up the downloads (HEAD requests over pooled connections)
+        if queue:
+            plan = await asyncio.to_thread(recording_fetcher.plan, [item.recording_url for item in queue])
+            print(f"📥 Recordings: {plan['cached']} cached, {plan['to_fetch']} to fetch "
+                  f"({plan['bytes_to_fetch'] / 1024 ** 2:.1f} MB, {plan['unknown_size']} of unknown size)")
+        
+        # Download recordings that would expire before their turn
+        if at_risk:
+            print(f"⏩ Prefetching {len(at_risk)} recordings that expire before the queue reaches them")
+            for item in await asyncio.to_thread(prefetch, at_risk):
+                print(f"⚠️  {item.store_name} ({item.report_id}): {item.error}")
+        
+        # Queue every video in the background lane; results are reported in queue order
+        futures = [
+            analysis_scheduler.submit(
+                BACKGROUND, _timed_analysis, jobs[item.report_id], item.report_id, item.recording_url, item.store_name
+            )
+            for item in queue
+        ]
+        
+        # Process each video
+        for position, (item, future) in enumerate(zip(queue, futures), start=1):
+            report_id = item.report_id
+            store_name = item.store_name
+            
             try:
-                print(f"🔄 [{idx + 1}/{len(df)}] Analyzing {store_name}...", end=" ")
+                print(f"🔄 [{position}/{len(queue)}] Analyzing {store_name} (URL {item.deadline_label})...", end=" ")
                 
-                # Analyze video
-                analysis_result = analyze_video_with_gemini(
-                    video_url=recording_url,
-                    store_name=store_name
-                )
-                
-                # Save result
-                save_video_analysis(report_id, analysis_result)
+                # Wait for the video to be analyzed and saved
+                await asyncio.wrap_future(future)
                 
                 print("✅ DONE")
                 analyzed_count += 1
                 
+            except asyncio.CancelledError:
+                # Shutting down: drop the rest of the queue
+                for pending in futures:
+                    pending.cancel()
+                raise
             except Exception as e:
+                if is_retryable_error(e):
+                    # Still rate limited / unavailable after every retry: leave it
+                    # pending so the next run picks it up instead of storing a failure
+                    print(f"⏸️  DEFERRED: {str(e)[:50]}")
+                    deferred_count += 1
+                    continue
+                
                 print(f"❌ ERROR: {str(e)[:50]}")
                 error_count += 1
                 
@@ -87,7 +175,7 @@ async def preprocess_all_videos():
                     "error": True,
                     "timestamp": datetime.now().isoformat()
                 }
-                save_video_analysis(report_id, error_analysis)
+                await asyncio.to_thread(save_video_analysis, report_id, error_analysis)
         
         # Print summary
         print("\n" + "=" * 80)
@@ -96,6 +184,9 @@ async def preprocess_all_videos():
         print(f"📊 Summary:")
         print(f"   ✓ Newly analyzed:    {analyzed_count}")
         print(f"   ⏭️  Already analyzed: {skipped_count}")
+        print(f"   ⏸️  Deferred:        {deferred_count}")
+        print(f"   ⏩ Too short:        {len(trivial)}")
+        print(f"   ⌛ URL expired:      {len(expired)}")
         print(f"   ❌ Errors:           {error_count}")
         print(f"   📦 Total available:  {analyzed_count + skipped_count}")
         print("=" * 80 + "\n")
@@ -104,6 +195,9 @@ async def preprocess_all_videos():
             "status": "complete",
             "newly_analyzed": analyzed_count,
             "already_analyzed": skipped_count,
+            "deferred": deferred_count,
+            "trivial": len(trivial),
+            "expired": [item.report_id for item in expired],
             "errors": error_count,
             "total": analyzed_count + skipped_count
         }
@@ -113,6 +207,11 @@ async def preprocess_all_videos():
         return {"status": "error", "message": str(e)}
 
 
+def _timed_analysis(job_id: str, report_id: str, recording_url: str, store_name: str):
+    with timed_stage("preprocess", "video"):
+        return run_analysis_job(job_id, report_id, recording_url, store_name)
+
+
 def preprocess_all_videos_sync():
     """Synchronous wrapper for preprocessing"""
     try:
@@ -0,0 +1,168 @@
+"""
+Prompt Cache
+Gemini cached-content handles for the large static analysis prompts
+
+The analysis prompts are thousands of tokens of fixed instructions and
+schema sent with every video. A prompt is cached once per model and
+prompt version (a hash of its text), and calls made through the cached
+model send only the per-video parts. Handles are extended shortly before
+their TTL runs out. When a handle can't be created (caching disabled, a
+prompt under the model's minimum cacheable size, a model without
+caching) callers get None and send the full prompt as before.
+"""
+
+import hashlib
+import os
+import threading
+import time
+from datetime import timedelta
+from typing import Optional
+
+import google.generativeai as genai
+
+from gemini_limiter import gemini_limiter
+from metrics import REGISTRY
+from single_flight import SingleFlight
+
+PROMPT_CACHE_ENABLED = os.getenv("PROMPT_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+PROMPT_CACHE_TTL_SECONDS = int(os.getenv("PROMPT_CACHE_TTL_SECONDS", "3600"))
+# Handles this close to expiring are extended before use
+PROMPT_CACHE_REFRESH_SECONDS = 300
+# After a failed create the prompt is sent inline for this long before trying again
+PROMPT_CACHE_RETRY_SECONDS = 1800
+
+PROMPT_CACHE_EVENTS = REGISTRY.counter(
+    "prompt_cache_events_total",
+    "Cached prompt lookups by prompt and result (hit, created, refreshed, unavailable)",
+    ("prompt", "result"),
+)
+
+
+def prompt_version(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:12]
+
+
+class GenaiCaching:
+    """The google.generativeai calls PromptCache makes (tests pass a fake)"""
+
+    def create(self, model_name: str, display_name: str, text: str, ttl_seconds: int):
+        return genai.caching.CachedContent.create(
+            model=model_name,
+            display_name=display_name,
+            contents=[text],
+            ttl=timedelta(seconds=ttl_seconds),
+        )
+
+    def refresh(self, handle, ttl_seconds: int):
+        handle.update(ttl=timedelta(seconds=ttl_seconds))
+        return handle
+
+    def model(self, handle):
+        return genai.GenerativeModel.from_cached_content(cached_content=handle)
+
+
+class _Entry:
+    __slots__ = ("handle", "expires_at", "model")
+
+    def __init__(self, handle, expires_at: float, model):
+        self.handle = handle
+        self.expires_at = expires_at
+        self.model = model
+
+
+class PromptCache:
+    """Cached-content handles keyed by (model, prompt name, prompt version); thread-safe"""
+
+    def __init__(self, client=None, ttl_seconds: int = PROMPT_CACHE_TTL_SECONDS,
+                 refresh_seconds: float = PROMPT_CACHE_REFRESH_SECONDS,
+                 retry_seconds: float = PROMPT_CACHE_RETRY_SECONDS,
+                 enabled: bool = PROMPT_CACHE_ENABLED, clock=time.time):
+        self.client = client or GenaiCaching()
+        self.ttl_seconds = ttl_seconds
+        self.refresh_seconds = refresh_seconds
+        self.retry_seconds = retry_seconds
+        self.enabled = enabled
+        self._clock = clock
+        self._entries = {}
+        self._unavailable_until = {}
+        self._lock = threading.Lock()
+        self._flights = SingleFlight("prompt_cache")
+
+    def model(self, model_name: str, prompt_name: str, text: str):
+        """
+        A model whose requests start with the cached prompt text
+
+        Returns:
+            The model, or None when the prompt has to be sent inline
+        """
+        if not self.enabled:
+            return None
+        key = (model_name, prompt_name, prompt_version(text))
+        now = self._clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at - self.refresh_seconds > now:
+                PROMPT_CACHE_EVENTS.inc(prompt=prompt_name, result="hit")
+                return entry.model
+            if self._unavailable_until.get(key, 0) > now:
+                return None
+        entry = self._flights.do(key, self._renew, key, text)
+        return entry.model if entry is not None else None
+
+    def _renew(self, key, text: str) -> Optional[_Entry]:
+        model_name, prompt_name, version = key
+        now = self._clock()
+        with self._lock:
+            entry = self._entries.get(key)
+        # Another caller renewed it while this one waited
+        if entry is not None and entry.expires_at - self.refresh_seconds > now:
+            return entry
+
+        if entry is not None:
+            try:
+                handle = gemini_limiter.call("cache_refresh", self.client.refresh, entry.handle, self.ttl_seconds)
+            except Exception as e:
+                print(f"⚠️  Could not extend cached prompt {prompt_name} ({str(e)[:60]}), creating a new one")
+            else:
+                PROMPT_CACHE_EVENTS.inc(prompt=prompt_name, result="refreshed")
+                return self._store(key, _Entry(handle, now + self.ttl_seconds, entry.model))
+
+        try:
+            handle = gemini_limiter.call(
+                "cache_create", self.client.create,
+                model_name, f"{prompt_name}-{version}", text, self.ttl_seconds,
+            )
+            model = self.client.model(handle)
+        except Exception as e:
+            PROMPT_CACHE_EVENTS.inc(prompt=prompt_name, result="unavailable")
+            print(f"⚠️  Prompt caching unavailable for {prompt_name} on {model_name}, sending it inline: {str(e)[:80]}")
+            with self._lock:
+                self._entries.pop(key, None)
+                self._unavailable_until[key] = now + self.retry_seconds
+            return None
+        PROMPT_CACHE_EVENTS.inc(prompt=prompt_name, result="created")
+        return self._store(key, _Entry(handle, now + self.ttl_seconds, model))
+
+    def _store(self, key, entry: _Entry) -> _Entry:
+        with self._lock:
+            self._entries[key] = entry
+            self._unavailable_until.pop(key, None)
+        return entry
+
+    def status(self) -> list:
+        now = self._clock()
+        with self._lock:
+            return [
+                {
+                    "model": model_name,
+                    "prompt": prompt_name,
+                    "version": version,
+                    "name": getattr(entry.handle, "name", None),
+                    "expires_in_seconds": round(entry.expires_at - now),
+                }
+                for (model_name, prompt_name, version), entry in self._entries.items()
+            ]
+
+
+# Shared by every analysis in the process
+prompt_cache = PromptCache()
@@ -0,0 +1,229 @@
+"""
+Recording Fetcher
+Shared HTTP fetcher for call and video recordings, with keep-alive
+connection pools per host and an on-disk cache
+
+Recordings are presigned S3 URLs on a handful of hosts. Keeping one pool
+per host lets a batch reuse connections instead of paying a TCP + TLS
+handshake per file, which dominates for short recordings. Presigned URLs
+are re-signed on every export, so the cache is keyed by host and path
+with the signature parameters stripped: the same recording is fetched
+once however many signatures it has been seen with.
+"""
+
+import hashlib
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path, PurePosixPath
+from typing import Dict, Iterable, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+import httpx
+
+from metrics import REGISTRY, timed_stage
+from single_flight import SingleFlight
+
+RECORDING_CACHE_DIR = Path(os.getenv("RECORDING_CACHE_DIR", str(Path(__file__).parent / "recording_cache")))
+# Least recently used recordings are evicted past this size
+RECORDING_CACHE_MAX_BYTES = int(os.getenv("RECORDING_CACHE_MAX_BYTES", str(2 * 1024 ** 3)))
+MAX_CONNECTIONS_PER_HOST = int(os.getenv("RECORDING_MAX_CONNECTIONS_PER_HOST", "8"))
+FETCH_TIMEOUT = 60
+FETCH_CHUNK_BYTES = 256 * 1024
+
+# Query parameters that belong to a signature rather than the object
+SIGNATURE_PARAMS = ("signature", "expires", "awsaccesskeyid")
+SIGNATURE_PARAM_PREFIXES = ("x-amz-",)
+
+RECORDING_FETCHES = REGISTRY.counter(
+    "recording_fetches_total",
+    "Recording fetches by cache result",
+    ("result",),
+)
+RECORDING_BYTES = REGISTRY.counter(
+    "recording_fetched_bytes_total",
+    "Bytes downloaded by the recording fetcher",
+)
+
+
+def _is_signature_param(name: str) -> bool:
+    name = name.lower()
+    return name in SIGNATURE_PARAMS or name.startswith(SIGNATURE_PARAM_PREFIXES)
+
+
+def url_expiry(url: str) -> Optional[float]:
+    """
+    Unix time a presigned URL stops working (None if it isn't presigned)
+
+    SigV4 URLs carry X-Amz-Date (signing time) + X-Amz-Expires (seconds);
+    SigV2 URLs carry Expires as a Unix timestamp.
+    """
+    params = {k.lower(): v for k, v in parse_qsl(urlsplit(url).query)}
+    try:
+        if "x-amz-date" in params and "x-amz-expires" in params:
+            signed_at = datetime.strptime(params["x-amz-date"], "%Y%m%dT%H%M%SZ").replace(tzinfo=timezone.utc)
+            return signed_at.timestamp() + int(params["x-amz-expires"])
+        if "expires" in params:
+            return float(params["expires"])
+    except ValueError:
+        pass
+    return None
+
+
+def cache_key(url: str) -> str:
+    """Stable identity of a recording: host, path and any non-signature query parameters"""
+    parts = urlsplit(url)
+    query = sorted((k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if not _is_signature_param(k))
+    return f"{parts.netloc.lower()}{parts.path}" + (f"?{urlencode(query)}" if query else "")
+
+
+class RecordingFetcher:
+    """
+    Fetches recordings into a local cache over pooled keep-alive connections
+
+    Thread-safe; one instance (recording_fetcher) is shared by the video
+    preprocessing and the call analysis pipeline.
+    """
+
+    def __init__(self, cache_dir: Path = RECORDING_CACHE_DIR, max_cache_bytes: int = RECORDING_CACHE_MAX_BYTES,
+                 max_connections_per_host: int = MAX_CONNECTIONS_PER_HOST, timeout: float = FETCH_TIMEOUT):
+        self.cache_dir = Path(cache_dir)
+        self.max_cache_bytes = max_cache_bytes
+        self.max_connections_per_host = max_connections_per_host
+        self.timeout = timeout
+        self._clients = {}
+        self._lock = threading.Lock()
+        # Concurrent fetches of one recording share a single download
+        self._flights = SingleFlight("recording_fetch")
+
+    def _pool(self, url: str):
+        """(client, slots) for the URL's host"""
+        parts = urlsplit(url)
+        origin = (parts.scheme, parts.netloc.lower())
+        with self._lock:
+            pool = self._clients.get(origin)
+            if pool is None:
+                limits = httpx.Limits(
+                    max_connections=self.max_connections_per_host,
+                    max_keepalive_connections=self.max_connections_per_host,
+                )
+                client = httpx.Client(timeout=self.timeout, follow_redirects=True, limits=limits)
+                # Requests wait here rather than inside httpx's pool, whose
+                # queueing under thread contention can hand out closed sockets
+                slots = threading.BoundedSemaphore(self.max_connections_per_host)
+                pool = self._clients[origin] = (client, slots)
+            return pool
+
+    def cache_path(self, url: str) -> Path:
+        """Where the recording for url is (or would be) cached"""
+        key = cache_key(url)
+        suffix = PurePosixPath(urlsplit(url).path).suffix[:10]
+        return self.cache_dir / (hashlib.sha256(key.encode("utf-8")).hexdigest()[:32] + suffix)
+
+    def cached(self, url: str) -> Optional[Path]:
+        path = self.cache_path(url)
+        return path if path.exists() else None
+
+    def size(self, url: str) -> Optional[int]:
+        """
+        Size in bytes without downloading (None if unknown)
+
+        Uses HEAD; a URL presigned for GET rejects HEAD, so that falls
+        back to a one-byte ranged GET and reads the total from Content-Range.
+        """
+        path = self.cached(url)
+        if path is not None:
+            return path.stat().st_size
+        client, slots = self._pool(url)
+        try:
+            with slots:
+                response = client.head(url)
+                if response.status_code < 400 and "content-length" in response.headers:
+                    return int(response.headers["content-length"])
+                response = client.get(url, headers={"Range": "bytes=0-0"})
+            if response.status_code == 206 and "/" in response.headers.get("content-range", ""):
+                return int(response.headers["content-range"].rsplit("/", 1)[1])
+            if response.status_code == 200 and "content-length" in response.headers:
+                return int(response.headers["content-length"])
+        except (httpx.HTTPError, ValueError):
+            pass
+        return None
+
+    def plan(self, urls: Iterable[str], workers: int = MAX_CONNECTIONS_PER_HOST) -> Dict:
+        """
+        Sizes and cache state for a batch of recordings, for planning
+
+        Returns:
+            {"cached": n, "to_fetch": n, "bytes_to_fetch": n, "unknown_size": n, "sizes": {url: size}}
+        """
+        urls = list(dict.fromkeys(urls))
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            sizes = dict(zip(urls, pool.map(self.size, urls)))
+        cached = {url for url in urls if self.cached(url) is not None}
+        pending = [url for url in urls if url not in cached]
+        return {
+            "cached": len(cached),
+            "to_fetch": len(pending),
+            "bytes_to_fetch": sum(sizes[url] or 0 for url in pending),
+            "unknown_size": sum(1 for url in pending if sizes[url] is None),
+            "sizes": sizes,
+        }
+
+    def fetch(self, url: str) -> Path:
+        """
+        Local path of the recording, downloading it on a cache miss
+
+        Raises:
+            httpx.HTTPError when the download fails
+        """
+        return self._flights.do(cache_key(url), self._fetch, url)
+
+    def _fetch(self, url: str) -> Path:
+        path = self.cache_path(url)
+        if path.exists():
+            RECORDING_FETCHES.inc(result="hit")
+            # Recently used recordings are evicted last
+            os.utime(path)
+            return path
+
+        RECORDING_FETCHES.inc(result="miss")
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        partial = path.with_name(f"{path.name}.{threading.get_ident()}.part")
+        client, slots = self._pool(url)
+        try:
+            with slots, timed_stage("fetch", "download"), open(partial, "wb") as f:
+                with client.stream("GET", url) as response:
+                    response.raise_for_status()
+                    for chunk in response.iter_bytes(FETCH_CHUNK_BYTES):
+                        f.write(chunk)
+                        RECORDING_BYTES.inc(len(chunk))
+            os.replace(partial, path)
+        finally:
+            if partial.exists():
+                partial.unlink()
+
+        self._evict(keep=path)
+        return path
+
+    def _evict(self, keep: Path):
+        with self._lock:
+            files = [p for p in self.cache_dir.iterdir() if p.is_file() and not p.name.endswith(".part")]
+            total = sum(p.stat().st_size for p in files)
+            for old in sorted(files, key=lambda p: p.stat().st_mtime):
+                if total <= self.max_cache_bytes:
+                    break
+                if old == keep:
+                    continue
+                total -= old.stat().st_size
+                old.unlink(missing_ok=True)
+
+    def close(self):
+        with self._lock:
+            for client, _ in self._clients.values():
+                client.close()
+            self._clients.clear()
+
+
+# Shared by every caller in the process so connections are reused
+recording_fetcher = RecordingFetcher()
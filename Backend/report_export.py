@@ -0,0 +1,139 @@
+"""
+Report Export
+Streams call and video reports as NDJSON or CSV, one row at a time
+
+Rows come from lazy generators and are sent in small batches, so memory
+stays flat however many reports there are, and the first bytes go out as
+soon as the first batch is ready. The generators are synchronous, which
+lets Starlette pull them from its threadpool only as fast as the client
+reads (backpressure for free).
+"""
+
+import csv
+import io
+
+from analysis_prompts import ANALYSIS_SCHEMA
+from backlog_scheduler import TRIVIAL_CALL_KEY
+from flatten_csv import CALL_ANALYSIS_PLAN, FlattenPlan, OVERFLOW_COLUMN, csv_value, merge_schemas
+from gemini_usage import USAGE_KEY
+from json_response import dumps
+
+# Flush a chunk to the client once this many bytes are buffered
+EXPORT_CHUNK_BYTES = 64 * 1024
+
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+# Report fields written as CSV columns ahead of the flattened analysis
+CALL_EXPORT_FIELDS = [
+    "report_id", "call_id", "store_name", "locality", "city", "state", "region",
+    "recording_url", "duration_seconds", "call_date", "month", "is_converted", "has_transcript",
+]
+VIDEO_EXPORT_FIELDS = [
+    "report_id", "store_name", "recording_url", "duration", "is_converted", "analyzed",
+    "call_time", "product", "customer_name", "has_transcript",
+]
+
+# Blocks saved video analyses carry besides the prompt's schema: Gemini
+# usage (gemini_usage.py, plus the job name for Batch API results) and the
+# classification of calls too short to analyze (backlog_scheduler.py)
+VIDEO_SCHEMA_VARIANTS = {
+    USAGE_KEY: {
+        "model": "",
+        "prompt_tokens": 0,
+        "output_tokens": 0,
+        "cached_tokens": 0,
+        "total_tokens": 0,
+        "latency_seconds": 0,
+        "mode": "",
+        "analyzed_at": "",
+        "cost_usd": 0,
+        "batch_job": "",
+    },
+    TRIVIAL_CALL_KEY: {
+        "duration_seconds": 0,
+        "threshold_seconds": 0,
+        "classified_at": "",
+    },
+}
+
+# Column plans for each source's analysis schema
+CALL_EXPORT_PLAN = CALL_ANALYSIS_PLAN
+VIDEO_EXPORT_PLAN = FlattenPlan(merge_schemas(ANALYSIS_SCHEMA, VIDEO_SCHEMA_VARIANTS))
+
+
+def _batched(pieces):
+    """Join small byte strings into chunks of about EXPORT_CHUNK_BYTES"""
+    buffer = []
+    size = 0
+    for piece in pieces:
+        buffer.append(piece)
+        size += len(piece)
+        if size >= EXPORT_CHUNK_BYTES:
+            yield b"".join(buffer)
+            buffer = []
+            size = 0
+    if buffer:
+        yield b"".join(buffer)
+
+
+def iter_ndjson(reports):
+    """Yield reports as newline-delimited JSON chunks"""
+    return _batched(dumps(report) + b"\n" for report in reports)
+
+
+def iter_csv(reports, fields, analysis_key: str, plan):
+    """
+    Yield reports as CSV chunks
+
+    Args:
+        reports: Iterable of report dicts
+        fields: Report fields to write ahead of the analysis columns
+        analysis_key: Key holding the analysis dict in each report
+        plan: FlattenPlan for the source's analysis schema
+
+    The analysis is flattened with flatten_csv.py's plans;
+    transcripts (when included) go in a trailing JSON column. The header
+    is written even when there are no reports.
+    """
+    def rows():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+
+        def take():
+            data = buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+            return data
+
+        header = fields + plan.columns + [OVERFLOW_COLUMN]
+        header_written = False
+        for report in reports:
+            if not header_written:
+                writer.writerow(header + (["transcript"] if "transcript" in report else []))
+                header_written = True
+
+            analysis = report.get(analysis_key)
+            values, overflow = plan.flatten(analysis if isinstance(analysis, dict) else {})
+            overflow = dumps(overflow).decode("utf-8") if overflow else None
+            row = [report.get(field) for field in fields] + values + [overflow]
+            if "transcript" in report:
+                transcript = report["transcript"]
+                row.append(dumps(transcript).decode("utf-8") if transcript is not None else None)
+            writer.writerow([csv_value(value) for value in row])
+            yield take()
+
+        if not header_written:
+            writer.writerow(header)
+            yield take()
+
+    return _batched(rows())
+
+
+def export_stream(reports, export_format: str, fields, analysis_key: str, plan):
+    """Byte chunks of the reports in the requested format ('ndjson' or 'csv')"""
+    if export_format == "csv":
+        return iter_csv(reports, fields, analysis_key, plan)
+    return iter_ndjson(reports)
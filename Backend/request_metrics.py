@@ -0,0 +1,155 @@
+"""
+Request Metrics
+ASGI middleware recording per-route latency, response size, status codes
+and in-flight requests, and logging slow requests with a breakdown of
+where their time went (data loading, serialization, compression)
+"""
+
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from starlette.datastructures import Headers
+
+from metrics import REGISTRY
+
+# Requests slower than this (seconds) are logged with their phase breakdown
+SLOW_REQUEST_SECONDS = float(os.getenv("SLOW_REQUEST_SECONDS", "1.0"))
+
+REQUEST_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+REQUEST_SECONDS = REGISTRY.histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route",
+    ("method", "route", "status"),
+    buckets=REQUEST_BUCKETS,
+)
+RESPONSE_BYTES = REGISTRY.histogram(
+    "http_response_size_bytes",
+    "Response body bytes sent (after compression) by route",
+    ("method", "route"),
+    buckets=SIZE_BUCKETS,
+)
+REQUESTS_TOTAL = REGISTRY.counter(
+    "http_requests_total",
+    "HTTP requests by route and status code",
+    ("method", "route", "status"),
+)
+REQUESTS_IN_FLIGHT = REGISTRY.gauge(
+    "http_requests_in_flight",
+    "HTTP requests currently being served",
+)
+PHASE_SECONDS = REGISTRY.histogram(
+    "http_request_phase_seconds",
+    "Time spent per request phase (load, serialize, compress) by route",
+    ("route", "phase"),
+    buckets=REQUEST_BUCKETS,
+)
+
+
+class RequestTimings:
+    """Accumulates phase durations for one request; nested phases aren't double counted"""
+
+    def __init__(self):
+        self.phases = {}
+        self._stack = []
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        self._stack.append(0.0)
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            nested = self._stack.pop()
+            self.phases[name] = self.phases.get(name, 0.0) + elapsed - nested
+            if self._stack:
+                self._stack[-1] += elapsed
+
+
+_current_timings = ContextVar("request_timings", default=None)
+
+
+@contextmanager
+def request_phase(name: str):
+    """
+    Attribute the enclosed work to a phase of the current request
+
+    A no-op outside a request (startup, CLI scripts, background jobs).
+    """
+    timings = _current_timings.get()
+    if timings is None:
+        yield
+        return
+    with timings.phase(name):
+        yield
+
+
+def _route_label(scope) -> str:
+    # The route template keeps label cardinality bounded (no per-id series)
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+class RequestMetricsMiddleware:
+    """
+    Records request metrics; add it last so it wraps every other middleware
+
+    Streaming responses are timed until their last chunk; Server-Sent Event
+    streams are long-lived by design and are never logged as slow.
+    """
+
+    def __init__(self, app, slow_request_seconds: float = SLOW_REQUEST_SECONDS):
+        self.app = app
+        self.slow_request_seconds = slow_request_seconds
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings = RequestTimings()
+        token = _current_timings.set(timings)
+        start = time.perf_counter()
+        status = 500
+        sent_bytes = 0
+        event_stream = False
+
+        async def send_with_metrics(message):
+            nonlocal status, sent_bytes, event_stream
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                content_type = Headers(raw=message["headers"]).get("content-type", "")
+                event_stream = content_type.startswith("text/event-stream")
+            elif message["type"] == "http.response.body":
+                sent_bytes += len(message.get("body", b""))
+            await send(message)
+
+        REQUESTS_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_with_metrics)
+        finally:
+            REQUESTS_IN_FLIGHT.dec()
+            _current_timings.reset(token)
+            elapsed = time.perf_counter() - start
+            method = scope["method"]
+            route = _route_label(scope)
+
+            REQUEST_SECONDS.observe(elapsed, method=method, route=route, status=status)
+            REQUESTS_TOTAL.inc(method=method, route=route, status=status)
+            RESPONSE_BYTES.observe(sent_bytes, method=method, route=route)
+            for phase, seconds in timings.phases.items():
+                PHASE_SECONDS.observe(seconds, route=route, phase=phase)
+
+            if elapsed >= self.slow_request_seconds and not event_stream:
+                breakdown = ", ".join(
+                    f"{phase} {seconds:.3f}s" for phase, seconds in sorted(timings.phases.items())
+                )
+                other = elapsed - sum(timings.phases.values())
+                print(
+                    f"🐢 Slow request: {method} {scope['path']} -> {status} in {elapsed:.3f}s "
+                    f"({breakdown + ', ' if breakdown else ''}other {other:.3f}s, {sent_bytes} bytes)"
+                )
@@ -0,0 +1,229 @@
+"""
+Search Index
+SQLite FTS5 full-text index over call and video analyses (transcripts,
+questions asked, barriers to conversion and summaries)
+"""
+
+import re
+import sqlite3
+import threading
+from pathlib import Path
+
+from request_metrics import request_phase
+
+SEARCH_DB_PATH = Path(__file__).parent / "search_index.db"
+
+# Column weights for bm25 ranking, in table column order
+# (report_id, source, title are unindexed and weigh nothing)
+BM25_WEIGHTS = (0.0, 0.0, 0.0, 1.0, 3.0, 3.0, 2.0)
+
+_write_lock = threading.Lock()
+# Database paths whose schema exists (tests point SEARCH_DB_PATH elsewhere)
+_schema_ready = set()
+_schema_lock = threading.Lock()
+
+SCHEMA = """
+    CREATE VIRTUAL TABLE IF NOT EXISTS documents USING fts5(
+        report_id UNINDEXED,
+        source UNINDEXED,
+        title UNINDEXED,
+        transcript,
+        questions,
+        barriers,
+        summary,
+        tokenize = 'porter unicode61'
+    );
+    CREATE TABLE IF NOT EXISTS indexed_sources (
+        source TEXT PRIMARY KEY,
+        version TEXT
+    );
+"""
+
+
+def _ensure_schema(path):
+    """Switch the database to WAL and create its tables, once per path (again if the file is removed)"""
+    with _schema_lock:
+        if path in _schema_ready and path.exists():
+            return
+        conn = sqlite3.connect(path, timeout=30)
+        try:
+            # WAL is persistent, so later connections needn't set it again
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+        finally:
+            conn.close()
+        _schema_ready.add(path)
+
+
+def _connect():
+    path = SEARCH_DB_PATH
+    _ensure_schema(path)
+    return sqlite3.connect(path, timeout=30, check_same_thread=False)
+
+
+def _text(value) -> str:
+    """Join strings found in a value (str, list or dict) into one text blob"""
+    if isinstance(value, str):
+        return value
+    if isinstance(value, list):
+        return "\n".join(_text(item) for item in value if item)
+    if isinstance(value, dict):
+        return "\n".join(_text(item) for item in value.values() if item)
+    return ""
+
+
+def _transcript_text(transcript) -> str:
+    """Transcript_Log entries carry Text; demo transcripts are {messages: [{text}]}"""
+    if isinstance(transcript, dict):
+        transcript = transcript.get("messages", [])
+    if not isinstance(transcript, list):
+        return ""
+    return "\n".join(
+        str(entry.get("Text") or entry.get("text") or "") if isinstance(entry, dict) else str(entry)
+        for entry in transcript
+    )
+
+
+def extract_search_fields(analysis: dict, transcript=None) -> dict:
+    """
+    Pull the searchable text out of an analysis
+
+    Returns:
+        Dict with title, transcript, questions, barriers and summary text
+    """
+    if not isinstance(analysis, dict):
+        analysis = {}
+    functional = analysis.get("Functional") or analysis.get("Functional_Metadata") or {}
+    customer = analysis.get("Customer_Information") or {}
+    summary = analysis.get("Overall_Summary") or (analysis.get("Agent_Areas") or {}).get("Overall_Summary") or {}
+
+    return {
+        "title": functional.get("Store_Location") or "",
+        "transcript": _transcript_text(transcript),
+        "questions": _text(customer.get("Primary_Questions_Asked")),
+        "barriers": _text(customer.get("Barriers_to_Conversion")),
+        "summary": _text(summary),
+    }
+
+
+def _row(source: str, report_id: str, analysis: dict, transcript, title=None):
+    fields = extract_search_fields(analysis, transcript)
+    return (
+        report_id, source, title or fields["title"],
+        fields["transcript"], fields["questions"], fields["barriers"], fields["summary"],
+    )
+
+
+def index_report(source: str, report_id: str, analysis: dict, transcript=None, title: str = None):
+    """Add or replace one report in the index (used as analyses are saved)"""
+    with _write_lock:
+        conn = _connect()
+        try:
+            with conn:
+                conn.execute("DELETE FROM documents WHERE report_id = ? AND source = ?", (report_id, source))
+                conn.execute(
+                    "INSERT INTO documents VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    _row(source, report_id, analysis, transcript, title),
+                )
+        finally:
+            conn.close()
+
+
+def replace_source(source: str, documents, version: str):
+    """
+    Rebuild every document of one source in a single transaction
+
+    Args:
+        source: "call" or "video"
+        documents: Iterable of (report_id, title, analysis, transcript)
+        version: Source data version recorded alongside the index
+    """
+    with _write_lock:
+        conn = _connect()
+        try:
+            with conn:
+                conn.execute("DELETE FROM documents WHERE source = ?", (source,))
+                conn.executemany(
+                    "INSERT INTO documents VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (_row(source, report_id, analysis, transcript, title)
+                     for report_id, title, analysis, transcript in documents),
+                )
+                conn.execute(
+                    "INSERT OR REPLACE INTO indexed_sources (source, version) VALUES (?, ?)",
+                    (source, version),
+                )
+        finally:
+            conn.close()
+
+
+def get_indexed_version(source: str):
+    """Version of the source data the index was last built from, or None"""
+    conn = _connect()
+    try:
+        row = conn.execute("SELECT version FROM indexed_sources WHERE source = ?", (source,)).fetchone()
+        return row[0] if row else None
+    finally:
+        conn.close()
+
+
+def _match_expression(query: str):
+    """Turn free text into an FTS5 query: every term must match, the last one as a prefix"""
+    terms = re.findall(r"\w+", query)
+    if not terms:
+        return None
+    quoted = [f'"{term}"' for term in terms]
+    quoted[-1] += "*"
+    return " ".join(quoted)
+
+
+def search(query: str, limit: int = 20, offset: int = 0, source: str = None) -> dict:
+    """
+    Ranked full-text search
+
+    Returns:
+        Dict with total match count and one page of results
+        (report_id, source, title, score, snippet)
+    """
+    match = _match_expression(query)
+    if match is None:
+        return {"total": 0, "results": []}
+
+    where = "documents MATCH ?"
+    params = [match]
+    if source:
+        where += " AND source = ?"
+        params.append(source)
+
+    weights = ", ".join(str(weight) for weight in BM25_WEIGHTS)
+    with request_phase("load"):
+        conn = _connect()
+        try:
+            total = conn.execute(f"SELECT COUNT(*) FROM documents WHERE {where}", params).fetchone()[0]
+            rows = conn.execute(
+                f"""
+                SELECT report_id, source, title, bm25(documents, {weights}) AS score,
+                       snippet(documents, -1, '<mark>', '</mark>', '…', 16)
+                FROM documents
+                WHERE {where}
+                ORDER BY score
+                LIMIT ? OFFSET ?
+                """,
+                params + [limit, offset],
+            ).fetchall()
+        finally:
+            conn.close()
+
+    return {
+        "total": total,
+        "results": [
+            {
+                "report_id": report_id,
+                "source": row_source,
+                "title": title,
+                # bm25 is lower-is-better; flip it so higher means more relevant
+                "score": round(-score, 4),
+                "snippet": snippet,
+            }
+            for report_id, row_source, title, score, snippet in rows
+        ],
+    }
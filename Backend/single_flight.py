@@ -0,0 +1,72 @@
+"""
+Single-Flight Calls
+Coalesces concurrent calls for the same key into one execution
+
+The first caller for a key runs the function; callers arriving while it
+is in flight wait for it and get the same result (or the same exception)
+instead of repeating the work. Nothing is cached once the call finishes.
+"""
+
+import threading
+
+from metrics import REGISTRY
+
+SINGLE_FLIGHT_CALLS = REGISTRY.counter(
+    "single_flight_calls_total",
+    "Coalesced calls by group and whether they ran or shared an in-flight result",
+    ("group", "result"),
+)
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Thread-safe; group labels the metrics ("video_analysis", "recording_fetch", ...)"""
+
+    def __init__(self, group: str):
+        self.group = group
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn, *args, **kwargs):
+        """
+        fn(*args, **kwargs), or the result of the call already in flight for key
+
+        Raises:
+            Whatever the shared call raised
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            SINGLE_FLIGHT_CALLS.inc(group=self.group, result="shared")
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        SINGLE_FLIGHT_CALLS.inc(group=self.group, result="ran")
+        try:
+            call.result = fn(*args, **kwargs)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def in_flight(self, key) -> bool:
+        with self._lock:
+            return key in self._calls
@@ -0,0 +1,166 @@
+#!/usr/bin/env python
+"""
+Test script for Gemini Batch API backlog processing against a local fake
+batch API, pre-cached recordings and a fake Files API (no API key or
+network needed)
+"""
+import json
+import os
+import sys
+import tempfile
+from pathlib import Path
+from types import SimpleNamespace
+
+# Add backend to path
+sys.path.insert(0, str(Path(__file__).parent))
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+
+import batch_analysis
+import search_index
+import transcript_store
+import video_analysis_service
+from backlog_scheduler import MIN_ANALYSIS_SECONDS
+from gemini_files import GeminiFileRegistry
+from gemini_usage import parse_duration
+from recording_fetcher import RecordingFetcher
+
+
+class FakeFiles:
+    """Uploads are ACTIVE at once; deletes are recorded"""
+
+    def __init__(self):
+        self.uploads = 0
+        self.deleted = []
+
+    def upload_file(self, path, mime_type=None):
+        self.uploads += 1
+        return SimpleNamespace(name=f"files/{self.uploads}", uri=f"https://files.example/{self.uploads}",
+                               mime_type="video/mp4", state=SimpleNamespace(name="ACTIVE"))
+
+    def get_file(self, name):
+        return SimpleNamespace(name=name, uri=f"https://files.example/{name}",
+                               mime_type="video/mp4", state=SimpleNamespace(name="ACTIVE"))
+
+    def delete_file(self, name):
+        self.deleted.append(name)
+
+
+class FakeBatchAPI:
+    """Jobs move PENDING -> RUNNING -> SUCCEEDED over polls; the first request of each job fails"""
+
+    def __init__(self, polls_until_done: int = 2):
+        self.polls_until_done = polls_until_done
+        self.jobs = {}
+
+    def create(self, model, requests, display_name):
+        name = f"batches/fake-{len(self.jobs) + 1}"
+        self.jobs[name] = {"requests": requests, "polls": 0}
+        return name
+
+    def get(self, name):
+        job = self.jobs[name]
+        job["polls"] += 1
+        if job["polls"] < self.polls_until_done:
+            return {"state": "JOB_STATE_RUNNING", "responses": []}
+
+        responses = []
+        for idx, request in enumerate(job["requests"]):
+            if idx == 0:
+                responses.append({"metadata": request["metadata"], "response": None, "error": "INVALID_ARGUMENT"})
+                continue
+            analysis = {"Store_Name": request["metadata"]["store_name"], "Overall_Score": 4}
+            responses.append({
+                "metadata": request["metadata"],
+                "response": SimpleNamespace(
+                    text=json.dumps(analysis),
+                    usage_metadata=SimpleNamespace(
+                        prompt_token_count=10000, candidates_token_count=2000,
+                        total_token_count=12000, cached_content_token_count=0,
+                    ),
+                ),
+                "error": None,
+            })
+        return {"state": "JOB_STATE_SUCCEEDED", "responses": responses}
+
+
+print("=" * 60)
+print("GEMINI BATCH ANALYSIS TEST")
+print("=" * 60)
+
+# Keep the real stores untouched
+workdir = Path(tempfile.mkdtemp())
+video_analysis_service.VIDEO_ANALYSIS_FILE = workdir / "video_analyses.json"
+batch_analysis.BATCH_JOBS_FILE = workdir / "batch_jobs.json"
+search_index.SEARCH_DB_PATH = workdir / "search_index.db"
+transcript_store.TRANSCRIPT_DIR = workdir / "transcripts"
+
+# The shipped URLs have expired, so every recording is put in the cache up front
+fetcher = RecordingFetcher(cache_dir=workdir / "recordings")
+fetcher.cache_dir.mkdir()
+fake_files = FakeFiles()
+files = GeminiFileRegistry(path=workdir / "gemini_files.json", keep_seconds=0, client=fake_files)
+
+reports = [
+    report for report in video_analysis_service.get_all_video_reports_with_metadata()
+    if isinstance(report["recording_url"], str) and report["recording_url"].strip()
+]
+for report in reports:
+    fetcher.cache_path(report["recording_url"]).write_text(report["report_id"])
+trivial = [report for report in reports if (parse_duration(report["duration"]) or MIN_ANALYSIS_SECONDS) < MIN_ANALYSIS_SECONDS]
+pending = [report for report in reports if report not in trivial]
+print(f"\nPending videos: {len(pending)} (+{len(trivial)} under {MIN_ANALYSIS_SECONDS}s)")
+
+# Test 1: Grouping into batch jobs
+print("\n1. Submitting the backlog in batches of 8...")
+api = FakeBatchAPI()
+submitted = batch_analysis.submit_pending_batches(api, batch_size=8, fetcher=fetcher, files=files)
+expected_jobs = -(-len(pending) // 8)
+print(f"   {'✓' if len(submitted) == expected_jobs else '❌'} {len(submitted)} jobs submitted (expected {expected_jobs})")
+sizes = [len(job["requests"]) for job in api.jobs.values()]
+print(f"   - Requests per job: {sizes}")
+
+requests = [request for job in api.jobs.values() for request in job["requests"]]
+with_video = [request for request in requests if any("file_data" in part for part in request["contents"][0]["parts"])]
+print(f"   {'✓' if len(with_video) == len(requests) and fake_files.uploads == len(pending) else '❌'} "
+      f"{len(with_video)} requests carry their uploaded video ({fake_files.uploads} uploads)")
+classified = video_analysis_service.load_all_video_analyses()
+print(f"   {'✓' if all(report['report_id'] in classified for report in trivial) else '❌'} "
+      f"{len(trivial)} trivial calls classified without a request")
+
+files.sweep()
+print(f"   {'✓' if not fake_files.deleted else '❌'} uploads pinned while the jobs run ({len(fake_files.deleted)} deleted)")
+
+# Test 2: No double submission while jobs are running
+print("\n2. Submitting again while the jobs are running...")
+again = batch_analysis.submit_pending_batches(api, batch_size=8, fetcher=fetcher, files=files)
+print(f"   {'✓' if not again else '❌'} {len(again)} new jobs submitted")
+
+# Test 3: First poll finds everything still running
+print("\n3. Polling running jobs...")
+summary = batch_analysis.collect_batch_results(api, files=files)
+print(f"   {'✓' if summary['running_jobs'] == len(submitted) and summary['saved'] == 0 else '❌'} {summary}")
+
+# Test 4: Second poll collects and saves results
+print("\n4. Collecting finished jobs...")
+summary = batch_analysis.collect_batch_results(api, files=files)
+print(f"   - {summary}")
+print(f"   {'✓' if summary['saved'] == len(pending) - len(submitted) else '❌'} saved {summary['saved']} analyses")
+print(f"   {'✓' if summary['failed'] == len(submitted) else '❌'} {summary['failed']} failed requests recorded")
+
+analyses = video_analysis_service.load_all_video_analyses()
+usage = next(analysis[batch_analysis.USAGE_KEY] for analysis in analyses.values() if batch_analysis.USAGE_KEY in analysis)
+print(f"   {'✓' if usage['mode'] == 'batch' else '❌'} usage recorded in batch mode, cost ${usage['cost_usd']} ({usage['batch_job']})")
+
+files.sweep()
+print(f"   {'✓' if len(fake_files.deleted) == len(pending) else '❌'} {len(fake_files.deleted)} uploads deleted once their jobs finished")
+
+# Test 5: Failed videos stay pending and are resubmitted
+print("\n5. Resubmitting failed videos...")
+resubmitted = batch_analysis.submit_pending_batches(api, batch_size=8, fetcher=fetcher, files=files)
+retry_requests = api.jobs[resubmitted[0]]["requests"] if resubmitted else []
+print(f"   {'✓' if len(retry_requests) == len(submitted) else '❌'} {len(retry_requests)} failed videos resubmitted in {len(resubmitted)} job(s)")
+
+status = batch_analysis.get_batch_status()
+print(f"\nBatch status: {status['active']} videos in running jobs, {len(status['jobs'])} jobs tracked")
+
+print("\n" + "=" * 60)
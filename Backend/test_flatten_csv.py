@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+"""
+Test script for the call column plan in flatten_csv.py against the
+shipped csv data.csv and the original recursive flattener, and for the
+in-memory and streaming modes writing the same output
+"""
+import contextlib
+import io
+import json
+import re
+import sys
+import tempfile
+from pathlib import Path
+
+import pandas as pd
+
+# Add backend to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+import flatten_csv
+from flatten_csv import (
+    CALL_ANALYSIS_PLAN, INPUT_CSV, MAX_LIST_ITEMS, OUTPUT_COLUMNS, flatten_json, flatten_record,
+)
+
+print("=" * 60)
+print("FLATTEN CSV COLUMN PLAN TEST")
+print("=" * 60)
+
+df = pd.read_csv(INPUT_CSV)
+records = df.to_dict('records')
+print(f"\nRows in {INPUT_CSV.name}: {len(records)}")
+
+# Test 1: Every column the recursive flattener produced is in the plan
+print("\n1. Columns compared with the original flattener...")
+old_columns = set()
+for record in records:
+    try:
+        analysis = json.loads(record['call_analysis_json'])
+    except (TypeError, ValueError):
+        continue
+    if isinstance(analysis, dict) and 'error' not in analysis:
+        old_columns.update(flatten_json(analysis))
+
+plan_columns = set(CALL_ANALYSIS_PLAN.columns)
+missing = sorted(old_columns - plan_columns)
+print(f"   {'✓' if not missing else '❌'} {len(old_columns)} original columns, {len(missing)} missing from the plan")
+for column in missing[:10]:
+    print(f"      - {column}")
+
+# Columns the plan adds are only the fixed list slots (Reasons_4, _5, ...)
+slot = re.compile(rf"^(.*)_([1-{MAX_LIST_ITEMS}])$")
+extra = sorted(plan_columns - old_columns)
+unexpected = [column for column in extra
+              if not (slot.match(column) and f"{slot.match(column).group(1)}_count" in plan_columns)]
+print(f"   {'✓' if not unexpected else '❌'} {len(extra)} extra columns, all list slots" if not unexpected
+      else f"   ❌ {len(unexpected)} extra columns that aren't list slots: {unexpected[:10]}")
+
+# Test 2: Nothing spills into the overflow column
+print("\n2. Flattening every row...")
+overflow_idx = OUTPUT_COLUMNS.index('Analysis_Overflow')
+rows = [flatten_record(record) for record in records]
+overflowing = sum(1 for row in rows if row[overflow_idx] is not None)
+print(f"   {'✓' if overflowing == 0 else '❌'} {overflowing} of {len(rows)} rows with overflow")
+
+# Test 3: process_csv and stream_csv write the same file, including for
+# numeric columns with blanks (where dtype inference gives 123.0)
+print("\n3. In-memory vs streaming output...")
+workdir = Path(tempfile.mkdtemp())
+# Read as text so the sample file keeps whole numbers as written
+with_blanks = pd.read_csv(INPUT_CSV, dtype=str).head(40)
+with_blanks.loc[with_blanks.index[::3], ['CleanNumber', 'Duration']] = None
+inputs = {"shipped CSV": INPUT_CSV, "blank numbers": workdir / "blanks.csv"}
+with_blanks.to_csv(inputs["blank numbers"], index=False)
+
+for label, input_csv in inputs.items():
+    flatten_csv.INPUT_CSV = input_csv
+    outputs = []
+    for mode, run in (("process", flatten_csv.process_csv), ("stream", flatten_csv.stream_csv)):
+        flatten_csv.OUTPUT_CSV = workdir / f"{mode}.csv"
+        with contextlib.redirect_stdout(io.StringIO()):
+            run(chunk_size=7)
+        outputs.append(flatten_csv.OUTPUT_CSV.read_bytes())
+    print(f"   {'✓' if outputs[0] == outputs[1] else '❌'} {label}: outputs {'match' if outputs[0] == outputs[1] else 'differ'}")
+
+print("\n" + "=" * 60)
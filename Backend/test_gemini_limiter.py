@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+"""
+Test script for the Gemini rate limiter against a fake API that injects
+rate-limit errors (no API key or network needed)
+"""
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+# Add backend to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from gemini_limiter import GeminiLimiter, TokenBucket, classify_error, is_retryable_error
+
+
+class FakeQuotaError(Exception):
+    """Shaped like google.api_core.exceptions.ResourceExhausted"""
+    code = 429
+
+
+class FakeGeminiAPI:
+    """Answers 429 whenever more than max_concurrent calls overlap"""
+
+    def __init__(self, max_concurrent: int, call_seconds: float = 0.02):
+        self.max_concurrent = max_concurrent
+        self.call_seconds = call_seconds
+        self.active = 0
+        self.calls = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    def generate_content(self, prompt):
+        with self._lock:
+            self.calls += 1
+            if self.active >= self.max_concurrent:
+                self.rejected += 1
+                raise FakeQuotaError("429 Resource has been exhausted (e.g. check quota).")
+            self.active += 1
+        try:
+            time.sleep(self.call_seconds)
+            return f"analysis of {prompt}"
+        finally:
+            with self._lock:
+                self.active -= 1
+
+
+print("=" * 60)
+print("GEMINI RATE LIMITER TEST")
+print("=" * 60)
+
+# Test 1: Error classification
+print("\n1. Classifying errors...")
+checks = [
+    (FakeQuotaError("quota"), (True, True)),
+    (ValueError("400 Invalid argument"), (False, False)),
+    (Exception("503 The model is overloaded"), (True, True)),
+    (TimeoutError("read timed out"), (True, False)),
+]
+for error, expected in checks:
+    status = "✓" if classify_error(error) == expected else "❌"
+    print(f"   {status} {type(error).__name__}: {error} -> {classify_error(error)}")
+wrapped = Exception("Failed to analyze video")
+wrapped.__cause__ = FakeQuotaError("quota")
+print(f"   {'✓' if is_retryable_error(wrapped) else '❌'} wrapped quota error is retryable")
+
+# Test 2: Token bucket pacing
+print("\n2. Token bucket pacing (600 requests/minute = 10/s, burst of 10)...")
+bucket = TokenBucket(600)
+start = time.monotonic()
+for _ in range(20):
+    bucket.acquire()
+elapsed = time.monotonic() - start
+print(f"   {'✓' if elapsed >= 0.9 else '❌'} 20 requests took {elapsed:.2f}s (expected ~1.0s)")
+
+# Test 3: Adaptive concurrency against a fake quota of 3 concurrent calls
+print("\n3. Adaptive concurrency with injected 429s (fake quota: 3 concurrent)...")
+api = FakeGeminiAPI(max_concurrent=3)
+limiter = GeminiLimiter(
+    rpm=60000, initial_concurrency=8, max_concurrency=8,
+    max_attempts=10, backoff_base=0.01, backoff_max=0.1,
+)
+limit_samples = []
+
+
+def analyze(idx):
+    result = limiter.call("generate", api.generate_content, f"video_{idx}")
+    limit_samples.append(limiter.concurrency.limit)
+    return result
+
+
+with ThreadPoolExecutor(max_workers=8) as pool:
+    results = list(pool.map(analyze, range(60)))
+
+print(f"   {'✓' if len(results) == 60 else '❌'} {len(results)}/60 calls succeeded (none marked failed)")
+print(f"   - API calls made: {api.calls}, rejected with 429: {api.rejected}")
+print(f"   - Concurrency limit: started at 8, final {limiter.concurrency.limit}, "
+      f"min seen {min(limit_samples)}")
+print(f"   {'✓' if min(limit_samples) <= 3 else '❌'} limit backed off to the fake quota")
+
+# Test 4: Non-retryable errors fail fast
+print("\n4. Non-retryable errors are raised immediately...")
+attempts = []
+
+
+def bad_request():
+    attempts.append(1)
+    raise ValueError("400 Invalid argument")
+
+
+try:
+    limiter.call("generate", bad_request)
+except ValueError:
+    pass
+print(f"   {'✓' if len(attempts) == 1 else '❌'} raised after {len(attempts)} attempt(s)")
+
+print("\n" + "=" * 60)
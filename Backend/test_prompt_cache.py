@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+"""
+Test script for cached static analysis prompts against a fake Gemini
+caching client (no API key or network needed)
+"""
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from types import SimpleNamespace
+
+# Add backend to path
+sys.path.insert(0, str(Path(__file__).parent))
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+
+import video_analysis_service
+from prompt_cache import PromptCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeCaching:
+    """Counts creates and refreshes; prompts under min_chars are rejected like an under-minimum prompt"""
+
+    def __init__(self, min_chars: int = 0):
+        self.min_chars = min_chars
+        self.creates = 0
+        self.refreshes = 0
+        self.lock = threading.Lock()
+
+    def create(self, model_name, display_name, text, ttl_seconds):
+        if len(text) < self.min_chars:
+            raise ValueError("400 Cached content is too small")
+        with self.lock:
+            self.creates += 1
+            return SimpleNamespace(name=f"cachedContents/{self.creates}", display_name=display_name, text=text)
+
+    def refresh(self, handle, ttl_seconds):
+        with self.lock:
+            self.refreshes += 1
+        return handle
+
+    def model(self, handle):
+        return SimpleNamespace(cached_content=handle.name)
+
+
+print("=" * 60)
+print("PROMPT CACHE TEST")
+print("=" * 60)
+
+# Test 1: One handle per model and prompt version, even under concurrency
+print("\n1. 50 concurrent analyses asking for the cached prompt...")
+clock = FakeClock()
+client = FakeCaching()
+cache = PromptCache(client=client, ttl_seconds=3600, refresh_seconds=300, clock=clock, enabled=True)
+prompt = video_analysis_service.STATIC_ANALYSIS_PROMPT
+with ThreadPoolExecutor(max_workers=8) as pool:
+    models = list(pool.map(lambda _: cache.model("gemini-2.5-flash", "video_analysis", prompt), range(50)))
+same = len({model.cached_content for model in models}) == 1
+print(f"   {'✓' if client.creates == 1 and same else '❌'} {client.creates} handle(s) created for 50 requests")
+
+other_model = cache.model("gemini-2.5-pro", "video_analysis", prompt)
+new_version = cache.model("gemini-2.5-flash", "video_analysis", prompt + "\nBe concise.")
+print(f"   {'✓' if client.creates == 3 else '❌'} another model and a changed prompt get their own handles "
+      f"({other_model.cached_content}, {new_version.cached_content})")
+
+# Test 2: Refreshed before the TTL runs out
+print("\n2. Refreshing near the TTL...")
+clock.now += 3000
+cache.model("gemini-2.5-flash", "video_analysis", prompt)
+print(f"   {'✓' if client.refreshes == 0 else '❌'} no refresh with 10 minutes left")
+clock.now += 400
+cache.model("gemini-2.5-flash", "video_analysis", prompt)
+print(f"   {'✓' if client.refreshes == 1 and client.creates == 3 else '❌'} refreshed with under 5 minutes left")
+clock.now += 3000
+cache.model("gemini-2.5-flash", "video_analysis", prompt)
+print(f"   {'✓' if client.refreshes == 1 else '❌'} refreshed handle lasts another TTL")
+
+# Test 3: Unavailable caching falls back to the inline prompt
+print("\n3. Prompt under the model's cacheable minimum...")
+small = FakeCaching(min_chars=len(prompt) + 1)
+fallback = PromptCache(client=small, retry_seconds=1800, clock=clock, enabled=True)
+first = fallback.model("gemini-1.5-flash", "video_analysis", prompt)
+second = fallback.model("gemini-1.5-flash", "video_analysis", prompt)
+print(f"   {'✓' if first is None and second is None else '❌'} callers get None and send the prompt inline")
+
+# Test 4: Only the per-video part is sent with a cached prompt
+print("\n4. Per-request prompt with and without the cache...")
+video_url = "https://example.com/recordings/video_1.mp4"
+video_analysis_service.prompt_cache = PromptCache(client=FakeCaching(), clock=clock, enabled=True)
+cached_model, cached_parts = video_analysis_service.analysis_model_and_prompt(video_url)
+video_analysis_service.prompt_cache = PromptCache(enabled=False)
+_, inline_parts = video_analysis_service.analysis_model_and_prompt(video_url)
+cached_chars = sum(len(part) for part in cached_parts)
+inline_chars = sum(len(part) for part in inline_parts)
+print(f"   {'✓' if video_url in cached_parts[0] and cached_chars < inline_chars // 100 else '❌'} "
+      f"{cached_chars} chars per request with the cache vs {inline_chars} inline "
+      f"(~{inline_chars // 4} prompt tokens no longer resent per video)")
+
+print("\n" + "=" * 60)
@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+"""
+Test script for the pooled recording fetcher against a local HTTP server
+standing in for S3 (no network needed)
+"""
+import sys
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+# Add backend to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from recording_fetcher import RecordingFetcher, cache_key
+
+RECORDING_BYTES = 200 * 1024
+
+
+class FakeS3Handler(BaseHTTPRequestHandler):
+    """Keep-alive server; like S3, rejects HEAD on URLs presigned for GET (/signed/...)"""
+
+    protocol_version = "HTTP/1.1"
+    connections = 0
+    gets = 0
+    lock = threading.Lock()
+
+    def setup(self):
+        super().setup()
+        with self.lock:
+            FakeS3Handler.connections += 1
+
+    def do_HEAD(self):
+        if self.path.startswith("/signed/"):
+            self.send_response(403)
+            self.send_header("Content-Length", "0")
+        else:
+            self.send_response(200)
+            self.send_header("Content-Length", str(RECORDING_BYTES))
+        self.end_headers()
+
+    def do_GET(self):
+        body = b"\0" * RECORDING_BYTES
+        if self.headers.get("Range") == "bytes=0-0":
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes 0-0/{RECORDING_BYTES}")
+            body = body[:1]
+        else:
+            with self.lock:
+                FakeS3Handler.gets += 1
+            self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+server = ThreadingHTTPServer(("127.0.0.1", 0), FakeS3Handler)
+threading.Thread(target=server.serve_forever, daemon=True).start()
+base_url = f"http://127.0.0.1:{server.server_port}"
+
+
+def signed(path, signature="abc", date="20251230T023515Z"):
+    return (f"{base_url}/signed/{path}?X-Amz-Algorithm=AWS4-HMAC-SHA256&X-Amz-Date={date}"
+            f"&X-Amz-Expires=432000&X-Amz-Signature={signature}")
+
+
+print("=" * 60)
+print("RECORDING FETCHER TEST")
+print("=" * 60)
+
+# Test 1: Cache keys ignore the signature
+print("\n1. Cache keys...")
+same = cache_key(signed("rec_1.mp4", "abc")) == cache_key(signed("rec_1.mp4", "xyz", "20260101T000000Z"))
+different = cache_key(signed("rec_1.mp4")) != cache_key(signed("rec_2.mp4"))
+print(f"   {'✓' if same else '❌'} re-signed URL maps to the same key: {cache_key(signed('rec_1.mp4'))}")
+print(f"   {'✓' if different else '❌'} different recordings get different keys")
+
+fetcher = RecordingFetcher(cache_dir=Path(tempfile.mkdtemp()), max_connections_per_host=4)
+
+# Test 2: Sizes for planning
+print("\n2. Sizes without downloading...")
+head_size = fetcher.size(f"{base_url}/public/rec.mp4")
+range_size = fetcher.size(signed("rec_1.mp4"))
+print(f"   {'✓' if head_size == RECORDING_BYTES else '❌'} HEAD: {head_size} bytes")
+print(f"   {'✓' if range_size == RECORDING_BYTES else '❌'} ranged GET fallback for presigned URL: {range_size} bytes")
+plan = fetcher.plan([signed(f"rec_{i}.mp4") for i in range(10)])
+print(f"   {'✓' if plan['bytes_to_fetch'] == 10 * RECORDING_BYTES else '❌'} plan: {plan['to_fetch']} to fetch, "
+      f"{plan['bytes_to_fetch'] / 1024:.0f} KB")
+
+# Test 3: Connections are pooled across a batch
+print("\n3. Fetching 40 recordings with 8 workers (pool of 4 per host)...")
+connections_before = FakeS3Handler.connections
+with ThreadPoolExecutor(max_workers=8) as pool:
+    paths = list(pool.map(fetcher.fetch, [signed(f"rec_{i}.mp4") for i in range(40)]))
+opened = FakeS3Handler.connections - connections_before
+print(f"   {'✓' if all(p.stat().st_size == RECORDING_BYTES for p in paths) else '❌'} all recordings complete")
+print(f"   {'✓' if opened <= 4 else '❌'} {opened} new connection(s) for 40 downloads")
+
+# Test 4: Re-signed URLs hit the cache
+print("\n4. Fetching the same recordings with new signatures...")
+gets_before = FakeS3Handler.gets
+for i in range(40):
+    fetcher.fetch(signed(f"rec_{i}.mp4", signature="resigned"))
+print(f"   {'✓' if FakeS3Handler.gets == gets_before else '❌'} {FakeS3Handler.gets - gets_before} downloads (all cache hits)")
+
+# Test 5: Least recently used recordings are evicted
+print("\n5. Evicting past the cache budget...")
+small = RecordingFetcher(cache_dir=Path(tempfile.mkdtemp()), max_cache_bytes=3 * RECORDING_BYTES)
+for i in range(5):
+    small.fetch(signed(f"evict_{i}.mp4"))
+kept = sorted(p.name for p in small.cache_dir.iterdir())
+newest_kept = small.cached(signed("evict_4.mp4")) is not None and small.cached(signed("evict_0.mp4")) is None
+print(f"   {'✓' if len(kept) == 3 and newest_kept else '❌'} {len(kept)} recordings kept, oldest evicted")
+
+fetcher.close()
+small.close()
+server.shutdown()
+print("\n" + "=" * 60)
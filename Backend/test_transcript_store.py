@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+"""
+Test script for splitting transcripts out of analyses, on every
+transcript shape and on the shipped call CSV
+"""
+import json
+import sys
+from pathlib import Path
+
+import pandas as pd
+
+# Add backend to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from csv_analysis_service import CSV_PATH
+from transcript_store import split_transcript
+
+TRANSCRIPT = [{"Speaker": "Agent", "Text": "Hello, Duroflex store"}]
+
+
+def leftover(analysis) -> bool:
+    """Whether a transcript key is still anywhere in the analysis"""
+    text = json.dumps(analysis)
+    return '"Transcript_Log"' in text or '"Transcript"' in text
+
+
+print("=" * 60)
+print("TRANSCRIPT STORE TEST")
+print("=" * 60)
+
+# Test 1: Each shape gives up its transcript and leaves the input untouched
+print("\n1. Splitting each transcript shape...")
+shapes = {
+    "Transcript_Log": {"Functional": {}, "Transcript_Log": TRANSCRIPT},
+    "Overall_Summary.Transcript_Log": {"Functional": {}, "Overall_Summary": {"Next_Action": "None", "Transcript_Log": TRANSCRIPT}},
+    "Agent_Areas.Transcript": {"Functional": {}, "Agent_Areas": {"Transcript": TRANSCRIPT}},
+}
+for name, analysis in shapes.items():
+    original = json.dumps(analysis)
+    stripped, transcript = split_transcript(analysis)
+    ok = transcript == TRANSCRIPT and not leftover(stripped) and json.dumps(analysis) == original
+    print(f"   {'✓' if ok else '❌'} {name}")
+
+# Test 2: No transcript is left inline in any row of the call CSV
+print(f"\n2. Splitting every row of {CSV_PATH.name}...")
+split = inline = 0
+for value in pd.read_csv(CSV_PATH)["call_analysis_json"]:
+    try:
+        analysis = json.loads(value)
+    except (TypeError, ValueError):
+        continue
+    stripped, transcript = split_transcript(analysis)
+    split += transcript is not None
+    inline += leftover(stripped)
+print(f"   {'✓' if inline == 0 else '❌'} {split} transcripts split off, {inline} rows still carrying one")
+
+print("\n" + "=" * 60)
@@ -0,0 +1,91 @@
+"""
+Transcript Store
+Keeps call/video transcripts out of the main report objects, in a
+gzip-compressed side store keyed by report id
+"""
+
+import gzip
+import json
+import os
+from pathlib import Path
+
+from request_metrics import request_phase
+
+TRANSCRIPT_DIR = Path(__file__).parent / "transcripts"
+
+# Where transcripts live inside an analysis: the schema's top-level
+# Transcript_Log, Overall_Summary.Transcript_Log (some model responses
+# nest it there) and the demo data's Agent_Areas.Transcript
+TRANSCRIPT_PATHS = [
+    ("Transcript_Log",),
+    ("Overall_Summary", "Transcript_Log"),
+    ("Agent_Areas", "Transcript"),
+]
+
+
+def _transcript_path(report_id: str) -> Path:
+    return TRANSCRIPT_DIR / f"{report_id}.json.gz"
+
+
+def split_transcript(analysis):
+    """
+    Separate the transcript from an analysis
+
+    Returns:
+        (analysis without the transcript, transcript or None). The input is
+        not modified; only the dicts on the transcript's path are copied.
+    """
+    if not isinstance(analysis, dict):
+        return analysis, None
+
+    for path in TRANSCRIPT_PATHS:
+        parent = analysis
+        for key in path[:-1]:
+            parent = parent.get(key) if isinstance(parent, dict) else None
+        if not isinstance(parent, dict) or path[-1] not in parent:
+            continue
+
+        # Copy the dicts along the path so the caller's object is untouched
+        stripped = dict(analysis)
+        node = stripped
+        for key in path[:-1]:
+            node[key] = dict(node[key])
+            node = node[key]
+        transcript = node.pop(path[-1])
+        return stripped, transcript
+
+    return analysis, None
+
+
+def save_transcript(report_id: str, transcript) -> bool:
+    """Write a transcript to the side store (atomically replaces any existing one)"""
+    try:
+        TRANSCRIPT_DIR.mkdir(exist_ok=True)
+        path = _transcript_path(report_id)
+        tmp_path = path.with_suffix(".tmp")
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+            json.dump(transcript, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        return True
+    except Exception as e:
+        print(f"Error saving transcript for {report_id}: {e}")
+        return False
+
+
+def has_transcript(report_id: str) -> bool:
+    """Check whether a transcript is stored for a report"""
+    return _transcript_path(report_id).exists()
+
+
+def load_transcript(report_id: str):
+    """Load a transcript from the side store, or None if there isn't one"""
+    path = _transcript_path(report_id)
+    if not path.exists():
+        return None
+
+    try:
+        with request_phase("load"), gzip.open(path, "rt", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"Error loading transcript for {report_id}: {e}")
+        return None
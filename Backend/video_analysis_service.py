@@ -6,6 +6,22 @@ from pathlib import Path
 from dotenv import load_dotenv
 from typing import List, Dict
 import re
+import threading
+
+from analysis_prompts import EXACT_ANALYSIS_PROMPT
+from transcript_store import split_transcript, save_transcript, has_transcript, load_transcript
+from search_index import index_report, replace_source, get_indexed_version
+from json_response import dumps
+from job_progress import job_tracker
+from metrics import timed_stage
+from request_metrics import request_phase
+from gemini_limiter import gemini_limiter, is_retryable_error
+from gemini_usage import USAGE_KEY, usage_from_response, summarize_usage, estimate_backlog
+from recording_fetcher import recording_fetcher
+from backlog_scheduler import MIN_ANALYSIS_SECONDS
+from single_flight import SingleFlight
+from gemini_files import gemini_files, file_sha256
+from prompt_cache import prompt_cache
 
 # Load environment variables
 load_dotenv()
@@ -23,349 +39,112 @@ genai.configure(api_key=GEMINI_API_KEY)
 VIDEO_ANALYSIS_DIR = Path("video_analysis")
 VIDEO_ANALYSIS_DIR.mkdir(exist_ok=True)
 VIDEO_ANALYSIS_FILE = VIDEO_ANALYSIS_DIR / "video_reports.json"
+VIDEO_CSV_PATH = Path("video calls input call analyzer.csv")
 
+# Bumped on every save so the store version changes even when the file's
+# mtime doesn't (coarse filesystem timestamps, same-size rewrites)
+_store_generation = 0
+_store_lock = threading.Lock()
 
-# The exact prompt from user
-EXACT_ANALYSIS_PROMPT = """{
-  "role": "You are an expert Assisted Sales Call Analyst.",
-  "context": "You are analyzing a video-recorded sales interaction between a Duroflex sales agent and a potential customer. Duroflex is an omnichannel B2C brand specializing in mattresses and furniture. Your analysis will be used for agent coaching and quality assurance.",
-  "objective": "To meticulously evaluate the agent's performance against a predefined framework, identifying strengths and areas for improvement in their sales technique, technical execution, and ability to convert inquiries into sales or store visits.",
-  "input": {
-    "videoUrl": "{video_url}"
-  },
-  "taskFramework": {
-    "instructions": {
-      "ratingScale": {
-        "1": "Poor / Not Attempted",
-        "2": "Below Average",
-        "3": "Average / Met Minimum Standard",
-        "4": "Good / Effective",
-        "5": "Excellent / Exemplary"
-      },
-      "feedback": "For all 'Reasons for Rating' fields, provide 2-3 concise, bulleted points of actionable feedback that justify your score."
-    },
-    "sections": {
-      "Functional": {
-        "Call_ID": "Unique identifier for the call being analyzed.",
-        "Call_Time": "Timestamp of when the call took place (e.g., 2025-10-21 14:35 IST).",
-        "Customer_Name": "Name of the customer (if mentioned in call).",
-        "Agent_Name": "Name of the sales agent (as per video or introduction).",
-        "Store_Location": "Store location from which the video call is happening.",
-        "Agent_Presentability": {
-          "Score": "1 to 5",
-          "Reason_for_Score": "Reason for how presentable the sales agent appeared (looks, tidiness, grooming, being presentation ready)."
-        },
-        "Agent_Video_Quality_Rating": "Score: 1 to 5",
-        "Agent_Audio_Quality_Rating": "Score: 1 to 5",
-        "Customer_Audio_Quality_Rating": "Score: 1 to 5",
-        "Call_Objective_Theme": "Summarize the main purpose: e.g., 'Stock Check', 'Price Inquiry', 'Location/Hours', 'Complaint/Service', 'General Product Info'."
-      },
-      "Customer_Information": {
-        "Type_of_Call": "Was this a Sales Call (Pre-purchase) or a Service Call (Post-purchase)?",
-        "Interest_Category": "Category of interest (Mattress, Sofa, Bed, Accessories).",
-        "Specific_Product_Inquiry": "Did the customer ask about a specific model? List the product name extracted from the conversation or 'General'.",
-        "Primary_Questions_Asked": "List the top 3-4 specific questions asked by the user (e.g., 'Is this available in 6 inch?', 'Do you have exchange offer?').",
-        "Timeline_to_Purchase": {
-          "value": "Short/Medium/Long",
-          "criteria": {
-            "Short": "Immediate need (Today/This Week).",
-            "Medium": "Planning phase (2-4 Weeks).",
-            "Long": "Research phase (> 1 Month)."
-          }
-        },
-        "Customer_Stage_AIDA": {
-          "value": "Awareness/Interest/Desire/Action",
-          "criteria": {
-            "Awareness": "General inquiry.",
-            "Interest": "Specific feature questions.",
-            "Desire": "Comparing/Asking for deals.",
-            "Action": "Ready to visit/buy."
-          }
-        },
-        "Intent_to_Visit_Rating": {
-          "question": "How likely is the customer to visit the store for a physical trial? (High/Med/Low)",
-          "criteria": {
-            "HIGH": "Explicit confirmation/Ask for location.",
-            "MEDIUM": "Tentative interest in trying the mattress.",
-            "LOW": "No commitment/Refusal."
-          }
-        },
-        "Intent_to_Purchase_Rating": {
-          "question": "Urgency to buy? (High/Med/Low)",
-          "criteria": {
-            "HIGH": "Transactional Language: High frequency of questions about price, discounts, payment options.",
-            "MEDIUM": "Comparison/Validation Language: Focus on specific product features, materials, pros/cons.",
-            "LOW": "Exploratory/Educational Language: Asks broad, open-ended questions about general mattress types."
-          }
-        },
-        "Barriers_to_Conversion": "If Intent is Low/Medium, what is the primary reason? (e.g., 'Price too high', 'Stock Unavailable', 'Location too far', 'Just Researching', 'Bad Agent Handling', 'N/A').",
-        "Customer_Satisfaction_Score": {
-          "question": "On a scale of 1 to 5, how would the customer rate the agent interaction based on their overall experience?",
-          "criteria": {
-            "5": "Excellent: Customer expresses explicit satisfaction.",
-            "3": "Average: Neutral tone, transactional.",
-            "1": "Poor: Explicit frustration or ends call abruptly."
-          }
-        }
-      },
-      "Agent_Areas": {
-        "Product_Demonstration": {
-          "Done": "Was a product demonstration performed? (Yes/No)",
-          "Quality_Rating": "Rate the effectiveness of the demonstration. (Rating 1-5)",
-          "Quality_Reasons": "Reasons for Quality Rating",
-          "Relevance_Rating": {
-            "score": "1-5",
-            "criteria": "Did the agent choose to demonstrate features directly relevant to the customer's stated problem?"
-          },
-          "Video_Audio_Quality": {
-            "score": "1-5",
-            "criteria": "Was the lighting and camera angle sufficient? Were all props visible? Was audio clear?"
-          },
-          "Effectiveness": {
-            "score": "1-5",
-            "criteria": "Did the agent effectively translate an intangible feature (comfort, support) into a clear visual action?"
-          },
-          "Customer_Engagement": {
-            "score": "1-5",
-            "criteria": "Did the agent pause to solicit feedback? Was the customer prompted to engage with the visual content?"
-          }
-        },
-        "The_Invitation_to_Visit": {
-          "Attempted": "Yes/No",
-          "Quality_Rating": {
-            "score": "1-5",
-            "criteria": "Did the agent explicitly invite the customer to the store if the online sale wasn't closed? Did they share the location?"
-          },
-          "Reasons": "Reasons for Rating"
-        },
-        "RELAX_Framework": {
-          "R_Reach_Out": {
-            "title": "Greeting & Rapport",
-            "rating": "1-5",
-            "reasons": "Reasons for Rating"
-          },
-          "E_Explore_Needs": {
-            "title": "Discovery & Understanding",
-            "rating": "1-5",
-            "reasons": "Reasons for Rating"
-          },
-          "L_Link_Demo": {
-            "title": "Connecting Needs to Product Features via Demo",
-            "rating": "1-5",
-            "reasons": "Reasons for Rating"
-          },
-          "A_Add_Value": {
-            "title": "Cross-Selling & Upselling",
-            "rating": "1-5",
-            "reasons": "Reasons for Rating"
-          },
-          "X_Express_Offers": {
-            "title": "Closing & Next Steps",
-            "rating": "1-5",
-            "reasons": "Reasons for Rating"
-          }
-        },
-        "SoftSkills_Rating": {
-          "Active_Listening": {
-            "score": "1-5",
-            "criteria": "Assesses the agent's focus. Did the agent interrupt? Did they repeat pain points?"
-          },
-          "Empathy_Rapport": {
-            "score": "1-5",
-            "criteria": "Assesses emotional connection. Did the agent validate feelings or concerns?"
-          },
-          "Clarity_Confidence": {
-            "score": "1-5",
-            "criteria": "Were explanations easy to understand? Was the tone confident and positive?"
-          },
-          "Objection_Handling": {
-            "score": "1-5",
-            "criteria": "Did the agent acknowledge concerns before responding? Was the response framed as a benefit?"
-          },
-          "Hold_and_Dead_Air_Management": {
-            "score": "1-5",
-            "criteria": "Did the agent manage time effectively when checking stock/moving product? Did they keep the customer engaged or leave them looking at a blank screen?"
-          },
-          "Agent_Language_Fluency_Score": {
-            "score": "1-5",
-            "criteria": "Did the agent communicate clearly in the customer's preferred language? (5=Fluent/Native, 1=Struggled/Language Barrier)."
-          }
-        },
-        "Top_3_Improvement_Areas": "List the top three areas where the agent scored lowest, providing specific, actionable advice for coaching."
-      },
-      "Overall_Summary": {
-        "Chronological_Call_Summary": "Provide a brief, step-by-step summary of how the call unfolded from start to finish.",
-        "Agent_Handling_Summary": "Summarize the agent's overall performance, highlighting key strengths and weaknesses.",
-        "Customer_Satisfaction_Summary": "Describe the customer's journey and overall experience during the call.",
-        "Next_Action": "What is the specific next step defined? (e.g., 'Customer buying online', 'Customer visiting at 5PM', 'Agent sending WhatsApp Location', 'No Action')."
-      }
-    }
-  },
-  "outputFormat": {
-    "instruction": "Present your complete analysis as a single, well-structured JSON object. Do not include any text, headers, or explanations outside the JSON block. All numerical ratings (1-5) must be stored as integers. All feedback points (Reasons for Rating) must be stored as arrays of strings. Boolean values (Yes/No, Attempted?) must be stored as true/false (Booleans).",
-    "schema": {
-      "Functional": {
-        "Call_ID": "",
-        "Call_Time": "",
-        "Customer_Name": "",
-        "Agent_Name": "",
-        "Store_Location": "",
-        "Agent_Presentability": {
-          "Score": 0,
-          "Reason_for_Score": ""
-        },
-        "Agent_Video_Quality_Rating": 0,
-        "Agent_Audio_Quality_Rating": 0,
-        "Customer_Audio_Quality_Rating": 0,
-        "Call_Objective_Theme": ""
-      },
-      "Customer_Information": {
-        "Type_of_Call": "",
-        "Interest_Category": "",
-        "Specific_Product_Inquiry": "",
-        "Primary_Questions_Asked": [
-          ""
-        ],
-        "Timeline_to_Purchase": "",
-        "Customer_Stage_AIDA": "",
-        "Intent_to_Visit_Rating": "",
-        "Intent_to_Visit_Rating_Reasons": [
-          ""
-        ],
-        "Intent_to_Purchase_Rating": "",
-        "Intent_to_Purchase_Rating_Reasons": [
-          ""
-        ],
-        "Barriers_to_Conversion": "",
-        "Customer_Satisfaction_Score": 0,
-        "Customer_Satisfaction_Score_Reasons": [
-          ""
-        ]
-      },
-      "Agent_Areas": {
-        "Product_Demonstration": {
-          "Done": false,
-          "Quality_Rating": 0,
-          "Quality_Reasons": [
-            ""
-          ],
-          "Relevance_Rating": 0,
-          "Relevance_Rating_Reason": "",
-          "Video_Audio_Quality_Rating": 0,
-          "Video_Audio_Quality_Reason": "",
-          "Effectiveness_Rating": 0,
-          "Effectiveness_Rating_Reason": "",
-          "Customer_Engagement_Rating": 0,
-          "Customer_Engagement_Reason": ""
-        },
-        "The_Invitation_to_Visit": {
-          "Attempted": false,
-          "Quality_Rating": 0,
-          "Reasons": [
-            ""
-          ]
-        },
-        "RELAX_Framework": {
-          "R_Reach_Out": {
-            "Rating": 0,
-            "Reasons": [
-              ""
-            ]
-          },
-          "E_Explore_Needs": {
-            "Rating": 0,
-            "Reasons": [
-              ""
-            ]
-          },
-          "L_Link_Demo": {
-            "Rating": 0,
-            "Reasons": [
-              ""
-            ]
-          },
-          "A_Add_Value": {
-            "Rating": 0,
-            "Reasons": [
-              ""
-            ]
-          },
-          "X_Express_Offers": {
-            "Rating": 0,
-            "Reasons": [
-              ""
-            ]
-          }
-        },
-        "SoftSkills": {
-          "Active_Listening_Rating": 0,
-          "Active_Listening_Reasons": [
-            ""
-          ],
-          "Empathy_Rapport_Rating": 0,
-          "Empathy_Rapport_Reasons": [
-            ""
-          ],
-          "Clarity_Confidence_Rating": 0,
-          "Clarity_Confidence_Reasons": [
-            ""
-          ],
-          "Objection_Handling_Rating": 0,
-          "Objection_Handling_Reasons": [
-            ""
-          ],
-          "Hold_and_Dead_Air_Management_Rating": 0,
-          "Hold_and_Dead_Air_Management_Reasons": [
-            ""
-          ],
-          "Agent_Language_Fluency_Score": 0,
-          "Top_3_Improvement_Areas": [
-            ""
-          ]
-        }
-      },
-      "Overall_Summary": {
-        "Chronological_Call_Summary": "",
-        "Agent_Handling_Summary": "",
-        "Customer_Satisfaction_Summary": "",
-        "Next_Action": ""
-      },
-      "Transcript_Log": [
-        {
-          "Speaker": "Agent/Customer",
-          "Text": "...",
-          "Timestamp": "00:00"
-        }
-      ]
-    }
-  }
-}"""
+# Serialized /api/video-reports body for the current store version
+_reports_payload_cache = {"version": None, "payload": None}
+
+# Concurrent analyses of one report, or of one video file under several
+# reports, run once and share the result
+_report_flights = SingleFlight("video_analysis")
+_content_flights = SingleFlight("video_content")
+
+
+def _file_version(path: Path) -> str:
+    if not path.exists():
+        return "0"
+    stat = path.stat()
+    return f"{stat.st_mtime_ns}-{stat.st_size}"
+
+
+def get_video_store_version() -> str:
+    """Version of the video report data (input CSV, analysis store and save generation)"""
+    return f"{_file_version(VIDEO_CSV_PATH)}:{_file_version(VIDEO_ANALYSIS_FILE)}:{_store_generation}"
 
 
 def load_video_csv():
     """Load the video calls CSV file"""
-    csv_path = Path("video calls input call analyzer.csv")
-    if not csv_path.exists():
+    if not VIDEO_CSV_PATH.exists():
         return pd.DataFrame()
-    return pd.read_csv(csv_path)
+    with request_phase("load"):
+        return pd.read_csv(VIDEO_CSV_PATH)
+
+
+def _read_video_store() -> dict:
+    """The analysis file as stored (transcripts written before the transcript store may still be inline)"""
+    if not VIDEO_ANALYSIS_FILE.exists():
+        return {}
+    with request_phase("load"), open(VIDEO_ANALYSIS_FILE, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _write_video_store(reports: dict):
+    global _store_generation
+    with open(VIDEO_ANALYSIS_FILE, 'w', encoding='utf-8') as f:
+        json.dump(reports, f, indent=2, ensure_ascii=False)
+    _store_generation += 1
+
+
+def _move_inline_transcripts(reports: dict) -> int:
+    """Move inline transcripts to the transcript store, stripping them in place; returns how many"""
+    moved = 0
+    for report_id, analysis in reports.items():
+        stripped, transcript = split_transcript(analysis)
+        if transcript is not None:
+            if not has_transcript(report_id):
+                save_transcript(report_id, transcript)
+            reports[report_id] = stripped
+            moved += 1
+    return moved
+
+
+def migrate_inline_transcripts() -> int:
+    """
+    Move transcripts still stored inline in the analysis file to the
+    transcript store and rewrite the file without them
+
+    A one-off command (python video_analysis_service.py migrate-transcripts);
+    the server reads inline transcripts as they are and never rewrites the
+    file for them.
+
+    Returns:
+        Number of analyses migrated
+    """
+    with _store_lock:
+        reports = _read_video_store()
+        moved = _move_inline_transcripts(reports)
+        if moved:
+            _write_video_store(reports)
+    return moved
 
 
 def save_video_analysis(report_id: str, analysis_data: dict):
-    """Save video analysis to JSON file"""
+    """Save video analysis to JSON file (the transcript goes to the transcript store)"""
     try:
-        # Load existing reports
-        if VIDEO_ANALYSIS_FILE.exists():
-            with open(VIDEO_ANALYSIS_FILE, 'r', encoding='utf-8') as f:
-                reports = json.load(f)
-        else:
-            reports = {}
+        analysis_data, transcript = split_transcript(analysis_data)
+        if transcript is not None:
+            save_transcript(report_id, transcript)
         
-        # Add/update report
-        reports[report_id] = analysis_data
+        with _store_lock:
+            # Load existing reports (other entries are written back as they were)
+            reports = _read_video_store()
+            
+            # Add/update report
+            reports[report_id] = analysis_data
+            
+            # Save back
+            _write_video_store(reports)
         
-        # Save back
-        with open(VIDEO_ANALYSIS_FILE, 'w', encoding='utf-8') as f:
-            json.dump(reports, f, indent=2, ensure_ascii=False)
+        # Keep the search index current
+        try:
+            index_report("video", report_id, analysis_data, transcript)
+        except Exception as e:
+            print(f"Error indexing video analysis {report_id}: {e}")
         
         return True
     except Exception as e:
@@ -373,17 +152,57 @@ def save_video_analysis(report_id: str, analysis_data: dict):
         return False
 
 
-def load_all_video_analyses():
-    """Load all video analyses"""
-    if not VIDEO_ANALYSIS_FILE.exists():
-        return {}
-    
+def _load_video_store():
+    """
+    (analyses without transcripts, inline transcripts by report id)
+
+    Transcripts saved inline before the transcript store are split off
+    here, at read time; nothing is written.
+    """
     try:
-        with open(VIDEO_ANALYSIS_FILE, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        stored = _read_video_store()
     except Exception as e:
         print(f"Error loading video analyses: {e}")
-        return {}
+        return {}, {}
+    
+    analyses, inline = {}, {}
+    for report_id, analysis in stored.items():
+        analyses[report_id], transcript = split_transcript(analysis)
+        if transcript is not None:
+            inline[report_id] = transcript
+    return analyses, inline
+
+
+def load_all_video_analyses():
+    """Load all video analyses (without transcripts)"""
+    return _load_video_store()[0]
+
+
+def load_video_transcript(report_id: str):
+    """Transcript of a video report, from the transcript store or inline in the analysis file"""
+    transcript = load_transcript(report_id)
+    if transcript is None:
+        transcript = _load_video_store()[1].get(report_id)
+    return transcript
+
+
+def video_has_transcript(report_id: str) -> bool:
+    """Check whether a video report has a transcript (stored or inline)"""
+    return has_transcript(report_id) or report_id in _load_video_store()[1]
+
+
+def sync_video_search_index():
+    """Index every stored video analysis once; after that save_video_analysis keeps it current"""
+    if get_indexed_version("video") is not None:
+        return
+    
+    analyses, inline = _load_video_store()
+    replace_source(
+        "video",
+        ((report_id, None, analysis, load_transcript(report_id) or inline.get(report_id))
+         for report_id, analysis in analyses.items()),
+        version="incremental",
+    )
 
 
 def get_video_analysis_by_id(report_id: str):
@@ -392,110 +211,175 @@ def get_video_analysis_by_id(report_id: str):
     return all_analyses.get(report_id)
 
 
-def analyze_video_with_gemini(video_url: str, store_name: str = "Unknown Store") -> dict:
+def build_analysis_prompt(video_url: str) -> str:
+    """The analysis prompt for a video (the prompt is JSON, so str.format can't be used)"""
+    return EXACT_ANALYSIS_PROMPT.replace("{video_url}", video_url)
+
+
+# The prompt minus its one per-video field, cached once per model (prompt_cache)
+STATIC_ANALYSIS_PROMPT = build_analysis_prompt("(given with the video below)")
+
+
+def analysis_model_and_prompt(video_url: str):
+    """
+    (model, prompt parts) for analyzing one video
+
+    With a cached prompt only the video URL is sent; otherwise the whole
+    prompt is.
+    """
+    model = prompt_cache.model(MODEL_NAME, "video_analysis", STATIC_ANALYSIS_PROMPT)
+    if model is not None:
+        return model, [f"videoUrl: {video_url}"]
+    return genai.GenerativeModel(MODEL_NAME), [build_analysis_prompt(video_url)]
+
+
+def parse_analysis_response(response_text: str, store_name: str = "Unknown Store") -> dict:
+    """Extract the analysis JSON from a Gemini response, wrapping the raw text when there is none"""
+    # Try to extract JSON from the response
+    try:
+        # Look for JSON content in the response
+        with timed_stage("video", "parse"):
+            json_match = re.search(r'\{.*\}', response_text, re.DOTALL)
+            if json_match:
+                analysis_json = json.loads(json_match.group())
+        if not json_match:
+            # If no JSON found, create a structured response
+            analysis_json = {
+                "Functional": {
+                    "Call_ID": f"VIDEO_{store_name.upper().replace(' ', '_')}",
+                    "Call_Time": "Not extracted",
+                    "Customer_Name": "Not extracted",
+                    "Agent_Name": "Not extracted",
+                    "Store_Location": store_name,
+                    "Agent_Presentability": {"Score": 0, "Reason_for_Score": "Video analysis not available"},
+                    "Agent_Video_Quality_Rating": 0,
+                    "Agent_Audio_Quality_Rating": 0,
+                    "Customer_Audio_Quality_Rating": 0,
+                    "Call_Objective_Theme": "Not extracted"
+                },
+                "Customer_Information": {},
+                "Agent_Areas": {},
+                "Overall_Summary": {
+                    "Chronological_Call_Summary": response_text,
+                    "Agent_Handling_Summary": "Analysis pending full video processing",
+                    "Customer_Satisfaction_Summary": "",
+                    "Next_Action": ""
+                }
+            }
+    except json.JSONDecodeError:
+        # If JSON parsing fails, wrap the response
+        analysis_json = {
+            "Functional": {
+                "Call_ID": f"VIDEO_{store_name.upper().replace(' ', '_')}",
+                "Store_Location": store_name,
+            },
+            "Overall_Summary": {
+                "Chronological_Call_Summary": response_text
+            }
+        }
+    
+    return analysis_json
+
+
+def _generate_from_file(model, prompt_parts: list, video_path: str, content_hash: str, report_progress):
+    """
+    Upload a local video (or reuse its upload) and run the prompt on it
+
+    Returns:
+        (response, generate seconds)
+    """
+    report_progress("uploading")
+    with timed_stage("video", "upload"):
+        file = gemini_files.acquire(video_path, content_hash=content_hash)
+    try:
+        report_progress("processing")
+        with timed_stage("video", "generate") as generate_span:
+            response = gemini_limiter.call(
+                "generate", model.generate_content,
+                [*prompt_parts, file],
+                generation_config=genai.types.GenerationConfig(
+                    temperature=0.7,
+                    max_output_tokens=4000,
+                )
+            )
+    finally:
+        gemini_files.release(content_hash)
+    return response, generate_span.seconds
+
+
+def analyze_video_with_gemini(video_url: str, store_name: str = "Unknown Store", progress=None) -> dict:
     """
     Analyze a video using Gemini API with the exact provided prompt
+
+    Args:
+        video_url: Recording URL or local video path
+        store_name: Store name used in fallback results
+        progress: Optional callable(state) told when each stage starts
+            ("downloading", "uploading", "processing", "parsing")
+
+    Recording URLs are fetched through the shared recording fetcher and
+    uploaded like local files; if that fails the URL is only referenced
+    in the prompt. Concurrent analyses of the same file content share one
+    upload and generation, and re-runs reuse the upload (gemini_files).
     """
+    report_progress = progress or (lambda state: None)
     try:
         print(f"Analyzing video from {video_url}")
         
-        # Prepare the prompt with the video URL
-        prompt_text = EXACT_ANALYSIS_PROMPT.format(video_url=video_url)
-        
-        # Create the model instance
-        model = genai.GenerativeModel(MODEL_NAME)
+        # Create the model instance and the prompt for this video (the
+        # static part of the prompt is cached when the model supports it)
+        model, prompt_parts = analysis_model_and_prompt(video_url)
         
-        # Upload the video file to Gemini (if it's a local path)
-        # For URLs, we'll pass them directly in the prompt
+        # Upload the video file to Gemini, fetching recording URLs first
         try:
-            # Try to upload as file if it's a local path
             if video_url.startswith(('http://', 'https://')):
-                # For URLs, use them directly in the prompt
-                response = model.generate_content(
-                    [prompt_text],
-                    generation_config=genai.types.GenerationConfig(
-                        temperature=0.7,
-                        max_output_tokens=4000,
-                    )
-                )
+                report_progress("downloading")
+                video_path = str(recording_fetcher.fetch(video_url))
             else:
-                # For local files
-                file = genai.upload_file(video_url)
-                response = model.generate_content(
-                    [prompt_text, file],
+                video_path = video_url
+            content_hash = file_sha256(video_path)
+            response, generate_seconds = _content_flights.do(
+                content_hash, _generate_from_file, model, prompt_parts, video_path, content_hash, report_progress
+            )
+        except Exception as e:
+            if is_retryable_error(e):
+                # Out of retries on quota / overload; the fallback would hit the same wall
+                raise
+            print(f"Note: Could not upload file directly, using URL in prompt: {e}")
+            report_progress("processing")
+            with timed_stage("video", "generate") as generate_span:
+                response = gemini_limiter.call(
+                    "generate", model.generate_content,
+                    prompt_parts,
                     generation_config=genai.types.GenerationConfig(
                         temperature=0.7,
                         max_output_tokens=4000,
                     )
                 )
-        except Exception as e:
-            print(f"Note: Could not upload file directly, using URL in prompt: {e}")
-            response = model.generate_content(
-                [prompt_text],
-                generation_config=genai.types.GenerationConfig(
-                    temperature=0.7,
-                    max_output_tokens=4000,
-                )
-            )
+            generate_seconds = generate_span.seconds
         
         # Parse the response
+        report_progress("parsing")
+        usage = usage_from_response(response, MODEL_NAME, generate_seconds)
         response_text = response.text
         
-        # Try to extract JSON from the response
-        try:
-            # Look for JSON content in the response
-            json_match = re.search(r'\{.*\}', response_text, re.DOTALL)
-            if json_match:
-                analysis_json = json.loads(json_match.group())
-            else:
-                # If no JSON found, create a structured response
-                analysis_json = {
-                    "Functional": {
-                        "Call_ID": f"VIDEO_{store_name.upper().replace(' ', '_')}",
-                        "Call_Time": "Not extracted",
-                        "Customer_Name": "Not extracted",
-                        "Agent_Name": "Not extracted",
-                        "Store_Location": store_name,
-                        "Agent_Presentability": {"Score": 0, "Reason_for_Score": "Video analysis not available"},
-                        "Agent_Video_Quality_Rating": 0,
-                        "Agent_Audio_Quality_Rating": 0,
-                        "Customer_Audio_Quality_Rating": 0,
-                        "Call_Objective_Theme": "Not extracted"
-                    },
-                    "Customer_Information": {},
-                    "Agent_Areas": {},
-                    "Overall_Summary": {
-                        "Chronological_Call_Summary": response_text,
-                        "Agent_Handling_Summary": "Analysis pending full video processing",
-                        "Customer_Satisfaction_Summary": "",
-                        "Next_Action": ""
-                    }
-                }
-        except json.JSONDecodeError:
-            # If JSON parsing fails, wrap the response
-            analysis_json = {
-                "Functional": {
-                    "Call_ID": f"VIDEO_{store_name.upper().replace(' ', '_')}",
-                    "Store_Location": store_name,
-                },
-                "Overall_Summary": {
-                    "Chronological_Call_Summary": response_text
-                }
-            }
+        analysis_json = parse_analysis_response(response_text, store_name)
         
+        # Token counts, model and latency are stored with the result
+        if isinstance(analysis_json, dict):
+            analysis_json[USAGE_KEY] = usage
         return analysis_json
         
     except Exception as e:
         print(f"Error analyzing video: {e}")
-        raise Exception(f"Failed to analyze video: {str(e)}")
+        raise Exception(f"Failed to analyze video: {str(e)}") from e
 
 
-def get_all_video_reports_with_metadata():
-    """Get all video reports with metadata from CSV"""
+def iter_video_reports_with_metadata(include_transcripts: bool = False):
+    """Yield video reports with metadata from CSV one at a time"""
     csv_df = load_video_csv()
-    analyses = load_all_video_analyses()
+    analyses, inline = _load_video_store()
     
-    reports = []
     for idx, row in csv_df.iterrows():
         report_id = f"video_{idx}"
         store_name = row.get('Store Name', 'Unknown')
@@ -517,7 +401,7 @@ def get_all_video_reports_with_metadata():
             product = functional.get('Product_of_Interest')
             customer_name = functional.get('Customer_Name')
         
-        reports.append({
+        report = {
             "report_id": report_id,
             "store_name": store_name,
             "recording_url": recording_url,
@@ -527,7 +411,89 @@ def get_all_video_reports_with_metadata():
             "call_time": call_time,
             "product": product,
             "customer_name": customer_name,
+            "has_transcript": analysis is not None and (report_id in inline or has_transcript(report_id)),
             "analysis_data": analysis
-        })
+        }
+        if include_transcripts:
+            report["transcript"] = (load_transcript(report_id) or inline.get(report_id)) if analysis is not None else None
+        yield report
+
+
+def _analyze_and_save(report_id: str, video_url: str, store_name: str, progress) -> dict:
+    # Analyzed since this job was queued (e.g. on demand while preprocessing waited)
+    existing = get_video_analysis_by_id(report_id)
+    if existing is not None and not existing.get("error"):
+        return existing
+    
+    analysis_result = analyze_video_with_gemini(video_url=video_url, store_name=store_name, progress=progress)
+    with timed_stage("video", "save"):
+        save_video_analysis(report_id, analysis_result)
+    return analysis_result
+
+
+def run_analysis_job(job_id: str, report_id: str, video_url: str, store_name: str) -> dict:
+    """
+    Analyze and save one video, reporting each stage to the job tracker
+
+    Blocking; run it in a worker thread. Failures mark the job failed and
+    are re-raised. A job for a report already being analyzed waits for
+    that analysis and shares its result instead of running a second one.
+    """
+    try:
+        analysis_result = _report_flights.do(
+            report_id, _analyze_and_save, report_id, video_url, store_name, job_tracker.progress_callback(job_id)
+        )
+    except Exception as e:
+        job_tracker.update(job_id, "failed", error=str(e))
+        raise
+    
+    job_tracker.update(job_id, "saved")
+    return analysis_result
+
+
+def get_all_video_reports_with_metadata():
+    """Get all video reports with metadata from CSV"""
+    return list(iter_video_reports_with_metadata())
+
+
+def get_usage_summary() -> dict:
+    """Gemini token usage and cost of stored analyses, by store and day"""
+    return summarize_usage(get_all_video_reports_with_metadata())
+
+
+def estimate_pending_backlog(model_name: str = None) -> dict:
+    """Pre-flight token / cost / time estimate for videos not analyzed yet"""
+    # ~4 characters per token for the text prompt sent with every video
+    prompt_overhead_tokens = len(EXACT_ANALYSIS_PROMPT) // 4
+    return estimate_backlog(
+        get_all_video_reports_with_metadata(),
+        model_name or MODEL_NAME,
+        prompt_overhead_tokens=prompt_overhead_tokens,
+        min_duration_seconds=MIN_ANALYSIS_SECONDS,
+    )
+
+
+def get_video_reports_payload(version: str = None) -> bytes:
+    """Serialized /api/video-reports response body, rebuilt only when the store version changes"""
+    version = version or get_video_store_version()
+    if _reports_payload_cache["version"] != version:
+        reports = get_all_video_reports_with_metadata()
+        _reports_payload_cache.update(
+            version=version,
+            payload=dumps({
+                "status": "success",
+                "total": len(reports),
+                "reports": reports
+            })
+        )
+    return _reports_payload_cache["payload"]
+
+
+if __name__ == "__main__":
+    import sys
     
-    return reports
+    if sys.argv[1:] != ["migrate-transcripts"]:
+        print("Usage: python video_analysis_service.py migrate-transcripts")
+        sys.exit(1)
+    migrated = migrate_inline_transcripts()
+    print(f"📝 Moved {migrated} inline video transcripts to the transcript store")
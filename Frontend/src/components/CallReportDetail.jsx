@@ -10,6 +10,7 @@ const CallReportDetail = () => {
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState('');
   const [expandTranscript, setExpandTranscript] = useState(false);
+  const [transcript, setTranscript] = useState(null);
 
   useEffect(() => {
     fetchReport();
@@ -21,6 +22,7 @@ const CallReportDetail = () => {
       if (!res.ok) throw new Error('Failed to load report');
       const data = await res.json();
       setReport(data.report);
+      setTranscript(null);
     } catch (err) {
       setError(err.message);
     } finally {
@@ -28,6 +30,27 @@ const CallReportDetail = () => {
     }
   };
 
+  // Transcripts are served separately and only fetched when needed
+  const loadTranscript = async () => {
+    if (transcript) return transcript;
+    try {
+      const res = await fetch(`${API_BASE}/api/call-reports/${report.report_id}/transcript`);
+      if (!res.ok) throw new Error('Failed to load transcript');
+      const data = await res.json();
+      const entries = Array.isArray(data.transcript) ? data.transcript : [];
+      setTranscript(entries);
+      return entries;
+    } catch (err) {
+      console.error(err);
+      return [];
+    }
+  };
+
+  const toggleTranscript = async () => {
+    if (!expandTranscript) await loadTranscript();
+    setExpandTranscript(!expandTranscript);
+  };
+
   const downloadCSV = () => {
     if (!report) return;
 
@@ -116,14 +139,14 @@ const CallReportDetail = () => {
     URL.revokeObjectURL(link.href);
   };
 
-  const downloadTranscript = () => {
+  const downloadTranscript = async () => {
     if (!report) return;
 
     const analysis = report.analysis || {};
-    const transcript = analysis.Transcript_Log || [];
+    const entries = report.has_transcript ? await loadTranscript() : [];
     const functional = analysis.Functional || {};
 
-    if (transcript.length === 0) {
+    if (entries.length === 0) {
       alert('No transcript available for this call');
       return;
     }
@@ -141,7 +164,7 @@ const CallReportDetail = () => {
     textContent += `${'='.repeat(80)}\n\n`;
 
     // Add transcript entries
-    transcript.forEach((entry, index) => {
+    entries.forEach((entry, index) => {
       const timestamp = entry.Timestamp || `${index + 1}`;
       const speaker = entry.Speaker || 'Unknown';
       const text = entry.Text || '';
@@ -206,7 +229,6 @@ const CallReportDetail = () => {
   const customer = analysis.Customer_Information || {};
   const agent = analysis.Agent_Areas || {};
   const summary = analysis.Overall_Summary || {};
-  const transcript = analysis.Transcript_Log || [];
   const relax = agent.RELAX_Framework || {};
   const softSkills = agent.SoftSkills_Etiquette || {};
   const knowledge = agent.Verbal_Product_Knowledge || {};
@@ -622,12 +644,12 @@ const CallReportDetail = () => {
         </div>
 
         {/* TRANSCRIPT */}
-        {transcript && transcript.length > 0 && (
+        {report.has_transcript && (
           <div className="bg-[#0f0f14] border border-white/6 rounded-2xl overflow-hidden mt-6">
             <div className="flex justify-between items-center p-7 border-b border-white/6">
               <h2 className="text-lg font-medium text-gray-100" style={{ fontFamily: "'Fraunces', serif" }}>Call Transcript</h2>
               <button
-                onClick={() => setExpandTranscript(!expandTranscript)}
+                onClick={toggleTranscript}
                 className="flex items-center gap-2 px-4 py-2 bg-[#16161d] rounded-lg text-sm text-amber-400 hover:bg-[#1c1c25] transition"
               >
                 {expandTranscript ? <ChevronUp className="w-4 h-4" /> : <ChevronDown className="w-4 h-4" />}
@@ -637,7 +659,7 @@ const CallReportDetail = () => {
 
             {expandTranscript && (
               <div className="max-h-[500px] overflow-y-auto p-7 space-y-6">
-                {transcript.map((msg, i) => (
+                {(transcript || []).map((msg, i) => (
                   <div key={i} className="flex gap-4 pb-4 border-b border-gray-800 last:border-0">
                     <span className="font-mono text-xs text-gray-500 min-w-12 pt-1">{msg.Timestamp || '00:00'}</span>
                     <div className="flex-1">
@@ -38,6 +38,8 @@ const VideoCallDetail = () => {
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
   const [transcriptExpanded, setTranscriptExpanded] = useState(false);
+  const [hasTranscript, setHasTranscript] = useState(false);
+  const [transcript, setTranscript] = useState(null);
 
   useEffect(() => {
     const fetchReport = async () => {
@@ -47,6 +49,8 @@ const VideoCallDetail = () => {
         if (!response.ok) throw new Error('Failed to fetch report');
         const data = await response.json();
         setAnalysis(data.analysis || data);
+        setHasTranscript(Boolean(data.has_transcript));
+        setTranscript(null);
       } catch (err) {
         setError(err.message);
       } finally {
@@ -57,6 +61,26 @@ const VideoCallDetail = () => {
     fetchReport();
   }, [reportId]);
 
+  // Transcripts are served separately and only fetched when expanded
+  const toggleTranscript = async () => {
+    if (!transcriptExpanded && !transcript) {
+      try {
+        const response = await fetch(`http://localhost:8000/api/video-reports/${reportId}/transcript`);
+        if (!response.ok) throw new Error('Failed to fetch transcript');
+        const data = await response.json();
+        // Schema transcripts are a Transcript_Log list, demo data uses { messages }
+        const messages = Array.isArray(data.transcript)
+          ? data.transcript.map((entry) => ({ time: entry.Timestamp, speaker: entry.Speaker, text: entry.Text }))
+          : data.transcript?.messages || [];
+        setTranscript({ messages });
+      } catch (err) {
+        console.error(err);
+        setTranscript({ messages: [] });
+      }
+    }
+    setTranscriptExpanded(!transcriptExpanded);
+  };
+
   if (loading) {
     return (
       <div className="min-h-screen bg-[#08080c] flex items-center justify-center text-white text-lg">Loading report...</div>
@@ -84,7 +108,6 @@ const VideoCallDetail = () => {
   const invitation = agentAreas.The_Invitation_to_Visit || {};
   const languageFluency = agentAreas.Agent_Language_Fluency || {};
   const overallSummary = agentAreas.Overall_Summary || {};
-  const transcript = agentAreas.Transcript || {};
   const presentability = functional.Agent_Presentability || {};
 
   const noiseBg = "url(\"data:image/svg+xml,%3Csvg viewBox='0 0 256 256' xmlns='http://www.w3.org/2000/svg'%3E%3Cfilter id='noise'%3E%3CfeTurbulence type='fractalNoise' baseFrequency='0.9' numOctaves='4' stitchTiles='stitch'/%3E%3C/filter%3E%3Crect width='100%25' height='100%25' filter='url(%23noise)'/%3E%3C/svg%3E\")";
@@ -526,12 +549,12 @@ const VideoCallDetail = () => {
         </section>
 
         {/* Section 9: Transcript */}
-        {transcript && transcript.messages && transcript.messages.length > 0 && (
+        {hasTranscript && (
           <section className="rounded-2xl border border-white/10 bg-[#0f0f14] overflow-hidden">
             <div className="flex items-center justify-between px-6 py-4 border-b border-white/10">
               <h2 className="text-xl font-['Fraunces',serif] font-semibold">Call Transcript</h2>
               <button
-                onClick={() => setTranscriptExpanded(!transcriptExpanded)}
+                onClick={toggleTranscript}
                 className="flex items-center gap-2 text-amber-400 hover:text-amber-300 text-sm px-3 py-2 rounded-md hover:bg-amber-500/10"
               >
                 <ChevronDown className={`w-5 h-5 transition-transform ${transcriptExpanded ? 'rotate-180' : ''}`} />
@@ -540,7 +563,7 @@ const VideoCallDetail = () => {
             </div>
             {transcriptExpanded && (
               <div className="px-6 py-5 max-h-[420px] overflow-y-auto space-y-3">
-                {transcript.messages.map((message, idx) => (
+                {(transcript?.messages || []).map((message, idx) => (
                   <div key={idx} className="flex gap-3 rounded-lg bg-[#16161d] border border-white/5 p-3">
                     <span className="text-[11px] font-mono text-gray-400 min-w-[48px] pt-1">{message.time || '00:00'}</span>
                     <div className="flex-1 space-y-1">
@@ -6,15 +6,31 @@ export default function VideoCallsList() {
   const [reports, setReports] = useState([]);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
+  const [jobStates, setJobStates] = useState({});
   const navigate = useNavigate();
 
   useEffect(() => {
     fetchVideoReports();
   }, []);
 
-  const fetchVideoReports = async () => {
+  // Live analysis progress: the list is refetched only when a job finishes
+  useEffect(() => {
+    const events = new EventSource('http://localhost:8000/api/jobs/events');
+    const handleJob = (message) => {
+      const job = JSON.parse(message.data);
+      setJobStates((prev) => ({ ...prev, [job.report_id]: job.state }));
+      if (message.type === 'job' && (job.state === 'saved' || job.state === 'failed')) {
+        fetchVideoReports(false);
+      }
+    };
+    events.addEventListener('snapshot', handleJob);
+    events.addEventListener('job', handleJob);
+    return () => events.close();
+  }, []);
+
+  const fetchVideoReports = async (showLoading = true) => {
     try {
-      setLoading(true);
+      if (showLoading) setLoading(true);
       const response = await fetch('http://localhost:8000/api/video-reports');
       const data = await response.json();
       
@@ -153,6 +169,10 @@ export default function VideoCallsList() {
                     <span className="px-3 py-1 bg-green-500/15 text-green-400 rounded-lg text-xs font-medium">
                       Analyzed
                     </span>
+                  ) : jobStates[report.report_id] && jobStates[report.report_id] !== 'failed' ? (
+                    <span className="px-3 py-1 bg-blue-500/15 text-blue-400 rounded-lg text-xs font-medium capitalize">
+                      {jobStates[report.report_id]}...
+                    </span>
                   ) : (
                     <span className="px-3 py-1 bg-amber-500/15 text-amber-400 rounded-lg text-xs font-medium">
                       Pending